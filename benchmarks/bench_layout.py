@@ -0,0 +1,42 @@
+"""Family tree layout: crossings and time of the layered pedigree layout, and viewport queries
+
+The baseline is the unordered layering (zero sweeps): each row sorted by animal ID,
+much like the previous Dash figure's evenly spaced rows in arbitrary order.
+
+Usage: python benchmarks/bench_layout.py [num_animals ...]
+"""
+import sys
+import time
+
+from synthetic import make_colony
+
+from layout import colony_layout, tree_view
+
+
+def bench(num_animals):
+    colony = make_colony(num_animals)
+    start = time.perf_counter()
+    baseline = colony_layout(colony, sweeps=0)
+    print(f"{num_animals:>7} animals  rows sorted by ID      {baseline.crossings:>12} crossings"
+          f"  {(time.perf_counter() - start) * 1000:8.1f} ms")
+    for sweeps in (2, 4, 8):
+        start = time.perf_counter()
+        tree = colony_layout(colony, sweeps=sweeps)
+        print(f"{num_animals:>7} animals  {sweeps} barycenter sweeps    {tree.crossings:>12} crossings"
+              f"  {(time.perf_counter() - start) * 1000:8.1f} ms")
+    start = time.perf_counter()
+    view = tree_view(colony)
+    print(f"{num_animals:>7} animals  cached layout and view index built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    width = max(x for x, _ in view.tree.positions.values())
+    for label, box in (('whole tree', None), ('tenth of the width', (0, width / 10, 0, len(view.tree.layers))),
+                       ('30 x 3 window', (width / 2, width / 2 + 30, 2, 4))):
+        start = time.perf_counter()
+        result = view.query(box)
+        print(f"{num_animals:>7} animals  view of {label:<18} {result['detail']:>8}: {len(result['nodes']):>5} nodes"
+              f" {len(result['edges']):>6} edges  {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,93 @@
+"""Memory held by a loaded colony: dict-based animals, slotted animals, and a packed ColonyStore
+
+Animals are built from a JSON round trip, as the server loads them, and
+measured with tracemalloc. The first two rows hold just the linked animals;
+the Colony row adds its ID, cage and sex indexes.
+
+Usage: python benchmarks/bench_memory.py [num_animals ...]
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from synthetic import make_colony
+
+from columnar import ColonyStore
+from models import Animal, Colony, parse_date
+
+
+class DictAnimal:
+    """The previous Animal layout: a per-instance __dict__ and no string interning"""
+
+    def __init__(self, animal_id, sex, genotype, dob, notes=None, cage_id=None, date_weaned=None):
+        self.animal_id = animal_id
+        self.sex = sex
+        self.genotype = genotype
+        self.dob = dob
+        self.mother = None
+        self.father = None
+        self.children = []
+        self.notes = notes
+        self.cage_id = cage_id
+        self.old_cage_id = None
+        self.date_weaned = date_weaned
+        self.deceased = False
+
+
+def build_animals(cls, data):
+    by_id = {}
+    for a in data['animals']:
+        animal = cls(a['animal_id'], a['sex'], a['genotype'], parse_date(a['dob']),
+                      notes=a.get('notes'), cage_id=a.get('cage_id'),
+                    date_weaned=parse_date(a.get('date_weaned')))
+        animal.deceased = a.get('deceased', False)
+        by_id[animal.animal_id] = animal
+    for a in data['animals']:
+        animal = by_id[a['animal_id']]
+        for key, attr in (('mother_id', 'mother'), ('father_id', 'father')):
+            parent = by_id.get(a.get(key))
+            if parent:
+                setattr(animal, attr, parent)
+                parent.children.append(animal)
+    return list(by_id.values())
+
+
+def measure(build):
+    """Return (result, bytes still allocated by it, seconds to build)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def bench(num_animals):
+    text = json.dumps(make_colony(num_animals).to_dict())
+    cases = [
+        ('dict-based animals', lambda: build_animals(DictAnimal, json.loads(text))),
+        ('slotted animals', lambda: build_animals(Animal, json.loads(text))),
+        ('slotted Colony', lambda: Colony.from_dict(json.loads(text))),
+    ]
+    colony = None
+    for label, build in cases:
+        colony, size, elapsed = measure(build)
+        print(f"{num_animals:>7} animals  {label:<20} {size / 1e6:8.1f} MB  {size / num_animals:6.0f} B/animal"
+              f"  built in {elapsed * 1000:7.1f} ms")
+    store, size, elapsed = measure(lambda: ColonyStore.from_colony(colony))
+    print(f"{num_animals:>7} animals  {'ColonyStore':<20} {size / 1e6:8.1f} MB  {size / num_animals:6.0f} B/animal"
+          f"  packed in {elapsed * 1000:6.1f} ms")
+    start = time.perf_counter()
+    store.to_colony()
+    print(f"{num_animals:>7} animals  unpacked ColonyStore in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,46 @@
+"""Snapshot save throughput: plain rewrite versus atomic write-and-rename
+
+Usage: python benchmarks/bench_save.py [num_animals ...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from synthetic import make_colony
+
+import storage
+
+
+def plain_write(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=4)
+
+
+def bench(num_animals, repeats=3):
+    colony = make_colony(num_animals)
+    data = colony.to_dict()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.json')
+        cases = [
+            ('plain open/write', lambda: plain_write(path, data)),
+            ('atomic, no backups', lambda: storage.write_snapshot(path, data, backups=0)),
+            ('atomic, 3 backups', lambda: storage.write_snapshot(path, data, backups=3)),
+            ('atomic, compact json', lambda: storage.write_snapshot(path, data, indent=None, backups=0)),
+        ]
+        for label, func in cases:
+            func()  # warm up
+            start = time.perf_counter()
+            for _ in range(repeats):
+                func()
+            elapsed = (time.perf_counter() - start) / repeats
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"{num_animals:>7} animals  {label:<22} {elapsed * 1000:8.1f} ms"
+                  f"  {num_animals / elapsed:>10.0f} animals/s  {size_mb:6.1f} MB")
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    for size in sizes:
+        bench(size)
@@ -0,0 +1,114 @@
+"""Concurrency stress test: hammer the colony routes from many threads
+
+Runs against a throwaway colonies directory through Flask's test client,
+then checks that the in-memory colony, its indexes and the saved colony
+agree with each other.
+
+Usage: python benchmarks/stress_routes.py [threads] [iterations]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from random import Random
+
+from synthetic import make_colony
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def check_consistency(colony):
+    """Return a list of problems found in the colony's indexes and links"""
+    problems = []
+    ids = [a.animal_id for a in colony.animals]
+    if len(ids) != len(set(ids)):
+        problems.append('duplicate animal IDs')
+    if set(ids) != set(colony._by_id):
+        problems.append('ID index out of sync with animals list')
+    for animal in colony.animals:
+        if colony.get_animal(animal.animal_id) is not animal:
+            problems.append(f'{animal.animal_id}: ID index points to another object')
+        if animal.cage_id and animal not in colony._by_cage.get(animal.cage_id, {}):
+            problems.append(f'{animal.animal_id}: missing from cage index')
+        for parent in (animal.mother, animal.father):
+            if parent is not None and animal not in parent.children:
+                problems.append(f'{animal.animal_id}: missing from parent children list')
+    cage_total = sum(len(bucket) for bucket in colony._by_cage.values())
+    if cage_total != sum(1 for a in colony.animals if a.cage_id):
+        problems.append('cage index has stale entries')
+    return problems
+
+
+def main(num_threads=16, iterations=200):
+    workdir = tempfile.mkdtemp(prefix='colony-stress-')
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    import server
+
+    colony = make_colony(5000, name='stress')
+    server.save_colony(colony, 'stress', full=True)
+
+    errors = []
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+
+    def next_id():
+        with counter_lock:
+            return next(counter)
+
+    def worker(seed):
+        rng = Random(seed)
+        client = server.app.test_client()
+        client.get('/colony/load/stress')
+        for _ in range(iterations):
+            action = rng.random()
+            try:
+                if action < 0.35:
+                    response = client.get('/api/colony/cages')
+                    if response.status_code != 200 or response.get_json() is None:
+                        errors.append(f'/api/colony/cages returned {response.status_code}')
+                elif action < 0.55:
+                    cage_id = f'S{next_id()}'
+                    client.post('/add_cage', json={
+                        'cage_id': cage_id, 'num_animals': 3, 'sex': rng.choice('MF'),
+                        'genotype': 'Het (+/-)', 'dob': '2020-01-01'})
+                elif action < 0.8:
+                    cages = client.get('/api/colony/cages').get_json()['cages']
+                    if cages:
+                        cage = rng.choice(cages)
+                        client.post('/edit_cage', json={
+                            'cage_id': cage['cage_id'], 'genotype': rng.choice(['Het (+/-)', 'WT (-/-)']),
+                            'deceased': rng.random() < 0.2})
+                else:
+                    cages = client.get('/api/colony/cages').get_json()['cages']
+                    if cages:
+                        client.post('/delete_cage', data={'cage_id': rng.choice(cages)['cage_id']})
+            except Exception as e:
+                errors.append(f'{type(e).__name__}: {e}')
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    live = server.colony_manager.get('stress')
+    problems = check_consistency(live)
+    reloaded = server.load_colony('stress')
+    if sorted(a.animal_id for a in reloaded.animals) != sorted(a.animal_id for a in live.animals):
+        problems.append('saved colony differs from the in-memory colony')
+
+    total = num_threads * iterations
+    print(f"{total} requests from {num_threads} threads in {elapsed:.2f}s ({total / elapsed:.0f} req/s)")
+    print(f"{len(errors)} request errors, {len(problems)} consistency problems")
+    for message in (errors + problems)[:20]:
+        print(f"  {message}")
+    return 1 if errors or problems else 0
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    sys.exit(main(*args))
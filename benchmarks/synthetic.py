@@ -0,0 +1,43 @@
+"""Synthetic colonies for the benchmark scripts"""
+import os
+import sys
+from datetime import date, timedelta
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models import Animal, Colony
+
+GENOTYPES = ['Homo (+/+)', 'Het (+/-)', 'WT (-/-)']
+
+
+def make_colony(num_animals, generations=10, founders=50, seed=0, name='bench'):
+    """Build a colony of roughly num_animals spread over the given generations"""
+    rng = Random(seed)
+    colony = Colony(name)
+    per_generation = max(founders, (num_animals - founders) // max(generations - 1, 1))
+    previous = []
+    for i in range(founders):
+        animal = Animal(f'F{i}', 'M' if i % 2 else 'F', rng.choice(GENOTYPES),
+                        date(2015, 1, 1), cage_id=f'C0_{i // 4}')
+        colony.add_animal(animal)
+        previous.append(animal)
+    gen = 1
+    while len(colony.animals) < num_animals:
+        mothers = [a for a in previous if a.sex == 'F'] or previous
+        fathers = [a for a in previous if a.sex == 'M'] or previous
+        current = []
+        count = min(per_generation, num_animals - len(colony.animals))
+        for i in range(count):
+            mother = rng.choice(mothers)
+            father = rng.choice(fathers)
+            animal = Animal(f'G{gen}_{i}', rng.choice('MF'), rng.choice(GENOTYPES),
+                            date(2015, 1, 1) + timedelta(days=90 * gen),
+                            mother, father, None, f'C{gen}_{i // 5}')
+            animal.deceased = rng.random() < 0.3
+            colony.add_animal(animal)
+            current.append(animal)
+        previous = current
+        gen += 1
+    colony.take_changes()
+    return colony
@@ -0,0 +1,378 @@
+"""Bulk import of animals from CSV or JSON files, and streaming export
+
+Rows are validated against the colony's ID index in one pass and applied
+all together, so a batch either imports completely or not at all. Exports
+are generated in chunks so large colonies never have to be built up as one
+string. The same code backs the /colony/import and /colony/export routes and
+a command line tool:
+
+    python bulk_io.py import <colony> <file> [--format csv|json] [--dry-run]
+    python bulk_io.py export <colony> <table> [--format csv|ndjson|columnar] [-o <file>]
+
+Run the command while the server is stopped; a running server keeps its own
+copy of the colony in memory and would overwrite the import on its next save.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import sqlite_store
+import storage
+from models import Animal, Colony, parse_date
+from pedigree import PedigreeCycleError, assign_generations
+
+IMPORT_FIELDS = ['animal_id', 'sex', 'genotype', 'dob', 'mother_id', 'father_id',
+                 'cage_id', 'date_weaned', 'notes', 'deceased']
+
+# Stop collecting validation errors after this many
+MAX_ERRORS = 100
+
+_SEXES = {'M': 'M', 'MALE': 'M', 'F': 'F', 'FEMALE': 'F'}
+_BOOLEANS = {'': False, '0': False, 'false': False, 'no': False, 'n': False,
+             '1': True, 'true': True, 'yes': True, 'y': True}
+
+
+class BulkImportError(ValueError):
+    """Raised when an import batch has invalid rows; nothing is applied"""
+
+    def __init__(self, errors: List[Tuple[int, str]]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} invalid row(s); first: row {errors[0][0]}: {errors[0][1]}")
+
+
+def detect_format(filename: Optional[str], default: str = 'csv') -> str:
+    """Guess 'csv' or 'json' from a file name"""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext in ('.json', '.ndjson', '.jsonl'):
+        return 'json'
+    if ext == '.csv':
+        return 'csv'
+    return default
+
+
+def read_rows(stream: io.TextIOBase, fmt: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (row number, row dict) from a CSV, JSON array or newline-delimited JSON stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if reader.fieldnames:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for row in reader:
+            yield reader.line_num, row
+        return
+    if fmt != 'json':
+        raise ValueError(f"Unsupported import format: {fmt}")
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if first == '[':
+        # A JSON array has to be parsed whole
+        for number, row in enumerate(json.loads(first + stream.read()), start=1):
+            yield number, row
+        return
+    # Otherwise one JSON object per line
+    for number, line in enumerate(_prepend(first, stream), start=1):
+        if line.strip():
+            yield number, json.loads(line)
+
+
+def _prepend(first: str, stream: io.TextIOBase) -> Iterator[str]:
+    """Iterate over lines of a stream whose first character was already read"""
+    rest = stream.readline()
+    yield first + rest
+    yield from stream
+
+
+def _text(row: dict, field: str) -> str:
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+
+def import_animals(colony: Colony, rows: Iterable[Tuple[int, dict]], dry_run: bool = False) -> dict:
+    """Validate rows and add them to the colony as new animals
+
+    Parents may be existing animals or other animals in the same batch.
+    Raises BulkImportError listing invalid rows without changing the colony.
+    Returns counts and timing for the batch.
+    """
+    start = time.perf_counter()
+    errors: List[Tuple[int, str]] = []
+    parsed = []
+    batch_ids = {}
+
+    # One pass: parse each row and check it against the index and the batch so far
+    for number, row in rows:
+        if len(errors) >= MAX_ERRORS:
+            break
+        if not isinstance(row, dict):
+            errors.append((number, 'row is not an object'))
+            continue
+        animal_id = _text(row, 'animal_id')
+        sex = _SEXES.get(_text(row, 'sex').upper())
+        genotype = _text(row, 'genotype')
+        problems = []
+        if not animal_id:
+            problems.append('missing animal_id')
+        elif colony.get_animal(animal_id) is not None:
+            problems.append(f'animal {animal_id} already exists')
+        elif animal_id in batch_ids:
+            problems.append(f'animal {animal_id} repeats row {batch_ids[animal_id]}')
+        if sex is None:
+            problems.append(f"invalid sex '{_text(row, 'sex')}'")
+        if not genotype:
+            problems.append('missing genotype')
+        try:
+            dob = parse_date(_text(row, 'dob'))
+            if dob is None:
+                problems.append('missing dob')
+        except ValueError:
+            dob = None
+            problems.append(f"invalid dob '{_text(row, 'dob')}'")
+        try:
+            date_weaned = parse_date(_text(row, 'date_weaned'))
+        except ValueError:
+            date_weaned = None
+            problems.append(f"invalid date_weaned '{_text(row, 'date_weaned')}'")
+        deceased = row.get('deceased')
+        if not isinstance(deceased, bool):
+            deceased = _BOOLEANS.get(_text(row, 'deceased').lower())
+            if deceased is None:
+                problems.append(f"invalid deceased '{_text(row, 'deceased')}'")
+        if problems:
+            errors.append((number, '; '.join(problems)))
+            continue
+        batch_ids[animal_id] = number
+        parsed.append((number, {
+            'animal_id': animal_id, 'sex': sex, 'genotype': genotype, 'dob': dob,
+            'date_weaned': date_weaned, 'deceased': deceased,
+            'mother_id': _text(row, 'mother_id'), 'father_id': _text(row, 'father_id'),
+            'cage_id': _text(row, 'cage_id') or None, 'notes': _text(row, 'notes') or None,
+        }))
+
+    # Parent references resolve against the colony index or the batch
+    batch_sexes = {fields['animal_id']: fields['sex'] for _, fields in parsed}
+    edges = []
+    for number, fields in parsed:
+        for key, expected in (('mother_id', 'F'), ('father_id', 'M')):
+            parent_id = fields[key]
+            if not parent_id:
+                continue
+            existing = colony.get_animal(parent_id)
+            parent_sex = _SEXES.get(str(existing.sex).upper()) if existing else batch_sexes.get(parent_id)
+            if existing is None and parent_id not in batch_sexes:
+                errors.append((number, f"{key} {parent_id} not found"))
+            elif parent_id == fields['animal_id']:
+                errors.append((number, f"{key} is the animal itself"))
+            elif parent_sex != expected:
+                errors.append((number, f"{key} {parent_id} is not {'female' if expected == 'F' else 'male'}"))
+            elif existing is None:
+                edges.append((parent_id, fields['animal_id']))
+    if not errors:
+        try:
+            assign_generations(batch_sexes, edges)
+        except PedigreeCycleError as e:
+            errors.append((0, str(e)))
+    if errors:
+        raise BulkImportError(sorted(errors)[:MAX_ERRORS])
+
+    if not dry_run:
+        # Link parents before adding so each recorded change carries its parent IDs
+        created = {}
+        for _, fields in parsed:
+            animal = Animal(fields['animal_id'], fields['sex'], fields['genotype'], fields['dob'],
+                            notes=fields['notes'], cage_id=fields['cage_id'],
+                            date_weaned=fields['date_weaned'])
+            animal.deceased = fields['deceased']
+            created[animal.animal_id] = animal
+        for _, fields in parsed:
+            animal = created[fields['animal_id']]
+            for key, attr in (('mother_id', 'mother'), ('father_id', 'father')):
+                parent_id = fields[key]
+                if parent_id:
+                    parent = created.get(parent_id) or colony.get_animal(parent_id)
+                    setattr(animal, attr, parent)
+                    parent.children.append(animal)
+        for animal in created.values():
+            colony.add_animal(animal)
+        # Existing parents gained children; that isn't stored on them, so no change record is needed
+
+    elapsed = time.perf_counter() - start
+    return {
+        'imported': 0 if dry_run else len(parsed),
+        'validated': len(parsed),
+        'dry_run': dry_run,
+        'elapsed': round(elapsed, 3),
+        'rows_per_second': round(len(parsed) / elapsed) if elapsed > 0 else None,
+    }
+
+
+# Rows per chunk yielded by the export generators
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_FORMATS = {'csv': ('text/csv', 'csv'),
+                  'ndjson': ('application/x-ndjson', 'ndjson'),
+                  'columnar': ('application/json', 'json')}
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _animal_values(a: Animal) -> tuple:
+    return (a.animal_id, a.sex, a.genotype, a.dob,
+            a.mother.animal_id if a.mother else None, a.father.animal_id if a.father else None,
+            a.notes, a.cage_id, a.date_weaned, a.old_cage_id, bool(getattr(a, 'deceased', False)))
+
+
+def _columns(columns: List[str], dates: Iterable[str] = ()) -> list:
+    """Pair each column with a function reading it from a row tuple, formatting dates"""
+    return [(column, (lambda row, i=i: _iso(row[i])) if column in dates else itemgetter(i))
+            for i, column in enumerate(columns)]
+
+
+# Export tables: the columns and a function reading each one from a row of export_source
+EXPORT_TABLES = {
+    'animals': _columns(sqlite_store.ANIMAL_COLUMNS, dates=('dob', 'date_weaned')),
+    'breeder_cages': _columns(sqlite_store.BREEDER_COLUMNS + ['litter_count']),
+    'litters': _columns(['breeder_cage_id', 'position', 'cage_id']),
+    'transfers': _columns(['animal_id', 'from_cage_id', 'to_cage_id']),
+}
+
+
+def export_source(colony: Colony, table: str) -> list:
+    """Copy the rows of an export table from a colony as tuples of field values
+
+    Call this under the colony's read lock; the rows share nothing mutable
+    with the colony, so the (slower) formatting can run after releasing it.
+    """
+    if table == 'animals':
+        return [_animal_values(a) for a in colony.animals]
+    if table == 'breeder_cages':
+        return [tuple(bc.get(column) for column in sqlite_store.BREEDER_COLUMNS) + (len(bc.get('litters', [])),)
+                for bc in colony.breeder_cages]
+    if table == 'litters':
+        return [(bc.get('cage_id'), position, litter) for bc in colony.breeder_cages
+                for position, litter in enumerate(bc.get('litters', []))]
+    if table == 'transfers':
+        return [(a.animal_id, a.old_cage_id, a.cage_id) for a in colony.animals if a.old_cage_id]
+    raise ValueError(f"Unknown export table: {table}")
+
+
+# Reused encoder; json.dumps with non-default arguments builds a new one per call
+_compact_json = json.JSONEncoder(separators=(',', ':'))
+
+
+def _chunks(rows: list) -> Iterator[list]:
+    for i in range(0, len(rows), EXPORT_CHUNK_ROWS):
+        yield rows[i:i + EXPORT_CHUNK_ROWS]
+
+
+def export_rows(rows: list, table: str, fmt: str) -> Iterator[str]:
+    """Yield an export table as CSV, newline-delimited JSON or columnar JSON text chunks
+
+    The columnar format is one JSON object with an array per field,
+    {"columns": [...], "length": n, "data": {"animal_id": [...], ...}}, which
+    loads straight into pandas.DataFrame(doc['data']) or NumPy arrays.
+    """
+    spec = EXPORT_TABLES[table]
+    columns = [column for column, _ in spec]
+    getters = [getter for _, getter in spec]
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for chunk in _chunks(rows):
+            writer.writerows([getter(row) for getter in getters] for row in chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    elif fmt == 'ndjson':
+        for chunk in _chunks(rows):
+            yield ''.join(_compact_json.encode(dict(zip(columns, [getter(row) for getter in getters]))) + '\n'
+                          for row in chunk)
+    elif fmt == 'columnar':
+        yield f'{{"columns":{json.dumps(columns)},"length":{len(rows)},"data":{{'
+        for index, (column, getter) in enumerate(spec):
+            yield f'{"," if index else ""}{json.dumps(column)}:['
+            for number, chunk in enumerate(_chunks(rows)):
+                values = json.dumps([getter(row) for row in chunk], separators=(',', ':'))[1:-1]
+                yield (',' if number else '') + values
+            yield ']'
+        yield '}}\n'
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def import_file(name: str, path: str, fmt: Optional[str] = None, dry_run: bool = False) -> dict:
+    """Import a file into a stored colony and save it once"""
+    store = storage.backend()
+    colony = Colony.from_dict(store.read_colony_data(name))
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        result = import_animals(colony, read_rows(f, fmt or detect_format(path)), dry_run=dry_run)
+    if not dry_run:
+        changes = colony.take_changes()
+        if len(changes) >= storage.COMPACT_THRESHOLD:
+            # A large batch is cheaper to write as a fresh snapshot than to journal
+            store.write_full_snapshot(name, colony.to_dict())
+        else:
+            store.append_changes(name, changes, colony.breeder_cages)
+    return result
+
+
+def export_file(name: str, table: str, fmt: str, out) -> int:
+    """Write an export table of a stored colony to a text stream; return the row count"""
+    colony = Colony.from_dict(storage.backend().read_colony_data(name))
+    rows = export_source(colony, table)
+    for chunk in export_rows(rows, table, fmt):
+        out.write(chunk)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk import and export of colony data')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='Import animals from a CSV or JSON file')
+    import_parser.add_argument('colony', help='Colony name')
+    import_parser.add_argument('file', help='CSV, JSON array or newline-delimited JSON file')
+    import_parser.add_argument('--format', choices=['csv', 'json'], help='File format (default: from the extension)')
+    import_parser.add_argument('--dry-run', action='store_true', help='Validate without saving')
+    export_parser = commands.add_parser('export', help='Export a table of a colony')
+    export_parser.add_argument('colony', help='Colony name')
+    export_parser.add_argument('table', choices=sorted(EXPORT_TABLES))
+    export_parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    export_parser.add_argument('-o', '--output', help='Output file (default: standard output)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        start = time.perf_counter()
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='') as f:
+                count = export_file(args.colony, args.table, args.format, f)
+        else:
+            count = export_file(args.colony, args.table, args.format, sys.stdout)
+        elapsed = time.perf_counter() - start
+        print(f"Exported {count} {args.table} rows from '{args.colony}' in {elapsed:.3f}s", file=sys.stderr)
+        return 0
+
+    try:
+        result = import_file(args.colony, args.file, args.format, args.dry_run)
+    except BulkImportError as e:
+        for number, message in e.errors:
+            print(f"row {number}: {message}" if number else message)
+        print(f"Import failed: {len(e.errors)} invalid row(s); nothing was imported")
+        return 1
+    action = 'Validated' if args.dry_run else 'Imported'
+    print(f"{action} {result['validated']} animals into '{args.colony}' in {result['elapsed']:.3f}s "
+          f"({result['rows_per_second'] or 0} rows/s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
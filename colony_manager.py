@@ -0,0 +1,182 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from columnar import ColonyStore
+from models import Colony
+
+# Rough in-memory cost of one loaded animal (slotted object, index slots, cached
+# sort orders), and of one animal packed in a ColonyStore; see benchmarks/bench_memory.py
+BYTES_PER_ANIMAL = 512
+BYTES_PER_PACKED_ANIMAL = 128
+
+
+def estimate_colony_bytes(colony: Colony) -> int:
+    """Estimate the memory held by a loaded colony"""
+    return len(colony.animals) * BYTES_PER_ANIMAL
+
+
+def estimate_packed_bytes(store: ColonyStore) -> int:
+    """Estimate the memory held by a packed colony"""
+    return len(store) * BYTES_PER_PACKED_ANIMAL
+
+
+class ColonyManager:
+    """Keep several loaded colonies in memory, evicting the least recently used
+
+    Colonies are keyed by name. When more than ``max_colonies`` are loaded or
+    the estimated size of the loaded and packed colonies exceeds
+    ``memory_budget`` bytes, the least recently used ones are handed to
+    ``on_evict`` (to flush unsaved state) and dropped. The most recently used
+    colony is never evicted, even if it alone exceeds the budget. A colony
+    whose ``on_evict`` raises stays loaded, to be flushed again on the next
+    eviction.
+
+    Up to ``max_packed`` evicted colonies are kept as compact ColonyStore
+    copies, so getting one again unpacks it instead of reading it from disk;
+    the oldest are dropped first when over the budget. Evicted Colony objects
+    are marked ``retired``; callers holding one should fetch the colony again.
+    """
+
+    def __init__(self, loader: Callable[[str], Colony],
+                 on_evict: Optional[Callable[[Colony], None]] = None,
+                 max_colonies: int = 8, memory_budget: int = 512 * 1024 * 1024,
+                 max_packed: int = 32):
+        self.loader = loader
+        self.on_evict = on_evict
+        self.max_colonies = max_colonies
+        self.memory_budget = memory_budget
+        self.max_packed = max_packed
+        self._colonies: "OrderedDict[str, Colony]" = OrderedDict()
+        self._packed: "OrderedDict[str, ColonyStore]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def __contains__(self, name: str) -> bool:
+        with self._lock:
+            return name in self._colonies
+
+    def loaded_names(self):
+        """Names of the loaded colonies, least recently used first"""
+        with self._lock:
+            return list(self._colonies)
+
+    def packed_names(self):
+        """Names of the evicted colonies kept packed, least recently evicted first"""
+        with self._lock:
+            return list(self._packed)
+
+    def memory_used(self) -> int:
+        with self._lock:
+            return self._memory_used()
+
+    def _memory_used(self) -> int:
+        return (sum(estimate_colony_bytes(c) for c in self._colonies.values())
+                + sum(estimate_packed_bytes(p) for p in self._packed.values()))
+
+    def get(self, name: str) -> Optional[Colony]:
+        """Get a colony by name, loading it if it isn't in memory
+
+        Returns None if the colony can't be found on disk.
+        """
+        with self._lock:
+            colony = self._colonies.get(name)
+            if colony is not None:
+                self._colonies.move_to_end(name)
+                return colony
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Load outside the manager lock so other colonies stay available;
+        # the per-name lock keeps concurrent requests from loading twice.
+        with load_lock:
+            with self._lock:
+                colony = self._colonies.get(name)
+            if colony is None:
+                with self._lock:
+                    packed = self._packed.pop(name, None)
+                if packed is not None:
+                    colony = packed.to_colony()
+                else:
+                    try:
+                        colony = self.loader(name)
+                    except FileNotFoundError:
+                        return None
+                colony.name = name
+                self.put(colony)
+        return colony
+
+    def put(self, colony: Colony):
+        """Add or replace a colony, making it the most recently used"""
+        with self._lock:
+            self._packed.pop(colony.name, None)
+            self._colonies[colony.name] = colony
+            self._colonies.move_to_end(colony.name)
+            evicted = self._evict()
+        self._flush(evicted)
+
+    def rename(self, old_name: str, new_name: str):
+        """Re-key a loaded colony after it was renamed"""
+        with self._lock:
+            colony = self._colonies.pop(old_name, None)
+            if colony is not None:
+                colony.name = new_name
+                self._colonies[new_name] = colony
+            packed = self._packed.pop(old_name, None)
+            if packed is not None:
+                packed.name = new_name
+                self._packed[new_name] = packed
+
+    def discard(self, name: str):
+        """Drop a colony from memory without flushing it"""
+        with self._lock:
+            colony = self._colonies.pop(name, None)
+            self._packed.pop(name, None)
+        if colony is not None:
+            colony.retired = True
+            colony.bump_version()
+
+    def _evict(self):
+        """Remove least recently used colonies until within limits; caller holds the lock"""
+        evicted = []
+        # Loaded colonies come first; packed ones only use what budget they leave
+        used = sum(estimate_colony_bytes(c) for c in self._colonies.values())
+        while len(self._colonies) > 1 and (len(self._colonies) > self.max_colonies or used > self.memory_budget):
+            name, colony = self._colonies.popitem(last=False)
+            used -= estimate_colony_bytes(colony)
+            evicted.append(colony)
+            print(f"Evicted colony '{name}' from memory ({len(colony.animals)} animals)")
+        self._trim_packed()
+        return evicted
+
+    def _trim_packed(self):
+        """Drop the oldest packed colonies beyond max_packed or the budget; caller holds the lock"""
+        while self._packed and (len(self._packed) > self.max_packed or self._memory_used() > self.memory_budget):
+            self._packed.popitem(last=False)
+
+    def _flush(self, evicted):
+        for colony in evicted:
+            # Wait for requests still using the colony, then retire it so later ones refetch
+            with colony.lock.write():
+                if self.on_evict:
+                    try:
+                        self.on_evict(colony)
+                    except Exception as e:
+                        # Unsaved edits only exist in this object; keep it loaded as the least recently used
+                        print(f"Error saving evicted colony '{colony.name}', keeping it loaded: {str(e)}")
+                        with self._lock:
+                            if colony.name not in self._colonies:
+                                self._colonies[colony.name] = colony
+                                self._colonies.move_to_end(colony.name, last=False)
+                        continue
+                colony.retired = True
+                # Wake anything waiting on the version so it fetches the colony again
+                colony.bump_version()
+                packed = ColonyStore.from_colony(colony) if self.max_packed > 0 else None
+            if packed is None:
+                continue
+            with self._lock:
+                # Skip if the colony was loaded again while we were packing it
+                if colony.name not in self._colonies:
+                    self._packed[colony.name] = packed
+                    self._packed.move_to_end(colony.name)
+                    self._trim_packed()
@@ -0,0 +1,145 @@
+from array import array
+from datetime import date
+from typing import Dict, List, Optional
+
+from models import Animal, Colony, intern_value
+
+
+class _Categories:
+    """Small-integer codes for a repeated string column; code -1 means no value"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value) -> int:
+        if value is None or value == '':
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(intern_value(value))
+        return code
+
+    def value(self, code: int):
+        return self.values[code] if code >= 0 else None
+
+
+def _ordinal(value: Optional[date]) -> int:
+    return value.toordinal() if value else 0
+
+
+def _from_ordinal(value: int) -> Optional[date]:
+    return date.fromordinal(value) if value else None
+
+
+class ColonyStore:
+    """Columnar copy of a colony: one array per field, indexed by animal position
+
+    Categorical fields (sex, genotype, cages) are stored as codes into
+    per-column category lists, dates as day ordinals (0 for none) and parents
+    as positions (-1 for none). A packed colony takes a fraction of the
+    memory of the Animal object graph, which makes it the cheap way to keep
+    archived colonies around or to hand a colony to NumPy-style analysis.
+    Use ``ColonyStore.from_colony`` to pack and ``to_colony`` to get a live,
+    editable Colony back.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.ids: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.sexes = _Categories()
+        self.genotypes = _Categories()
+        self.cages = _Categories()
+        self.sex = array('b')
+        self.genotype = array('h')
+        self.cage = array('i')
+        self.old_cage = array('i')
+        self.dob = array('i')
+        self.date_weaned = array('i')
+        self.mother = array('i')
+        self.father = array('i')
+        self.deceased = bytearray()
+        # Most animals have no notes, so they are kept sparse
+        self.notes: Dict[int, str] = {}
+        self.breeder_cages: List[dict] = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, animal_id: str) -> bool:
+        return animal_id in self.positions
+
+    @classmethod
+    def from_colony(cls, colony: Colony) -> "ColonyStore":
+        """Pack a colony into columns"""
+        store = cls(colony.name)
+        for position, animal in enumerate(colony.animals):
+            store.ids.append(animal.animal_id)
+            store.positions[animal.animal_id] = position
+        positions = store.positions
+        for position, animal in enumerate(colony.animals):
+            store.sex.append(store.sexes.code(animal.sex))
+            store.genotype.append(store.genotypes.code(animal.genotype))
+            store.cage.append(store.cages.code(animal.cage_id))
+            store.old_cage.append(store.cages.code(animal.old_cage_id))
+            store.dob.append(_ordinal(animal.dob))
+            store.date_weaned.append(_ordinal(animal.date_weaned))
+            store.mother.append(positions.get(animal.mother.animal_id, -1) if animal.mother else -1)
+            store.father.append(positions.get(animal.father.animal_id, -1) if animal.father else -1)
+            store.deceased.append(1 if animal.deceased else 0)
+            if animal.notes:
+                store.notes[position] = animal.notes
+        store.breeder_cages = [dict(bc, litters=list(bc.get('litters', []))) for bc in colony.breeder_cages]
+        return store
+
+    def row(self, position: int) -> dict:
+        """Get one animal in the same dict shape as Animal.to_dict"""
+        mother, father = self.mother[position], self.father[position]
+        dob, weaned = _from_ordinal(self.dob[position]), _from_ordinal(self.date_weaned[position])
+        return {
+            'animal_id': self.ids[position],
+            'sex': self.sexes.value(self.sex[position]),
+            'genotype': self.genotypes.value(self.genotype[position]),
+            'dob': dob.isoformat() if dob else None,
+            'mother_id': self.ids[mother] if mother >= 0 else None,
+            'father_id': self.ids[father] if father >= 0 else None,
+            'notes': self.notes.get(position),
+            'cage_id': self.cages.value(self.cage[position]),
+            'date_weaned': weaned.isoformat() if weaned else None,
+            'old_cage_id': self.cages.value(self.old_cage[position]),
+            'deceased': bool(self.deceased[position]),
+        }
+
+    def get(self, animal_id: str) -> Optional[dict]:
+        position = self.positions.get(animal_id)
+        return self.row(position) if position is not None else None
+
+    def to_colony(self) -> Colony:
+        """Unpack into a Colony with its indexes and parent/child links"""
+        colony = Colony(self.name)
+        animals = []
+        for position, animal_id in enumerate(self.ids):
+            animal = Animal(animal_id,
+                            self.sexes.value(self.sex[position]),
+                            self.genotypes.value(self.genotype[position]),
+                            _from_ordinal(self.dob[position]),
+                            notes=self.notes.get(position),
+                            cage_id=self.cages.value(self.cage[position]),
+                            date_weaned=_from_ordinal(self.date_weaned[position]))
+            animal.old_cage_id = self.cages.value(self.old_cage[position])
+            animal.deceased = bool(self.deceased[position])
+            animals.append(animal)
+        for position, animal in enumerate(animals):
+            mother, father = self.mother[position], self.father[position]
+            if mother >= 0:
+                animal.mother = animals[mother]
+                animals[mother].children.append(animal)
+            if father >= 0:
+                animal.father = animals[father]
+                animals[father].children.append(animal)
+        colony.load_animals(animals)
+        colony.breeder_cages = [dict(bc, litters=list(bc.get('litters', []))) for bc in self.breeder_cages]
+        colony.take_changes()
+        return colony
@@ -1,5 +1,3 @@
-import networkx as nx
-import matplotlib.pyplot as plt
 from datetime import date
 from typing import Optional, List
 import json
@@ -8,75 +6,53 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QPushButton, QLabel, QLineEdit, 
                             QComboBox, QDateEdit, QMessageBox, QTabWidget,
                             QScrollArea, QFrame, QInputDialog, QFileDialog)
-from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtCore import Qt, QDate, pyqtSignal
+from PyQt5.QtGui import QPixmap
 import sys
 import webbrowser
 from threading import Thread
 from tree_visualization import app as dash_app
 from models import Animal, Colony
+import render_service
+from storage import write_snapshot
 
 class FamilyTreeView(QFrame):
+    # Emitted from the render service's callback thread; Qt delivers it on the UI thread
+    rendered = pyqtSignal(str)
+
     def __init__(self, colony: Colony):
         super().__init__()
         self.colony = colony
         self.setMinimumSize(800, 600)
         self.setFrameStyle(QFrame.Box | QFrame.Raised)
         self.setLineWidth(1)
+        self.image = QLabel("Rendering family tree...")
+        self.image.setAlignment(Qt.AlignCenter)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.image)
+        self.rendered.connect(self.show_image)
+        self._latest = None
         self.update_tree()
 
     def update_tree(self):
-        # Create a directed graph
-        G = nx.DiGraph()
-        
-        # Add nodes with attributes
-        for animal in self.colony.animals:
-            G.add_node(animal.animal_id,
-                      sex=animal.sex,
-                      genotype=animal.genotype)
-        
-        # Add edges for parent-child relationships
-        for animal in self.colony.animals:
-            if animal.mother:
-                G.add_edge(animal.mother.animal_id, animal.animal_id)
-            if animal.father:
-                G.add_edge(animal.father.animal_id, animal.animal_id)
-        
-        # Create the plot
-        plt.figure(figsize=(15, 10))
-        
-        # Use hierarchical layout
-        pos = nx.spring_layout(G, k=1, iterations=50)
-        
-        # Draw edges
-        nx.draw_networkx_edges(G, pos, edge_color='gray', arrows=True, arrowsize=20)
-        
-        # Draw nodes with different shapes for males and females
-        for node in G.nodes():
-            x, y = pos[node]
-            if G.nodes[node]['sex'] == 'F':
-                circle = plt.Circle((x, y), 0.1, facecolor='white', edgecolor='black')
-                plt.gca().add_patch(circle)
-            else:
-                rect = plt.Rectangle((x-0.1, y-0.1), 0.2, 0.2, facecolor='white', edgecolor='black')
-                plt.gca().add_patch(rect)
-            
-            # Add labels with animal ID and genotype
-            label = f"{node}\n{G.nodes[node]['genotype']}"
-            plt.text(x, y+0.15, label, ha='center', va='center', fontsize=8)
-        
-        # Set the axis limits with some padding
-        plt.xlim(-0.2, 1.2)
-        plt.ylim(-0.2, 1.2)
-        
-        # Hide axes
-        plt.axis('off')
-        
-        # Add title
-        plt.title(f"Family Tree - {self.colony.name}", pad=20)
-        
-        # Save the plot to a temporary file
-        plt.savefig('temp_tree.png', bbox_inches='tight', dpi=300)
-        plt.close()
+        """Ask the render service for the current tree; it is drawn in a worker process and shown when ready"""
+        future = render_service.get_service().submit(self.colony, fmt='png')
+        self._latest = future
+        future.add_done_callback(self._on_rendered)
+
+    def _on_rendered(self, future):
+        # A newer request supersedes this one
+        if future is not self._latest:
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"Error rendering family tree: {error}")
+            return
+        self.rendered.emit(future.result())
+
+    def show_image(self, path: str):
+        pixmap = QPixmap(path)
+        self.image.setPixmap(pixmap.scaled(self.image.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
 
 class AnimalTreeTab(QWidget):
     def __init__(self, colony: Colony):
@@ -164,8 +140,8 @@ class AnimalTreeTab(QWidget):
             mother_id = self.mother_input.text().strip()
             father_id = self.father_input.text().strip()
             
-            mother = next((a for a in self.colony.animals if a.animal_id == mother_id), None) if mother_id else None
-            father = next((a for a in self.colony.animals if a.animal_id == father_id), None) if father_id else None
+            mother = self.colony.get_animal(mother_id) if mother_id else None
+            father = self.colony.get_animal(father_id) if father_id else None
             
             # Create and add animal
             animal = Animal(animal_id, sex, genotype, dob, mother, father)
@@ -358,8 +334,8 @@ def save_colony(colony: Colony, filename: str):
     if not os.path.isabs(filename):
         filename = os.path.join(os.getcwd(), filename)
     
-    with open(filename, 'w') as f:
-        json.dump(colony.to_dict(), f, indent=2)
+    # Write to a temporary file and rename it into place so readers never see a partial file
+    write_snapshot(filename, colony.to_dict(), indent=2)
 
 def load_colony(filename: str) -> Colony:
     """Load colony from JSON file"""
@@ -0,0 +1,289 @@
+"""Genotype parsing, Mendelian consistency checks and litter genotype forecasts"""
+import re
+import threading
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import parse_date
+
+# "Het (+/-)", "+/-", "(+/-)"; the allele pair is what counts, not the label
+_ALLELES = re.compile(r'\(?\s*([^\s/()]+)\s*/\s*([^\s/()]+)\s*\)?\s*$')
+# Labels written without an allele pair
+_LABELS = {'homo': ('+', '+'), 'het': ('+', '-'), 'wt': ('-', '-')}
+
+
+def parse_genotype(genotype) -> Optional[Tuple[str, str]]:
+    """Parse a genotype string into a sorted allele pair, or None if it names no alleles"""
+    if not genotype:
+        return None
+    match = _ALLELES.search(genotype)
+    if match:
+        return tuple(sorted(match.groups()))
+    return _LABELS.get(genotype.strip().lower())
+
+
+def possible_offspring(mother: Optional[Tuple[str, str]], father: Optional[Tuple[str, str]]):
+    """Get the set of allele pairs a pup of these parents can have; None for a parent means unknown"""
+    if mother is None or father is None:
+        return None
+    return {tuple(sorted((m, f))) for m in mother for f in father}
+
+
+def _inherits(child: Tuple[str, str], parent: Optional[Tuple[str, str]]) -> bool:
+    return parent is None or child[0] in parent or child[1] in parent
+
+
+def genotype_issue(animal, parsed: Dict) -> Optional[dict]:
+    """Check one animal against its parents; return an issue dict if its genotype is impossible
+
+    ``parsed`` caches parse_genotype results by genotype string; colonies use
+    a handful of distinct strings, so each is parsed once per pass.
+    """
+    def alleles(a):
+        if a is None:
+            return None
+        genotype = a.genotype
+        if genotype not in parsed:
+            parsed[genotype] = parse_genotype(genotype)
+        return parsed[genotype]
+
+    child = alleles(animal)
+    if child is None:
+        return None
+    mother, father = alleles(animal.mother), alleles(animal.father)
+    if mother is None and father is None:
+        return None
+    if mother is not None and father is not None:
+        possible = possible_offspring(mother, father)
+        if child in possible:
+            return None
+        reason = f"{'/'.join(child)} cannot come from {'/'.join(mother)} x {'/'.join(father)}"
+    else:
+        # One known parent must still pass on one of the pup's alleles
+        known = mother if mother is not None else father
+        if _inherits(child, known):
+            return None
+        reason = f"{'/'.join(child)} shares no allele with {'mother' if mother is not None else 'father'} {'/'.join(known)}"
+    return {
+        'animal_id': animal.animal_id,
+        'genotype': animal.genotype,
+        'mother_id': animal.mother.animal_id if animal.mother else None,
+        'mother_genotype': animal.mother.genotype if animal.mother else None,
+        'father_id': animal.father.animal_id if animal.father else None,
+        'father_genotype': animal.father.genotype if animal.father else None,
+        'reason': reason,
+    }
+
+
+class GenotypeChecker:
+    """Mendelian consistency issues for one colony, kept current incrementally
+
+    The first check is one linear pass over every animal. After that,
+    ``refresh`` asks the colony which animals were edited or removed since
+    the last check and rechecks only those and their children: a pup's
+    verdict depends on nothing but its own and its parents' genotypes.
+    """
+
+    def __init__(self):
+        # Animals whose genotype is impossible, as an insertion-ordered set
+        self.flagged: Dict[object, None] = {}
+        # How many animals the latest refresh looked at
+        self.last_checked = 0
+        self._position = None
+        self._parsed: Dict[str, Optional[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, colony, full: bool = False) -> int:
+        """Bring the flagged animals up to date; return how many animals were checked"""
+        with self._lock:
+            position, touched = colony.touched_since(self._position or 0)
+            if full or self._position is None or touched is None:
+                self.flagged = {}
+                animals = colony.animals
+            else:
+                affected = {}
+                for animal in touched:
+                    affected[animal] = None
+                    for child in animal.children:
+                        affected[child] = None
+                animals = list(affected)
+            for animal in animals:
+                if colony.get_animal(animal.animal_id) is animal and genotype_issue(animal, self._parsed):
+                    self.flagged[animal] = None
+                else:
+                    # Consistent now, or removed from the colony
+                    self.flagged.pop(animal, None)
+            self._position = position
+            self.last_checked = len(animals)
+            return self.last_checked
+
+    def issues(self, animals=None) -> List[dict]:
+        """Get the issues of the given animals, or of every flagged animal sorted by ID"""
+        with self._lock:
+            if animals is None:
+                animals = sorted(self.flagged, key=lambda animal: animal.animal_id)
+            issues = [genotype_issue(animal, self._parsed) for animal in animals if animal in self.flagged]
+        return [issue for issue in issues if issue]
+
+
+_checkers = weakref.WeakKeyDictionary()
+_checkers_lock = threading.Lock()
+
+
+def colony_checker(colony) -> GenotypeChecker:
+    """Get the colony's GenotypeChecker, refreshed with the edits made since it last ran"""
+    with _checkers_lock:
+        checker = _checkers.get(colony)
+        if checker is None:
+            checker = _checkers[colony] = GenotypeChecker()
+    checker.refresh(colony)
+    return checker
+
+
+# Breeding planner defaults for mice
+LITTER_SIZE = 6.0
+GESTATION_DAYS = 20
+LITTER_INTERVAL_DAYS = 28
+
+
+def genotype_label(alleles: Tuple[str, str], labels: Dict[Tuple[str, str], str]) -> str:
+    """Name an allele pair the way the colony writes it, e.g. 'Het (+/-)', falling back to '+/-'"""
+    return labels.get(alleles) or '/'.join(alleles)
+
+
+class OffspringTable:
+    """Expected offspring genotype ratios for every pair of parent genotypes
+
+    Each parsed genotype becomes a row of gamete probabilities over the
+    alleles seen in the colony. The ratios of every genotype pairing come
+    from one outer product, so scoring many pairs of animals is a single
+    table lookup (``pair_ratios``) instead of a Punnett square per pair.
+    """
+
+    def __init__(self, genotypes):
+        self.labels: Dict[Tuple[str, str], str] = {}
+        for genotype in genotypes:
+            parsed = parse_genotype(genotype)
+            if parsed and parsed not in self.labels:
+                self.labels[parsed] = genotype
+        self.parents = sorted(self.labels)
+        self.code = {parsed: i for i, parsed in enumerate(self.parents)}
+        alleles = sorted({allele for pair in self.parents for allele in pair})
+        position = {allele: i for i, allele in enumerate(alleles)}
+        gametes = np.zeros((len(self.parents), len(alleles)))
+        for i, (first, second) in enumerate(self.parents):
+            gametes[i, position[first]] += 0.5
+            gametes[i, position[second]] += 0.5
+        # ordered[m, f, a, b]: chance of allele a from mother m's genotype and b from father f's
+        ordered = np.einsum('ma,fb->mfab', gametes, gametes)
+        self.offspring = [(alleles[a], alleles[b]) for a in range(len(alleles)) for b in range(a, len(alleles))]
+        self.table = np.zeros((len(self.parents), len(self.parents), len(self.offspring)))
+        for k, (first, second) in enumerate(self.offspring):
+            a, b = position[first], position[second]
+            self.table[:, :, k] = ordered[:, :, a, b] + (ordered[:, :, b, a] if a != b else 0)
+
+    @property
+    def offspring_labels(self) -> List[str]:
+        return [genotype_label(alleles, self.labels) for alleles in self.offspring]
+
+    def codes(self, animals) -> np.ndarray:
+        """Get each animal's genotype row in the table, -1 where the genotype names no alleles"""
+        return np.array([self.code.get(parse_genotype(animal.genotype), -1) for animal in animals], dtype=np.int64)
+
+    def pair_ratios(self, mothers, fathers) -> np.ndarray:
+        """Get a len(mothers) x len(fathers) x offspring array of expected genotype ratios
+
+        Pairs where either parent's genotype is unknown are all NaN.
+        """
+        m, f = self.codes(mothers), self.codes(fathers)
+        ratios = self.table[m][:, f] if len(self.parents) else np.zeros((len(m), len(f), 0))
+        unknown = (m < 0)[:, None] | (f < 0)[None, :]
+        ratios[unknown] = np.nan
+        return ratios
+
+    def target_chance(self, mothers, fathers, genotype) -> np.ndarray:
+        """Get a len(mothers) x len(fathers) array of each pair's chance of a pup with ``genotype``
+
+        Pairs with an unknown parent genotype score -1. Raises ValueError if
+        ``genotype`` names no alleles.
+        """
+        target = parse_genotype(genotype)
+        if target is None:
+            raise ValueError(f"Cannot read alleles from genotype {genotype!r}")
+        m, f = self.codes(mothers), self.codes(fathers)
+        if target not in self.offspring:
+            chance = np.zeros((len(m), len(f)))
+        else:
+            chance = self.table[:, :, self.offspring.index(target)][m][:, f]
+        chance[(m < 0)[:, None] | (f < 0)[None, :]] = -1
+        return chance
+
+    def matched_ratios(self, mothers, fathers) -> np.ndarray:
+        """Get the expected genotype ratios of mothers[i] x fathers[i] for each i, NaN where unknown"""
+        m, f = self.codes(mothers), self.codes(fathers)
+        ratios = self.table[m, f] if len(self.parents) else np.zeros((len(m), 0))
+        ratios[(m < 0) | (f < 0)] = np.nan
+        return ratios
+
+    def ratios(self, mother, father) -> Optional[Dict[str, float]]:
+        """Get one pair's expected genotype ratios by label, or None if either genotype is unknown"""
+        row = self.pair_ratios([mother], [father])[0, 0]
+        if np.isnan(row).any():
+            return None
+        return {label: float(p) for label, p in zip(self.offspring_labels, row) if p > 0}
+
+
+def litters_in_window(date_mated, today, weeks: float, gestation_days: int = GESTATION_DAYS,
+                      interval_days: int = LITTER_INTERVAL_DAYS) -> int:
+    """Count litters born from today through ``weeks`` ahead for a pair mated on ``date_mated``
+
+    The first litter comes gestation_days after mating (today if the date is
+    unknown) and then one every interval_days.
+    """
+    # Litter k arrives first + k * interval_days days from today
+    first = ((date_mated or today) - today).days + gestation_days
+    end = int(weeks * 7)
+    if first > end:
+        return 0
+    k_min = -(first // interval_days) if first < 0 else 0
+    k_max = (end - first) // interval_days
+    return max(k_max - k_min + 1, 0)
+
+
+def forecast_litters(colony, weeks: float, today, litter_size: float = LITTER_SIZE,
+                     gestation_days: int = GESTATION_DAYS, interval_days: int = LITTER_INTERVAL_DAYS) -> dict:
+    """Forecast the pups of every active breeder cage by genotype over the coming weeks
+
+    A cage is active while both parents are alive. Expected pups are
+    litters in the window x litter_size x the pair's genotype ratios.
+    """
+    cages = []
+    for bc in colony.breeder_cages:
+        mother, father = colony.get_animal(bc.get('mother_id')), colony.get_animal(bc.get('father_id'))
+        if not mother or not father or mother.deceased or father.deceased:
+            continue
+        cages.append((bc, mother, father))
+    table = OffspringTable({animal.genotype for animal in colony.animals})
+    labels = table.offspring_labels
+    ratios = table.matched_ratios([mother for _, mother, _ in cages], [father for _, _, father in cages])
+    litters = np.array([litters_in_window(parse_date(bc.get('date_mated')), today, weeks,
+                                          gestation_days, interval_days) for bc, _, _ in cages], dtype=float)
+    pups = ratios * (litters * litter_size)[:, None]
+    known = ~np.isnan(pups).any(axis=1) if cages else np.zeros(0, dtype=bool)
+    totals = np.nansum(pups[known], axis=0) if known.any() else np.zeros(len(labels))
+    return {
+        'weeks': weeks,
+        'litter_size': litter_size,
+        'cages': [{
+            'cage_id': bc.get('cage_id'),
+            'mother_id': mother.animal_id,
+            'father_id': father.animal_id,
+            'litters': int(litters[i]),
+            'ratios': {label: float(p) for label, p in zip(labels, ratios[i]) if p > 0} if known[i] else None,
+            'expected_pups': {label: float(n) for label, n in zip(labels, pups[i]) if n > 0} if known[i] else None,
+        } for i, (bc, mother, father) in enumerate(cages)],
+        'unknown_genotype_cages': int((~known).sum()),
+        'expected_pups': {label: float(n) for label, n in zip(labels, totals)},
+    }
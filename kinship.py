@@ -0,0 +1,230 @@
+"""Wright's inbreeding and kinship coefficients from a colony's mother/father links"""
+import threading
+import weakref
+from typing import Dict, List
+
+import numpy as np
+
+from pedigree import assign_generations
+
+# Largest pedigree whose full kinship matrix is built (8 * 6000**2 bytes, about 290 MB)
+DENSE_LIMIT = 6000
+# Relationship columns computed together in blocked mode
+BLOCK_SIZE = 64
+
+
+class Kinship:
+    """Kinship and inbreeding coefficients for some animals and all of their ancestors
+
+    Animals are numbered in generation order, so parents always come before
+    their offspring and each generation is a contiguous range that can be
+    processed as one NumPy step. Up to DENSE_LIMIT animals the whole kinship
+    matrix is built with the tabular method. Larger pedigrees use blocked
+    mode: nothing N x N is stored. Inbreeding comes from a sliding table of
+    kinship among the animals still breeding, and the kinship columns a query
+    needs are computed BLOCK_SIZE at a time from the sparse parent links
+    (Colleau's indirect method).
+    """
+
+    def __init__(self, animals):
+        # Close the set under parents; unknown parents are simply absent
+        members = {}
+        stack = list(animals)
+        while stack:
+            animal = stack.pop()
+            if animal in members:
+                continue
+            members[animal] = None
+            stack.extend(parent for parent in (animal.mother, animal.father) if parent is not None)
+        edges = [(parent, animal) for animal in members
+                 for parent in (animal.mother, animal.father) if parent is not None]
+        generations = assign_generations(members, edges)
+        self.animals = sorted(members, key=lambda a: (generations[a], a.animal_id))
+        self.index = {animal: i for i, animal in enumerate(self.animals)}
+
+        n = len(self.animals)
+        # Index n stands for an unknown parent and always reads as zero
+        self.sire = np.full(n, n, dtype=np.int64)
+        self.dam = np.full(n, n, dtype=np.int64)
+        for i, animal in enumerate(self.animals):
+            if animal.father is not None:
+                self.sire[i] = self.index[animal.father]
+            if animal.mother is not None:
+                self.dam[i] = self.index[animal.mother]
+        levels = np.array([generations[a] for a in self.animals], dtype=np.int64)
+        bounds = np.flatnonzero(np.diff(levels)) + 1
+        starts = np.concatenate(([0], bounds)).tolist() if n else []
+        self.generations = list(zip(starts, starts[1:] + [n]))
+
+        self.dense = n <= DENSE_LIMIT
+        if self.dense:
+            self._matrix = self._tabular()
+            self.inbreeding = 2 * np.diagonal(self._matrix)[:n] - 1
+        else:
+            self._matrix = None
+            self.inbreeding = self._blocked_inbreeding()
+            self._parent_groups = [self._group_by_parent(a, b) for a, b in self.generations]
+
+    def __len__(self):
+        return len(self.animals)
+
+    def _tabular(self) -> np.ndarray:
+        """Build the kinship matrix a generation at a time, padded with a zero row and column"""
+        n = len(self.animals)
+        K = np.zeros((n + 1, n + 1))
+        for a, b in self.generations:
+            s, d = self.sire[a:b], self.dam[a:b]
+            if a:
+                # Kinship with earlier animals is the mean of the parents' kinship with them
+                K[a:b, :a] = 0.5 * (K[s, :a] + K[d, :a])
+                K[:a, a:b] = K[a:b, :a].T
+            # Animals of one generation are never each other's ancestors, so the same rule applies
+            K[a:b, a:b] = 0.5 * (K[s, a:b] + K[d, a:b])
+            idx = np.arange(a, b)
+            K[idx, idx] = 0.5 * (1 + K[s, d])
+        return K
+
+    def _group_by_parent(self, a: int, b: int):
+        """Get (children, parents, starts) for summing the rows of generation [a, b) into their known parents
+
+        ``children`` lists child rows (once per known parent) ordered by
+        parent, ``parents`` the distinct parents and ``starts`` where each
+        parent's run begins, ready for np.add.reduceat.
+        """
+        n = len(self.animals)
+        children = np.concatenate((np.arange(a, b), np.arange(a, b)))
+        parents = np.concatenate((self.sire[a:b], self.dam[a:b]))
+        known = parents < n
+        children, parents = children[known], parents[known]
+        order = np.argsort(parents, kind='stable')
+        children, parents = children[order], parents[order]
+        starts = np.flatnonzero(np.diff(parents, prepend=-1))
+        return children, parents[starts], starts
+
+    def _mendelian_variances(self, inbreeding: np.ndarray, a: int, b: int) -> np.ndarray:
+        """Within-family variance of each animal in [a, b) given its parents' inbreeding; D in A = T D T'"""
+        # Padding reads as F = -1 so an unknown parent contributes nothing
+        padded = np.append(inbreeding, -1.0)
+        return 1 - 0.25 * ((1 + padded[self.sire[a:b]]) + (1 + padded[self.dam[a:b]]))
+
+    def _relationship_columns(self, columns: np.ndarray, stop: int, variances: np.ndarray) -> np.ndarray:
+        """Get additive relationship (2 x kinship) columns for the first ``stop`` animals
+
+        Solves A x = T D T' x for unit vectors x with one pass up the pedigree
+        and one pass down, each a few array operations per generation.
+        """
+        n = len(self.animals)
+        X = np.zeros((n + 1, len(columns)))
+        X[columns, np.arange(len(columns))] = 1.0
+        scope = [(a, b) for a, b in self.generations if b <= stop]
+        for level in range(len(scope) - 1, -1, -1):
+            children, parents, starts = self._parent_groups[level]
+            if len(children):
+                X[parents] += 0.5 * np.add.reduceat(X[children], starts)
+        X[:stop] *= variances[:stop, None]
+        for a, b in scope:
+            X[a:b] += 0.5 * (X[self.sire[a:b]] + X[self.dam[a:b]])
+        return X[:stop]
+
+    def _blocked_inbreeding(self) -> np.ndarray:
+        """Get each animal's inbreeding coefficient, F = kinship of its parents, generation by generation
+
+        Only kinship among the active animals is kept: those with offspring in
+        a generation not processed yet. Each animal joins when its generation
+        is reached and leaves after its last offspring's generation, so memory
+        follows the number of concurrent breeders rather than the colony size.
+        """
+        n = len(self.animals)
+        levels = np.empty(n, dtype=np.int64)
+        for level, (a, b) in enumerate(self.generations):
+            levels[a:b] = level
+        last_litter = np.full(n + 1, -1, dtype=np.int64)
+        for parents in (self.sire, self.dam):
+            known = parents < n
+            np.maximum.at(last_litter, parents[known], levels[known])
+
+        inbreeding = np.zeros(n)
+        # Slot 0 stands for an unknown parent and keeps a zero row and column
+        active = np.array([n], dtype=np.int64)
+        K = np.zeros((1, 1))
+        slot = np.zeros(n + 1, dtype=np.int64)
+        for level, (a, b) in enumerate(self.generations):
+            ps, pd = slot[self.sire[a:b]], slot[self.dam[a:b]]
+            F = K[ps, pd]
+            inbreeding[a:b] = F
+
+            # Carry forward the unknown-parent slot and everyone with offspring still to come
+            old = np.flatnonzero(last_litter[active] > level)
+            old = np.concatenate(([0], old[old > 0]))
+            new = np.flatnonzero(last_litter[a:b] > level)
+            ps, pd = ps[new], pd[new]
+            # Kinship of the kept newcomers with every active animal, then with each other
+            rows = 0.5 * (K[ps] + K[pd])
+            within = 0.5 * (rows[:, ps] + rows[:, pd])
+            within[np.diag_indices(len(new))] = 0.5 * (1 + F[new])
+            cross = rows[:, old]
+            k = len(old)
+            grown = np.empty((k + len(new),) * 2)
+            grown[:k, :k] = K[old][:, old]
+            grown[k:, :k] = cross
+            grown[:k, k:] = cross.T
+            grown[k:, k:] = within
+            K = grown
+            active = np.concatenate((active[old], a + new))
+            slot[active] = np.arange(len(active))
+        self._variances = np.concatenate([self._mendelian_variances(inbreeding, a, b)
+                                          for a, b in self.generations]) if n else np.ones(0)
+        return inbreeding
+
+    def kinship(self, rows: List, columns: List) -> np.ndarray:
+        """Get the kinship coefficients between two lists of animals as a len(rows) x len(columns) array"""
+        r = np.array([self.index[animal] for animal in rows], dtype=np.int64)
+        c = np.array([self.index[animal] for animal in columns], dtype=np.int64)
+        if self.dense:
+            return self._matrix[np.ix_(r, c)]
+        result = np.empty((len(r), len(c)))
+        n = len(self.animals)
+        for start in range(0, len(c), BLOCK_SIZE):
+            A = self._relationship_columns(c[start:start + BLOCK_SIZE], n, self._variances)
+            result[:, start:start + BLOCK_SIZE] = 0.5 * A[r]
+        return result
+
+    def inbreeding_of(self, animal) -> float:
+        return float(self.inbreeding[self.index[animal]])
+
+
+# Whole-colony Kinship per colony object: (pedigree_version, Kinship)
+_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+
+def colony_kinship(colony) -> Kinship:
+    """Get the Kinship of every animal in a colony, cached until its parent links change"""
+    with _cache_lock:
+        cached = _cache.get(colony)
+    version = colony.pedigree_version
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    kinship = Kinship(colony.animals)
+    with _cache_lock:
+        _cache[colony] = (version, kinship)
+    return kinship
+
+
+def rank_breeding_pairs(kinship: Kinship, males: List, females: List, limit: int = 20) -> List[Dict]:
+    """Rank male/female pairs by kinship, lowest first
+
+    A pair's kinship is also the inbreeding coefficient of its offspring.
+    Ties are broken by male then female ID.
+    """
+    if not males or not females:
+        return []
+    K = kinship.kinship(males, females)
+    order = np.lexsort((np.tile(np.arange(len(females)), len(males)),
+                        np.repeat(np.arange(len(males)), len(females)),
+                        K.ravel()))[:limit]
+    return [{
+        'father_id': males[i // len(females)].animal_id,
+        'mother_id': females[i % len(females)].animal_id,
+        'kinship': float(K.flat[i]),
+    } for i in order]
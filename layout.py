@@ -0,0 +1,502 @@
+"""Layered pedigree layout: generations as rows, ordered to keep families together and edges uncrossed"""
+import math
+import threading
+import weakref
+from bisect import bisect_left, bisect_right
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from pedigree import assign_generations
+
+Node = Hashable
+
+# Animals added since the cached layout, as a share of it, above which the tree is laid out afresh
+INCREMENTAL_SHARE = 0.05
+# Most nodes a viewport query returns before animals collapse into clusters, then clusters into bins
+VIEW_NODE_LIMIT = 1500
+
+
+def count_crossings(order_upper: Dict[Node, int], order_lower: Dict[Node, int],
+                    edges: Iterable[Tuple[Node, Node]]) -> int:
+    """Count crossings between edges joining two rows, in O(E log E)
+
+    Two edges cross when their upper ends and lower ends are in opposite
+    orders, so the count is the number of inversions in the lower positions
+    once edges are sorted by upper position.
+    """
+    pairs = sorted((order_upper[u], order_lower[v]) for u, v in edges)
+    size = max((lower for _, lower in pairs), default=-1) + 1
+    # Fenwick tree of how many edges seen so far end at each lower position
+    tree = [0] * (size + 1)
+    crossings = 0
+    for seen, (_, lower) in enumerate(pairs):
+        # Edges already seen whose lower end lies strictly to the right cross this one
+        i, at_or_left = lower + 1, 0
+        while i:
+            at_or_left += tree[i]
+            i &= i - 1
+        crossings += seen - at_or_left
+        i = lower + 1
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+    return crossings
+
+
+class PedigreeLayout:
+    """Sugiyama-style layout of a pedigree
+
+    1. Layering: each animal goes one row below its deepest parent
+       (pedigree.assign_generations), founders on row 0.
+    2. Ordering: rows are reordered by alternating down and up barycenter
+       sweeps, keeping the order with the fewest crossings. Animals are
+       ordered in units: mates (animals with a litter together) form one
+       unit so couples sit side by side, and siblings share a sort key so
+       litters stay together.
+    3. Placement: each animal is pulled towards the mean position of its
+       parents, then of its children, keeping at least ``gap`` between
+       neighbours.
+
+    Edges that skip rows (e.g. a backcross to a grandparent) are not split
+    into dummy nodes; they use the real parent's position, which keeps
+    every step near linear in the number of animals and links.
+    ``positions`` maps each node to (x, row).
+    """
+
+    def __init__(self, nodes: Iterable[Node], edges: Iterable[Tuple[Node, Node]],
+                 sweeps: int = 4, gap: float = 1.0):
+        self.nodes = list(nodes)
+        node_set = set(self.nodes)
+        self.edges = [(parent, child) for parent, child in edges if parent in node_set and child in node_set]
+        self.parents: Dict[Node, List[Node]] = {node: [] for node in self.nodes}
+        self.children: Dict[Node, List[Node]] = {node: [] for node in self.nodes}
+        for parent, child in self.edges:
+            self.parents[child].append(parent)
+            self.children[parent].append(child)
+        self.gap = gap
+        self.rows = assign_generations(self.nodes, self.edges)
+        self.layers: List[List[Node]] = [[] for _ in range(max(self.rows.values(), default=-1) + 1)]
+        for node in sorted(self.nodes, key=self._initial_key):
+            self.layers[self.rows[node]].append(node)
+        self.mates = self._mate_units()
+        # Links between adjacent rows, the ones crossings are counted on
+        self._adjacent: Dict[int, List[Tuple[Node, Node]]] = {}
+        for parent, child in self.edges:
+            if self.rows[child] == self.rows[parent] + 1:
+                self._adjacent.setdefault(self.rows[parent], []).append((parent, child))
+        self.position = self._positions()
+        self._order(sweeps)
+        self.positions = self._place()
+
+    def _initial_key(self, node):
+        # Linked animals first, isolated ones at the end of their row
+        return (not self.parents[node] and not self.children[node], str(node))
+
+    def _mate_units(self) -> Dict[Node, int]:
+        """Group each row's animals into units of mates (animals sharing a litter)"""
+        partner: Dict[Node, Node] = {}
+
+        def find(node):
+            while partner.get(node, node) != node:
+                partner[node] = partner.get(partner[node], partner[node])
+                node = partner[node]
+            return node
+
+        for node in self.nodes:
+            parents = self.parents[node]
+            for other in parents[1:]:
+                first = parents[0]
+                if self.rows[first] == self.rows[other]:
+                    root_a, root_b = find(first), find(other)
+                    if root_a != root_b:
+                        partner[root_b] = root_a
+        units: Dict[Node, int] = {}
+        roots: Dict[Node, int] = {}
+        for node in self.nodes:
+            units[node] = roots.setdefault(find(node), len(roots))
+        return units
+
+    def _positions(self) -> Dict[Node, int]:
+        return {node: i for layer in self.layers for i, node in enumerate(layer)}
+
+    def _reorder(self, layer: List[Node], neighbours: Dict[Node, List[Node]], position: Dict[Node, int]) -> List[Node]:
+        """Sort one row by the barycenter of each animal's neighbours in already-ordered rows"""
+        def barycenter(node):
+            linked = [position[n] for n in neighbours[node]]
+            return sum(linked) / len(linked) if linked else float(position[node])
+
+        own = {node: barycenter(node) for node in layer}
+        # A unit of mates sits at the mean of its members' barycenters
+        unit_members: Dict[int, List[Node]] = {}
+        for node in layer:
+            unit_members.setdefault(self.mates[node], []).append(node)
+        unit_center = {unit: sum(own[n] for n in members) / len(members) for unit, members in unit_members.items()}
+
+        def key(node):
+            unit = self.mates[node]
+            # Siblings share parents, so sorting by the parent pair keeps a litter together
+            litter = tuple(sorted(map(str, self.parents[node])))
+            return (unit_center[unit], unit, own[node], litter, position[node])
+
+        return sorted(layer, key=key)
+
+    def _crossings(self) -> Dict[int, int]:
+        """Count crossings below each row that has links to the next one"""
+        return {row: count_crossings(self.position, self.position, edges) for row, edges in self._adjacent.items()}
+
+    def _order(self, sweeps: int):
+        best = [list(layer) for layer in self.layers]
+        best_rows = self._crossings()
+        best_crossings = sum(best_rows.values())
+        for sweep in range(sweeps):
+            downward = sweep % 2 == 0
+            indices = range(1, len(self.layers)) if downward else range(len(self.layers) - 2, -1, -1)
+            neighbours = self.parents if downward else self.children
+            for index in indices:
+                self.layers[index] = self._reorder(self.layers[index], neighbours, self.position)
+                self.position.update((node, i) for i, node in enumerate(self.layers[index]))
+            rows = self._crossings()
+            if sum(rows.values()) < best_crossings:
+                best, best_rows, best_crossings = [list(layer) for layer in self.layers], rows, sum(rows.values())
+        self.layers = best
+        self.position = self._positions()
+        self._row_crossings = best_rows
+        self.crossings = best_crossings
+
+    def _fit(self, layer: List[Node], desired: Dict[Node, float]) -> Dict[Node, float]:
+        """Place a row as close to the desired x values as its order and gap allow"""
+        left, right = [], []
+        for node in layer:
+            x = desired[node]
+            left.append(max(x, left[-1] + self.gap) if left else x)
+        for node in reversed(layer):
+            x = desired[node]
+            right.append(min(x, right[-1] - self.gap) if right else x)
+        right.reverse()
+        # Both passes keep the order and the gap, and so does their average
+        return {node: (a + b) / 2 for node, a, b in zip(layer, left, right)}
+
+    def _place(self) -> Dict[Node, Tuple[float, int]]:
+        x: Dict[Node, float] = {}
+        for layer in self.layers:
+            desired = {}
+            for i, node in enumerate(layer):
+                parents = [x[p] for p in self.parents[node] if p in x]
+                desired[node] = sum(parents) / len(parents) if parents else float(i) * self.gap
+            x.update(self._fit(layer, desired))
+        for layer in reversed(self.layers[:-1]):
+            desired = {}
+            for node in layer:
+                children = [x[c] for c in self.children[node]]
+                desired[node] = (x[node] + sum(children) / len(children)) / 2 if children else x[node]
+            x.update(self._fit(layer, desired))
+        shift = min(x.values(), default=0.0)
+        return {node: (x[node] - shift, self.rows[node]) for node in self.nodes}
+
+    def extended(self, nodes: Iterable[Node], edges: Iterable[Tuple[Node, Node]]) -> "PedigreeLayout":
+        """Get a copy of this layout with new childless nodes placed without reordering the rest
+
+        Each new node goes on the row below its deepest parent, after its
+        siblings or else under its parents, and only nodes of that row move
+        aside to make room. Raises ValueError if a new node is the parent of
+        a node already laid out.
+        """
+        tree = object.__new__(PedigreeLayout)
+        tree.__dict__.update(self.__dict__)
+        added = list(nodes)
+        tree.nodes = self.nodes + added
+        tree.rows, tree.mates = dict(self.rows), dict(self.mates)
+        tree.position, tree.positions = dict(self.position), dict(self.positions)
+        tree.parents = {node: list(parents) for node, parents in self.parents.items()}
+        tree.children = {node: list(children) for node, children in self.children.items()}
+        tree.layers = [list(layer) for layer in self.layers]
+        tree._adjacent = {row: list(links) for row, links in self._adjacent.items()}
+        tree._row_crossings = dict(self._row_crossings)
+        node_set = set(tree.nodes)
+        new_edges = [(parent, child) for parent, child in edges if parent in node_set and child in node_set]
+        for node in added:
+            tree.parents[node], tree.children[node] = [], []
+        for parent, child in new_edges:
+            if child in self.rows:
+                raise ValueError(f"{parent} is a parent of {child}, which is already laid out")
+            tree.parents[child].append(parent)
+            tree.children[parent].append(child)
+        tree.edges = self.edges + new_edges
+        # New parents go in before their new offspring
+        among_added = assign_generations(added, [(p, c) for p, c in new_edges if p not in self.rows])
+        changed = set()
+        for node in sorted(added, key=among_added.get):
+            row = tree._insert(node)
+            changed.update((row - 1, row))
+        for row in changed:
+            if row in tree._adjacent:
+                tree._row_crossings[row] = count_crossings(tree.position, tree.position, tree._adjacent[row])
+        tree.crossings = sum(tree._row_crossings.values())
+        return tree
+
+    def _insert(self, node) -> int:
+        """Place one new node on its row, pushing the nodes to its right along; return the row"""
+        parents = self.parents[node]
+        row = max((self.rows[p] for p in parents), default=-1) + 1
+        self.rows[node] = row
+        self.mates[node] = len(self.mates)
+        if row == len(self.layers):
+            self.layers.append([])
+        for parent in parents:
+            if self.rows[parent] == row - 1:
+                self._adjacent.setdefault(row - 1, []).append((parent, node))
+        layer = self.layers[row]
+        xs = [self.positions[other][0] for other in layer]
+        if parents:
+            desired = sum(self.positions[p][0] for p in parents) / len(parents)
+            litter = sorted(parents, key=str)
+            siblings = [self.position[c] for c in self.children[parents[0]]
+                        if c in self.position and sorted(self.parents[c], key=str) == litter]
+            index = max(siblings) + 1 if siblings else bisect_right(xs, desired)
+        else:
+            desired = xs[-1] + self.gap if xs else 0.0
+            index = len(layer)
+        x = max(desired, xs[index - 1] + self.gap) if index else desired
+        layer.insert(index, node)
+        self.positions[node] = (x, row)
+        for other in layer[index + 1:]:
+            if self.positions[other][0] >= x + self.gap:
+                break
+            x += self.gap
+            self.positions[other] = (x, row)
+        for i in range(index, len(layer)):
+            self.position[layer[i]] = i
+        return row
+
+
+def colony_layout(colony, animals: Optional[Iterable] = None, **options) -> PedigreeLayout:
+    """Lay out a colony's animals (or just the given ones), keyed by animal ID"""
+    animals = list(colony.animals if animals is None else animals)
+    edges = [(parent.animal_id, animal.animal_id) for animal in animals
+             for parent in (animal.mother, animal.father) if parent is not None]
+    return PedigreeLayout([animal.animal_id for animal in animals], edges, **options)
+
+
+# Layouts per colony object: {include_deceased: (version, links, key, PedigreeLayout)}
+_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+
+def _links(animals) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    return {a.animal_id: (a.mother.animal_id if a.mother else None, a.father.animal_id if a.father else None)
+            for a in animals}
+
+
+def _extend(old, tree: PedigreeLayout, links) -> Optional[PedigreeLayout]:
+    """Place animals added since the cached layout into it, or None if anything else changed"""
+    added = [animal_id for animal_id in links if animal_id not in old]
+    if not added or len(added) > INCREMENTAL_SHARE * len(old) or len(links) != len(old) + len(added):
+        return None
+    if any(links[animal_id] != parents for animal_id, parents in old.items()):
+        return None
+    new = set(added)
+    edges = [(parent, animal_id) for animal_id, parents in links.items() for parent in parents
+             if parent is not None and (animal_id in new or parent in new)]
+    try:
+        return tree.extended(added, edges)
+    except ValueError:
+        return None
+
+
+def cached_layout(colony, include_deceased: bool = True) -> PedigreeLayout:
+    """Get a colony's layout, reused while its (id, mother, father) links are unchanged
+
+    The layout is returned straight from the cache while the colony's
+    pedigree version is unchanged (its version when deceased animals are
+    left out, since deaths don't touch the pedigree). Otherwise the links
+    are compared: edits that leave the pedigree alone reuse the cached
+    layout, and when animals were only added they are placed into it with
+    PedigreeLayout.extended instead of laying out the whole tree.
+    """
+    version = colony.pedigree_version if include_deceased else colony.version
+    with _cache_lock:
+        cached = _cache.get(colony, {}).get(include_deceased)
+    if cached is not None and cached[0] == version:
+        return cached[3]
+    animals = [a for a in colony.animals if include_deceased or not a.deceased]
+    links = _links(animals)
+    key = hash(frozenset(links.items()))
+    if cached is not None and cached[2] == key and cached[1] == links:
+        tree = cached[3]
+    else:
+        tree = _extend(cached[1], cached[3], links) if cached is not None else None
+        if tree is None:
+            tree = colony_layout(colony, animals)
+    with _cache_lock:
+        _cache.setdefault(colony, {})[include_deceased] = (version, links, key, tree)
+    return tree
+
+
+def normalized(positions: Dict[Node, Tuple[float, int]]) -> Dict[Node, Tuple[float, float]]:
+    """Scale positions into the unit square with row 0 at the top (y = 1)"""
+    if not positions:
+        return {}
+    width = max(x for x, _ in positions.values())
+    depth = max(row for _, row in positions.values()) or 1
+    return {node: (x / width if width else 0.5, 1 - row / depth) for node, (x, row) in positions.items()}
+
+
+def litter_groups(tree: PedigreeLayout) -> Dict[Node, str]:
+    """Group nodes by their parents: one cluster per litter, with the founders together"""
+    return {node: 'litter:' + '|'.join(map(str, tree.parents[node])) for node in tree.nodes}
+
+
+def cage_groups(colony, tree: PedigreeLayout) -> Dict[Node, str]:
+    """Group a colony's laid-out animals by cage"""
+    return {a.animal_id: f"cage:{a.cage_id or ''}" for a in colony.animals if a.animal_id in tree.positions}
+
+
+def cluster_label(key: str, size: int) -> str:
+    kind, _, name = key.partition(':')
+    if kind == 'litter':
+        return f"Litter of {name.replace('|', ' x ')} ({size})" if name else f"Founders ({size})"
+    return f"Cage {name} ({size})" if name else f"No cage ({size})"
+
+
+class TreeView:
+    """Viewport queries over a layout at three levels of detail
+
+    Rows are sorted by x, so the animals inside a box take one bisection per
+    row to find. With at most ``limit`` animals in view they are returned as
+    they are. Otherwise each group in view (a litter or a cage) becomes one
+    cluster node, except groups listed in ``expanded``, and if there are
+    still too many nodes each row is cut into equal-width bins. Links are
+    summed between whatever their ends were collapsed into, so the cost
+    follows what is in view rather than the colony size.
+    """
+
+    def __init__(self, tree: PedigreeLayout, groups: Dict[Node, str]):
+        self.tree = tree
+        self.groups = groups
+        self.xs = [[tree.positions[node][0] for node in layer] for layer in tree.layers]
+        self.members: Dict[str, List[Node]] = {}
+        for node in tree.nodes:
+            self.members.setdefault(groups[node], []).append(node)
+        # Clusters sit at the mean position of all their members, in view or not
+        self.centers = {key: (sum(tree.positions[n][0] for n in members) / len(members),
+                              sum(tree.rows[n] for n in members) / len(members))
+                        for key, members in self.members.items()}
+
+    def visible(self, x0: float, x1: float, row0: float, row1: float) -> List[Node]:
+        """Get the nodes with x0 <= x <= x1 and row0 <= row <= row1"""
+        nodes = []
+        for row in range(math.ceil(max(row0, 0)), math.floor(min(row1, len(self.xs) - 1)) + 1):
+            xs = self.xs[row]
+            nodes.extend(self.tree.layers[row][bisect_left(xs, x0):bisect_right(xs, x1)])
+        return nodes
+
+    def query(self, box: Optional[Tuple[float, float, float, float]] = None, expanded: Iterable[str] = (),
+              detail: str = 'auto', limit: int = VIEW_NODE_LIMIT) -> dict:
+        """Get what to draw inside box = (x0, x1, row0, row1), or the whole tree if box is None
+
+        detail is 'auto', 'animals', 'clusters' or 'bins'. Returns the detail
+        used, ``nodes`` (dicts of id, kind, x, row, size, label and context,
+        true for parents drawn from outside the box) and ``edges`` as
+        [source, target, count].
+        """
+        if detail not in ('auto', 'animals', 'clusters', 'bins'):
+            raise ValueError(f"Unknown detail level {detail!r}")
+        tree = self.tree
+        visible = self.visible(*(box or (-math.inf, math.inf, -math.inf, math.inf)))
+        expanded = set(expanded)
+        clusters = {self.groups[node] for node in visible} - expanded
+        auto = detail == 'auto'
+        if auto:
+            detail = 'animals' if len(visible) <= limit else 'clusters'
+        if auto and detail == 'clusters':
+            shown = len(clusters) + sum(1 for node in visible if self.groups[node] in expanded)
+            if shown > limit:
+                detail = 'bins'
+
+        if detail == 'bins':
+            rows = {tree.rows[node] for node in visible}
+            per_row = max(limit // max(len(rows), 1), 1)
+            xs = [tree.positions[node][0] for node in visible]
+            left = min(xs, default=0.0)
+            width = max((max(xs, default=0.0) - left) / per_row, tree.gap)
+
+            def display(node):
+                x, row = tree.positions[node]
+                return f"bin:{row}:{int((x - left) // width)}", 'bin'
+        elif detail == 'clusters':
+            def display(node):
+                key = self.groups[node]
+                return (node, 'animal') if key in expanded else (key, 'cluster')
+        else:
+            def display(node):
+                return node, 'animal'
+
+        # id -> [kind, sum of x, sum of rows, animals, context]
+        nodes: Dict[Node, list] = {}
+
+        def add(node, context):
+            key, kind = display(node)
+            entry = nodes.get(key)
+            if entry is None:
+                entry = nodes[key] = [kind, 0.0, 0, 0, context]
+            x, row = tree.positions[node]
+            entry[1] += x
+            entry[2] += row
+            entry[3] += 1
+            return key
+
+        edges: Dict[Tuple[Node, Node], int] = {}
+        targets = [add(node, False) for node in visible]
+        outside = set()
+        for node, target in zip(visible, targets):
+            for parent in tree.parents[node]:
+                source = display(parent)[0]
+                if parent not in outside and (source not in nodes or nodes[source][4]):
+                    # A parent outside the box is drawn as context so the link has both ends
+                    outside.add(parent)
+                    add(parent, True)
+                if source != target:
+                    edges[(source, target)] = edges.get((source, target), 0) + 1
+
+        result = []
+        for key, (kind, x, row, count, context) in nodes.items():
+            if kind == 'cluster':
+                (x, row), size = self.centers[key], len(self.members[key])
+                label = cluster_label(key, size)
+            else:
+                x, row, size = x / count, row / count, count
+                label = key if kind == 'animal' else f"{count} animals"
+            result.append({'id': key, 'kind': kind, 'x': x, 'row': row, 'size': size,
+                           'label': label, 'context': context})
+        return {
+            'detail': detail,
+            'total': len(tree.nodes),
+            'in_view': len(visible),
+            'nodes': result,
+            'edges': [[source, target, count] for (source, target), count in edges.items()],
+        }
+
+
+# Viewport indexes per layout: {(grouping, colony version or None): TreeView}
+_views = weakref.WeakKeyDictionary()
+
+
+def tree_view(colony, include_deceased: bool = True, grouping: str = 'litter') -> TreeView:
+    """Get a TreeView of the colony's cached layout, grouping animals by 'litter' or 'cage'
+
+    Litter groups only change with the layout; cage groups are rebuilt when
+    the colony version changes.
+    """
+    if grouping not in ('litter', 'cage'):
+        raise ValueError(f"Cannot group animals by {grouping!r}")
+    tree = cached_layout(colony, include_deceased)
+    key = (grouping, colony.version if grouping == 'cage' else None)
+    with _cache_lock:
+        view = _views.get(tree, {}).get(key)
+    if view is None:
+        groups = cage_groups(colony, tree) if grouping == 'cage' else litter_groups(tree)
+        view = TreeView(tree, groups)
+        with _cache_lock:
+            views = {k: v for k, v in _views.get(tree, {}).items() if k[0] != grouping}
+            views[key] = view
+            _views[tree] = views
+    return view
@@ -1,21 +1,50 @@
-from datetime import date
-from typing import Optional, List
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Optional, Iterable, List, Dict
 import json
+import sys
+import threading
+
+from pedigree import (PedigreeCycleError, ancestor_depths, descendant_depths,
+                      lowest_common_ancestors, relationship_path)
+
+def parse_date(value) -> Optional[date]:
+    """Parse a stored date or datetime string into a date"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        # Fast path: ISO dates, ignoring any time component
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return datetime.strptime(value.split('T')[0], '%Y-%m-%d').date()
+
+def intern_value(value):
+    """Intern a categorical string so animals sharing it share one object"""
+    return sys.intern(value) if type(value) is str else value
 
 class Animal:
+    # No per-instance __dict__; colonies hold many thousands of animals
+    __slots__ = ('animal_id', 'sex', 'genotype', 'dob', 'mother', 'father', 'children',
+                 'notes', 'cage_id', 'old_cage_id', 'date_weaned', 'deceased')
+
     def __init__(self, animal_id: str, sex: str, genotype: str, dob: date,
                  mother: Optional["Animal"] = None, father: Optional["Animal"] = None,
                  notes: Optional[str] = None, cage_id: Optional[str] = None,
                  date_weaned: Optional[date] = None):
         self.animal_id = animal_id
-        self.sex = sex
-        self.genotype = genotype
+        self.sex = intern_value(sex)
+        self.genotype = intern_value(genotype)
         self.dob = dob
         self.mother = mother
         self.father = father
         self.children: List["Animal"] = []
         self.notes = notes
-        self.cage_id = cage_id
+        self.cage_id = intern_value(cage_id)
         self.old_cage_id: Optional[str] = None
         self.date_weaned = date_weaned
         self.deceased = False
@@ -48,18 +77,16 @@ class Animal:
     @classmethod
     def from_dict(cls, data: dict):
         """Create animal from dictionary"""
-        date_weaned = None
-        if data.get('date_weaned'):
-            try:
-                date_weaned = date.fromisoformat(data['date_weaned'])
-            except (ValueError, TypeError):
-                date_weaned = None
+        try:
+            date_weaned = parse_date(data.get('date_weaned'))
+        except (ValueError, TypeError):
+            date_weaned = None
                 
         animal = cls(
             animal_id=data['animal_id'],
             sex=data['sex'],
             genotype=data['genotype'],
-            dob=date.fromisoformat(data['dob']),
+            dob=parse_date(data['dob']),
             notes=data.get('notes'),
             cage_id=data.get('cage_id'),
             date_weaned=date_weaned
@@ -70,69 +97,380 @@ class Animal:
             animal.old_cage_id = data['old_cage_id']
         return animal
 
+class RWLock:
+    """Reader/writer lock: many concurrent readers or one writer
+
+    Writers are preferred so a steady stream of readers can't starve them.
+    The writing thread may re-acquire the write lock and may also take read
+    locks, so a locked route can call helpers that lock again.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer != me:
+                while self._writer is not None or self._waiting_writers:
+                    self._cond.wait()
+                self._readers += 1
+        try:
+            yield
+        finally:
+            if self._writer != me:
+                with self._cond:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._write_depth += 1
+            else:
+                self._waiting_writers += 1
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+                self._waiting_writers -= 1
+                self._writer = me
+                self._write_depth = 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._cond.notify_all()
+
+def _sort_value(key: str):
+    """Get a function reading a sortable field from an animal"""
+    if key == 'mother_id':
+        return lambda a: a.mother.animal_id if a.mother else None
+    if key == 'father_id':
+        return lambda a: a.father.animal_id if a.father else None
+    if key == 'deceased':
+        return lambda a: bool(getattr(a, 'deceased', False))
+    return lambda a: getattr(a, key, None) or None
+
+
+def sort_animals(animals, key: str = 'animal_id', descending: bool = False) -> list:
+    """Sort animals by a field, ties broken by ID; animals missing the field go last"""
+    value = _sort_value(key)
+    present = [a for a in animals if value(a) is not None]
+    missing = [a for a in animals if value(a) is None]
+    present.sort(key=lambda a: (value(a), a.animal_id), reverse=descending)
+    missing.sort(key=lambda a: a.animal_id)
+    return present + missing
+
+
 class Colony:
+    # Fields the animal listing can be sorted by
+    SORT_KEYS = ('animal_id', 'sex', 'genotype', 'dob', 'date_weaned', 'cage_id',
+                 'mother_id', 'father_id', 'deceased')
+    # Ancestor/descendant closures kept per pedigree version
+    CLOSURE_CACHE_SIZE = 256
+    # Recent edits remembered for touched_since before the oldest are dropped
+    TOUCHED_LIMIT = 10000
+
     def __init__(self, name: str):
         self.name = name
+        # Guards animals, breeder_cages and the indexes when shared across threads
+        self.lock = RWLock()
         self.animals: List[Animal] = []
         self.breeder_cages: List[dict] = []
+        # Lookup indexes kept in sync by the mutation methods below.
+        # Cage and sex buckets are insertion-ordered dicts used as sets.
+        self._by_id: Dict[str, Animal] = {}
+        self._by_cage: Dict[str, Dict[Animal, None]] = {}
+        self._by_sex: Dict[str, Dict[Animal, None]] = {'M': {}, 'F': {}}
+        # Change records not yet persisted, consumed by the storage journal
+        self._changes: List[dict] = []
+        # Incremented on every change so derived data can be cached per version
+        self.version = 0
+        self._version_changed = threading.Condition()
+        # Set once the colony manager has dropped this object; users should fetch the colony again
+        self.retired = False
+        # Sorted animal lists per (sort key, descending), each tagged with the version it was built at
+        self._sorted: Dict[tuple, tuple] = {}
+        self._parent_candidates: Optional[tuple] = None
+        self._cage_summary: Optional[tuple] = None
+        # Incremented whenever animals are added, removed or renamed or parent links change; pedigree-derived data is cached per value
+        self.pedigree_version = 0
+        self._closures: OrderedDict = OrderedDict()
+        self._closures_version = 0
+        self._closures_lock = threading.Lock()
+        # Animals edited or removed, in order, for consumers that update incrementally; see touched_since
+        self._touched: List[Animal] = []
+        self._touched_start = 0
+
+    @staticmethod
+    def _sex_key(sex):
+        """Normalize a sex value to the 'M'/'F' bucket key"""
+        if sex in ('M', 'Male'):
+            return 'M'
+        if sex in ('F', 'Female'):
+            return 'F'
+        return None
+
+    def _index(self, animal: Animal):
+        """Add an animal to the lookup indexes"""
+        self._by_id[animal.animal_id] = animal
+        if animal.cage_id:
+            self._by_cage.setdefault(animal.cage_id, {})[animal] = None
+        key = self._sex_key(animal.sex)
+        if key:
+            self._by_sex[key][animal] = None
+
+    def _unindex(self, animal: Animal):
+        """Remove an animal from the lookup indexes"""
+        self._by_id.pop(animal.animal_id, None)
+        if animal.cage_id:
+            bucket = self._by_cage.get(animal.cage_id)
+            if bucket is not None:
+                bucket.pop(animal, None)
+                if not bucket:
+                    del self._by_cage[animal.cage_id]
+        key = self._sex_key(animal.sex)
+        if key:
+            self._by_sex[key].pop(animal, None)
+
+    def reindex(self):
+        """Rebuild all lookup indexes from the animals list"""
+        self._by_id = {}
+        self._by_cage = {}
+        self._by_sex = {'M': {}, 'F': {}}
+        for animal in self.animals:
+            self._index(animal)
+
+    def _record(self, change: dict):
+        self._changes.append(change)
+        self.bump_version()
+
+    def bump_version(self):
+        """Invalidate cached derived data after changes not made through these methods"""
+        with self._version_changed:
+            self.version += 1
+            self._version_changed.notify_all()
+
+    def wait_for_change(self, version: int, timeout: Optional[float] = None) -> int:
+        """Block until the version differs from ``version`` or the timeout passes; return the current version"""
+        with self._version_changed:
+            self._version_changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def _touch(self, animal: Animal):
+        self._touched.append(animal)
+        if len(self._touched) > self.TOUCHED_LIMIT:
+            drop = len(self._touched) // 2
+            del self._touched[:drop]
+            self._touched_start += drop
+
+    def touched_since(self, position: int):
+        """Get (new position, animals edited or removed since ``position``)
+
+        The animal list is None if edits that far back have been dropped, in
+        which case the caller should rescan the whole colony. Start from
+        position 0 and pass back the returned position each time.
+        """
+        end = self._touched_start + len(self._touched)
+        if position < self._touched_start:
+            return end, None
+        return end, self._touched[position - self._touched_start:]
+
+    def mark_changed(self, *animals: Animal):
+        """Record the current state of edited animals for the next save"""
+        for animal in animals:
+            if self._by_id.get(animal.animal_id) is animal:
+                self._record({'op': 'put', 'animal': animal.to_dict()})
+                self._touch(animal)
+
+    def take_changes(self) -> List[dict]:
+        """Return and clear the change records accumulated since the last save"""
+        changes, self._changes = self._changes, []
+        return changes
+
+    def restore_changes(self, changes: List[dict]):
+        """Put back change records taken for a save that failed, ahead of any newer ones"""
+        self._changes[:0] = changes
 
     def add_animal(self, animal: Animal):
         """Add an animal to the colony"""
-        if any(a.animal_id == animal.animal_id for a in self.animals):
+        if animal.animal_id in self._by_id:
             raise ValueError(f"Animal with ID {animal.animal_id} already exists")
         self.animals.append(animal)
-    
+        self._index(animal)
+        self.pedigree_version += 1
+        self.mark_changed(animal)
+
+    def load_animals(self, animals: Iterable[Animal]):
+        """Add saved animals without recording changes, for loaders rebuilding a colony
+
+        Duplicate IDs raise ValueError as in add_animal. The versions are
+        bumped once for the whole batch rather than once per animal.
+        """
+        for animal in animals:
+            if animal.animal_id in self._by_id:
+                raise ValueError(f"Animal with ID {animal.animal_id} already exists")
+            self.animals.append(animal)
+            self._index(animal)
+        self.pedigree_version += 1
+        self.bump_version()
+
+    def remove_animal(self, animal: Animal):
+        """Remove an animal from the colony and unlink it from its relatives"""
+        if self._by_id.get(animal.animal_id) is not animal:
+            return False
+        # Detach from parents' children lists
+        for parent in (animal.mother, animal.father):
+            if parent and animal in parent.children:
+                parent.children.remove(animal)
+        self._unindex(animal)
+        self.animals.remove(animal)
+        self.pedigree_version += 1
+        self._record({'op': 'delete', 'animal_id': animal.animal_id})
+        self._touch(animal)
+        # Clear parent references held by its children
+        orphans = animal.children
+        animal.children = []
+        for child in orphans:
+            if child.mother is animal:
+                child.mother = None
+            if child.father is animal:
+                child.father = None
+        self.mark_changed(*orphans)
+        return True
+
+    def would_create_cycle(self, animal: Animal, parent: Optional[Animal]) -> bool:
+        """Whether making ``parent`` a parent of ``animal`` would put the animal among its own ancestors"""
+        return parent is not None and (parent is animal or animal in self.get_ancestors(parent))
+
+    def set_parents(self, animal: Animal, mother: Optional[Animal], father: Optional[Animal]):
+        """Change an animal's parents, keeping children lists and cached closures current
+
+        Raises PedigreeCycleError if a new parent is the animal itself or one
+        of its descendants.
+        """
+        if animal.mother is mother and animal.father is father:
+            return
+        for parent in (mother, father):
+            if self.would_create_cycle(animal, parent):
+                raise PedigreeCycleError([animal.animal_id, parent.animal_id])
+        for old, new in ((animal.mother, mother), (animal.father, father)):
+            if old is not new and old is not None and animal in old.children:
+                old.children.remove(animal)
+        animal.mother, animal.father = mother, father
+        for parent in (mother, father):
+            if parent is not None and animal not in parent.children:
+                parent.children.append(animal)
+        self.pedigree_version += 1
+        self.mark_changed(animal)
+
     def get_animal(self, animal_id):
         """Get an animal by its ID"""
-        return next((a for a in self.animals if a.animal_id == animal_id), None)
-    
+        return self._by_id.get(animal_id)
+
     def get_animal_by_id(self, animal_id):
         """Get an animal by its ID"""
-        return next((a for a in self.animals if a.animal_id == animal_id), None)
-    
+        return self._by_id.get(animal_id)
+
     def update_animal_id(self, old_id, new_id):
         """Update an animal's ID and all references to it"""
-        animal = self.get_animal_by_id(old_id)
+        animal = self._by_id.get(old_id)
         if not animal:
             return False
-            
-        # Update the animal's ID
+        if old_id == new_id:
+            return True
+        if new_id in self._by_id:
+            raise ValueError(f"Animal with ID {new_id} already exists")
+
+        # Parents and children hold object references, so only the
+        # index key and breeder cage records need updating.
+        del self._by_id[old_id]
         animal.animal_id = new_id
-        
-        # Update references in other animals
-        for a in self.animals:
-            # Update mother references
-            if a.mother and isinstance(a.mother, str) and a.mother == old_id:
-                a.mother = new_id
-            elif a.mother and hasattr(a.mother, 'animal_id') and a.mother.animal_id == old_id:
-                # Mother is an Animal object
-                a.mother.animal_id = new_id
-                
-            # Update father references
-            if a.father and isinstance(a.father, str) and a.father == old_id:
-                a.father = new_id
-            elif a.father and hasattr(a.father, 'animal_id') and a.father.animal_id == old_id:
-                # Father is an Animal object
-                a.father.animal_id = new_id
-                
-            # Update children references
-            if isinstance(a.children, list):
-                # Children could be a list of strings (IDs) or Animal objects
-                for i, child in enumerate(a.children):
-                    if isinstance(child, str) and child == old_id:
-                        a.children[i] = new_id
-                    elif hasattr(child, 'animal_id') and child.animal_id == old_id:
-                        child.animal_id = new_id
-                
+        self._by_id[new_id] = animal
+        # Layouts and exports name animals by ID
+        self.pedigree_version += 1
+        self._record({'op': 'rename', 'old_id': old_id, 'new_id': new_id})
+
+        for bc in self.breeder_cages:
+            if bc.get('mother_id') == old_id:
+                bc['mother_id'] = new_id
+            if bc.get('father_id') == old_id:
+                bc['father_id'] = new_id
         return True
-    
+
+    def move_animal(self, animal: Animal, cage_id: Optional[str]):
+        """Move an animal to another cage, keeping the cage index current"""
+        if animal.cage_id == cage_id:
+            return
+        if self._by_id.get(animal.animal_id) is animal:
+            self._unindex(animal)
+            animal.cage_id = intern_value(cage_id)
+            self._index(animal)
+            self.mark_changed(animal)
+        else:
+            animal.cage_id = intern_value(cage_id)
+
+    def set_sex(self, animal: Animal, sex: str):
+        """Change an animal's sex, keeping the sex buckets current"""
+        if animal.sex == sex:
+            return
+        if self._by_id.get(animal.animal_id) is animal:
+            self._unindex(animal)
+            animal.sex = intern_value(sex)
+            self._index(animal)
+            self.mark_changed(animal)
+        else:
+            animal.sex = intern_value(sex)
+
+    def get_animals_in_cage(self, cage_id):
+        """Get all animals currently housed in a cage"""
+        return list(self._by_cage.get(cage_id, ()))
+
+    def cage_summary(self) -> dict:
+        """Get per-cage aggregates built in one pass, cached until the colony changes
+
+        Keys: 'cages' (cage ID -> animals), 'living' (cage ID -> number of
+        living animals), 'groups' (breeder cage ID -> animals in the breeder
+        cage and its litters) and 'group_living' (breeder cage ID -> number of
+        living animals in that group).
+        """
+        cached = self._cage_summary
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        version = self.version
+        cages = {}
+        living = {}
+        for cage_id, bucket in self._by_cage.items():
+            animals = list(bucket)
+            cages[cage_id] = animals
+            living[cage_id] = sum(1 for a in animals if not getattr(a, 'deceased', False))
+        groups = {}
+        group_living = {}
+        for bc in self.breeder_cages:
+            group_ids = [bc.get('cage_id')] + bc.get('litters', [])
+            groups[bc.get('cage_id')] = [a for cid in group_ids for a in cages.get(cid, ())]
+            group_living[bc.get('cage_id')] = sum(living.get(cid, 0) for cid in group_ids)
+        summary = {'cages': cages, 'living': living, 'groups': groups, 'group_living': group_living}
+        self._cage_summary = (version, summary)
+        return summary
+
     def get_founders(self):
         """Get all animals without parents"""
         return [a for a in self.animals if not a.mother and not a.father]
     
     def get_children(self, animal):
         """Get all children of an animal"""
-        return [a for a in self.animals if a.mother == animal or a.father == animal]
+        return list(animal.children)
     
     def get_siblings(self, animal):
         """Get all siblings of an animal"""
@@ -152,19 +490,132 @@ class Colony:
                     cousins.extend(uncle.children)
         return list(set(cousins))  # Remove duplicates
     
+    def _closure(self, direction: str, animal: Animal) -> Dict[Animal, int]:
+        """Get a cached ancestor or descendant closure, rebuilt after parent links change"""
+        key = (direction, animal)
+        with self._closures_lock:
+            if self._closures_version != self.pedigree_version:
+                self._closures.clear()
+                self._closures_version = self.pedigree_version
+            version = self._closures_version
+            closure = self._closures.get(key)
+            if closure is not None:
+                self._closures.move_to_end(key)
+                return closure
+        closure = ancestor_depths(animal) if direction == 'up' else descendant_depths(animal)
+        with self._closures_lock:
+            if self._closures_version == version:
+                self._closures[key] = closure
+                while len(self._closures) > self.CLOSURE_CACHE_SIZE:
+                    self._closures.popitem(last=False)
+        return closure
+
+    def get_ancestors(self, animal: Animal) -> Dict[Animal, int]:
+        """Get all ancestors of an animal mapped to generations back (parents are 1)"""
+        return self._closure('up', animal)
+
+    def get_descendants(self, animal: Animal) -> Dict[Animal, int]:
+        """Get all descendants of an animal mapped to generations down (children are 1)"""
+        return self._closure('down', animal)
+
+    def get_lineage(self, animal: Animal, direction: str = 'down', depth: Optional[int] = None) -> List[Animal]:
+        """Get an animal and its ancestors ('up') or descendants ('down'), nearest generations first
+
+        With a depth, only that many generations are walked, so the cost
+        follows the size of the lineage rather than of the colony.
+        """
+        if direction not in ('up', 'down'):
+            raise ValueError(f"Direction must be 'up' or 'down', not {direction!r}")
+        if depth is None:
+            relatives = self._closure(direction, animal)
+        elif direction == 'up':
+            relatives = ancestor_depths(animal, depth)
+        else:
+            relatives = descendant_depths(animal, depth)
+        return [animal] + sorted(relatives, key=relatives.get)
+
+    def get_common_ancestors(self, a: Animal, b: Animal) -> List[tuple]:
+        """Get the lowest common ancestors of two animals as (ancestor, depth from a, depth from b), nearest first
+
+        An animal counts as its own ancestor here, so a parent and its child
+        have the parent as their lowest common ancestor.
+        """
+        return lowest_common_ancestors({a: 0, **self.get_ancestors(a)},
+                                       {b: 0, **self.get_ancestors(b)})
+
+    def get_relationship_path(self, a: Animal, b: Animal) -> Optional[List[tuple]]:
+        """Get a shortest parent/child chain from a to b as (animal, relation) pairs, or None"""
+        return relationship_path(a, b)
+
     def get_unique_cage_ids(self):
         """Get all unique cage IDs in the colony"""
-        return sorted(list(set(a.cage_id for a in self.animals if a.cage_id)))
+        return sorted(self._by_cage)
     
     def get_males(self):
         """Get all male animals in the colony"""
         # Accept both 'M' and 'Male' values
-        return [a for a in self.animals if (isinstance(a.sex, str) and a.sex in ('M', 'Male'))]
+        return list(self._by_sex['M'])
 
     def get_females(self):
         """Get all female animals in the colony"""
         # Accept both 'F' and 'Female' values
-        return [a for a in self.animals if (isinstance(a.sex, str) and a.sex in ('F', 'Female'))]
+        return list(self._by_sex['F'])
+
+    def parent_candidates(self) -> Dict[str, List[str]]:
+        """Get sorted male ('M') and female ('F') animal IDs, cached until the colony changes"""
+        cached = self._parent_candidates
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        version = self.version
+        candidates = {
+            'M': sorted(a.animal_id for a in self._by_sex['M']),
+            'F': sorted(a.animal_id for a in self._by_sex['F']),
+        }
+        self._parent_candidates = (version, candidates)
+        return candidates
+
+    def sorted_animals(self, key: str = 'animal_id', descending: bool = False) -> List[Animal]:
+        """Get all animals sorted by one of SORT_KEYS, cached until the colony changes"""
+        if key not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {key}")
+        cached = self._sorted.get((key, descending))
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        version = self.version
+        ordered = sort_animals(self.animals, key, descending)
+        self._sorted[(key, descending)] = (version, ordered)
+        return ordered
+
+    def find_animals(self, sex=None, genotype=None, cage_id=None, deceased=None,
+                     dob_from=None, dob_to=None, id_contains=None,
+                     sort: str = 'animal_id', descending: bool = False) -> List[Animal]:
+        """Get the animals matching every given filter, in sorted order"""
+        if cage_id:
+            # The cage index narrows the candidates to a handful; sort just those
+            candidates = sort_animals(self.get_animals_in_cage(cage_id), sort, descending)
+        else:
+            candidates = self.sorted_animals(sort, descending)
+        sex_bucket = self._by_sex.get(self._sex_key(sex)) if sex else None
+        if sex and sex_bucket is None:
+            return []
+        if id_contains:
+            id_contains = id_contains.lower()
+        matches = []
+        for animal in candidates:
+            if sex_bucket is not None and animal not in sex_bucket:
+                continue
+            if genotype and animal.genotype != genotype:
+                continue
+            if deceased is not None and bool(getattr(animal, 'deceased', False)) != deceased:
+                continue
+            if dob_from and animal.dob < dob_from:
+                continue
+            if dob_to and animal.dob > dob_to:
+                continue
+            if id_contains and id_contains not in animal.animal_id.lower():
+                continue
+            matches.append(animal)
+        return matches
 
     def get_animal_with_cage(self, animal_id):
         """Get an animal by its ID, including cage information"""
@@ -197,24 +648,30 @@ class Colony:
         colony = cls(data['name'])
         
         # First pass: create all animals without relationships
-        animal_dict = {}
-        for animal_data in data['animals']:
-            animal = Animal.from_dict(animal_data)
-            colony.add_animal(animal)
-            animal_dict[animal.animal_id] = animal
+        colony.load_animals(Animal.from_dict(animal_data) for animal_data in data['animals'])
+        animal_dict = colony._by_id
         
-        # Second pass: establish relationships
+        # Second pass: establish relationships, skipping parents that aren't in the colony
         for animal_data in data['animals']:
             animal = animal_dict[animal_data['animal_id']]
-            if animal_data['mother_id']:
-                mother = animal_dict[animal_data['mother_id']]
-                animal.mother = mother
-                mother.children.append(animal)
-            if animal_data['father_id']:
-                father = animal_dict[animal_data['father_id']]
-                animal.father = father
-                father.children.append(animal)
+            mother_id = animal_data.get('mother_id')
+            if mother_id:
+                mother = animal_dict.get(mother_id)
+                if mother:
+                    animal.mother = mother
+                    mother.children.append(animal)
+                else:
+                    print(f"Warning: Mother animal with ID {mother_id} not found for animal {animal.animal_id}", file=sys.stderr)
+            father_id = animal_data.get('father_id')
+            if father_id:
+                father = animal_dict.get(father_id)
+                if father:
+                    animal.father = father
+                    father.children.append(animal)
+                else:
+                    print(f"Warning: Father animal with ID {father_id} not found for animal {animal.animal_id}", file=sys.stderr)
         colony.breeder_cages = data.get('breeder_cages', [])
+        colony.take_changes()
         return colony
 
     def to_json(self):
@@ -0,0 +1,141 @@
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class PedigreeCycleError(ValueError):
+    """Raised when parent links form a cycle, i.e. an animal is its own ancestor"""
+
+    def __init__(self, animal_ids: Iterable[str]):
+        self.animal_ids = sorted(animal_ids)
+        shown = ', '.join(self.animal_ids[:10])
+        more = f" and {len(self.animal_ids) - 10} more" if len(self.animal_ids) > 10 else ''
+        super().__init__(f"Pedigree has a parent cycle; check the parents of: {shown}{more}")
+
+
+def parent_edges(colony) -> List[Tuple[str, str]]:
+    """Get (parent_id, child_id) pairs for every mother and father link in a colony"""
+    edges = []
+    for animal in colony.animals:
+        if animal.mother:
+            edges.append((animal.mother.animal_id, animal.animal_id))
+        if animal.father:
+            edges.append((animal.father.animal_id, animal.animal_id))
+    return edges
+
+
+def assign_generations(nodes: Iterable[str], edges: Iterable[Tuple[str, str]]) -> Dict[str, int]:
+    """Assign each node a generation in O(V + E) with Kahn's algorithm
+
+    Animals without parents are generation 0 and every other animal is one
+    generation below its deepest parent (max(parent generations) + 1).
+    Raises PedigreeCycleError if the parent links contain a cycle.
+    """
+    children: Dict[str, List[str]] = {node: [] for node in nodes}
+    in_degree = dict.fromkeys(children, 0)
+    for parent, child in edges:
+        children.setdefault(parent, []).append(child)
+        children.setdefault(child, [])
+        in_degree[child] = in_degree.get(child, 0) + 1
+        in_degree.setdefault(parent, 0)
+
+    generations = {node: 0 for node, degree in in_degree.items() if degree == 0}
+    queue = deque(generations)
+    while queue:
+        node = queue.popleft()
+        child_generation = generations[node] + 1
+        for child in children[node]:
+            if generations.get(child, -1) < child_generation:
+                generations[child] = child_generation
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                queue.append(child)
+
+    if any(in_degree.values()):
+        raise PedigreeCycleError(node for node, degree in in_degree.items() if degree > 0)
+    return generations
+
+
+def colony_generations(colony) -> Dict[str, int]:
+    """Get the generation of every animal in a colony"""
+    return assign_generations((a.animal_id for a in colony.animals), parent_edges(colony))
+
+
+def _parents(animal):
+    return [parent for parent in (animal.mother, animal.father) if parent is not None]
+
+
+def _children(animal):
+    return animal.children
+
+
+def _depths(start, neighbours, max_depth: Optional[int] = None) -> Dict[object, int]:
+    """Breadth-first closure of start: every reachable animal mapped to its fewest steps away, up to max_depth steps"""
+    depths = {}
+    frontier = [start]
+    depth = 0
+    while frontier and (max_depth is None or depth < max_depth):
+        depth += 1
+        next_frontier = []
+        for animal in frontier:
+            for relative in neighbours(animal):
+                if relative not in depths and relative is not start:
+                    depths[relative] = depth
+                    next_frontier.append(relative)
+        frontier = next_frontier
+    return depths
+
+
+def ancestor_depths(animal, max_depth: Optional[int] = None) -> Dict[object, int]:
+    """Get the ancestors of an animal mapped to generations back (parents are 1), at most max_depth back if given"""
+    return _depths(animal, _parents, max_depth)
+
+
+def descendant_depths(animal, max_depth: Optional[int] = None) -> Dict[object, int]:
+    """Get the descendants of an animal mapped to generations down (children are 1), at most max_depth down if given"""
+    return _depths(animal, _children, max_depth)
+
+
+def lowest_common_ancestors(ancestors_a: Dict[object, int], ancestors_b: Dict[object, int]) -> List[Tuple[object, int, int]]:
+    """Get the common ancestors that have no descendant which is also a common ancestor
+
+    Takes the ancestor_depths of two animals, each including the animal itself
+    at depth 0, and returns (ancestor, depth from a, depth from b) tuples,
+    nearest first.
+    """
+    common = ancestors_a.keys() & ancestors_b.keys()
+    # A common ancestor with a child that is also common is never the lowest:
+    # that child lies on its path down to both animals
+    lowest = [animal for animal in common
+              if not any(child in common for child in animal.children)]
+    result = [(animal, ancestors_a[animal], ancestors_b[animal]) for animal in lowest]
+    result.sort(key=lambda item: (item[1] + item[2], item[0].animal_id))
+    return result
+
+
+def relationship_path(start, end) -> Optional[List[Tuple[object, str]]]:
+    """Find a shortest chain of parent/child links from start to end
+
+    Returns (animal, relation) pairs beginning with (start, 'self'), where
+    relation is how that animal relates to the one before it: 'mother',
+    'father' or 'child'. Returns None if the animals are not related.
+    """
+    previous = {start: None}
+    frontier = deque([start])
+    while frontier and end not in previous:
+        animal = frontier.popleft()
+        steps = [(animal.mother, 'mother'), (animal.father, 'father')]
+        steps.extend((child, 'child') for child in animal.children)
+        for relative, relation in steps:
+            if relative is not None and relative not in previous:
+                previous[relative] = (animal, relation)
+                frontier.append(relative)
+    if end not in previous:
+        return None
+    path = []
+    animal = end
+    while previous[animal] is not None:
+        before, relation = previous[animal]
+        path.append((animal, relation))
+        animal = before
+    path.append((start, 'self'))
+    return path[::-1]
@@ -0,0 +1,219 @@
+"""Headless family tree images (PNG or SVG), drawn in a worker process and cached on disk by content"""
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Optional
+
+render_dir = os.path.join('colonies', 'renders')
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+DEFAULT_STYLE = {'dpi': 150, 'labels': True}
+# Images kept in the render directory; the least recently used beyond this are deleted
+MAX_CACHED_RENDERS = 200
+# Largest tree drawn with ID and genotype labels
+LABEL_LIMIT = 300
+
+
+def describe_tree(colony, animals: Optional[Iterable] = None, fmt: str = 'png', include_deceased: bool = True,
+                  title: Optional[str] = None, **style) -> dict:
+    """Describe a tree image as plain data for the worker, with its cache key
+
+    The key hashes each animal's ID, sex, genotype and parents together with
+    the title, format and style, so an image is only redrawn when something
+    it shows changed. Raises ValueError for an unknown format or style option.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Cannot render {fmt!r}; use one of {', '.join(FORMATS)}")
+    unknown = style.keys() - DEFAULT_STYLE.keys()
+    if unknown:
+        raise ValueError(f"Unknown style options: {', '.join(sorted(unknown))}")
+    style = dict(DEFAULT_STYLE, **style)
+    animals = [a for a in (colony.animals if animals is None else animals) if include_deceased or not a.deceased]
+    nodes = sorted((a.animal_id, a.sex, a.genotype,
+                    a.mother.animal_id if a.mother else None,
+                    a.father.animal_id if a.father else None) for a in animals)
+    job = {
+        'title': title or f"Family Tree - {colony.name}",
+        'nodes': nodes,
+        'fmt': fmt,
+        'style': style,
+    }
+    job['key'] = hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()
+    return job
+
+
+def _prune(directory: str, keep: int):
+    """Delete the least recently used images beyond the newest ``keep``"""
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.rsplit('.', 1)[-1] in FORMATS:
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    for _, path in sorted(entries, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def render_file(job: dict, path: str) -> str:
+    """Lay out and draw a described tree with matplotlib's Agg backend, writing path atomically
+
+    Runs in the worker process. The image is written to a temporary file and
+    renamed into place, so readers never see a partial image.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    from layout import PedigreeLayout, normalized
+    from pedigree import PedigreeCycleError
+
+    nodes, style = job['nodes'], job['style']
+    edges = [(parent, animal_id) for animal_id, _, _, mother, father in nodes
+             for parent in (mother, father) if parent is not None]
+    fig, ax = plt.subplots(figsize=(15, 10))
+    ax.set_title(job['title'], pad=20)
+    ax.axis('off')
+    try:
+        pos = normalized(PedigreeLayout([node[0] for node in nodes], edges).positions)
+    except PedigreeCycleError as e:
+        ax.text(0.5, 0.5, str(e), ha='center', va='center', wrap=True)
+        pos = {}
+    if pos:
+        ax.add_collection(LineCollection([(pos[parent], pos[child]) for parent, child in edges
+                                          if parent in pos], colors='gray', linewidths=0.5, zorder=1))
+        # Circles for females and squares for males, shrinking as the tree grows
+        size = max(4.0, min(400.0, 40000.0 / len(nodes)))
+        for sex, marker in (('F', 'o'), ('M', 's')):
+            points = [pos[node[0]] for node in nodes if (node[1] == 'F') == (sex == 'F')]
+            if points:
+                xs, ys = zip(*points)
+                ax.scatter(xs, ys, s=size, marker=marker, facecolors='white', edgecolors='black', zorder=2)
+        if style['labels'] and len(nodes) <= LABEL_LIMIT:
+            for animal_id, _, genotype, _, _ in nodes:
+                x, y = pos[animal_id]
+                ax.text(x, y + 0.03, f"{animal_id}\n{genotype}", ha='center', va='bottom', fontsize=8)
+        ax.set_xlim(-0.05, 1.05)
+        ax.set_ylim(-0.05, 1.1)
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.render-', suffix='.tmp')
+    os.close(fd)
+    try:
+        fig.savefig(tmp_path, format=job['fmt'], dpi=style['dpi'], bbox_inches='tight')
+        os.replace(tmp_path, path)
+    finally:
+        plt.close(fig)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _prune(directory, MAX_CACHED_RENDERS)
+    return path
+
+
+def _lost(future: Future) -> bool:
+    """Whether a render failed because its worker process died"""
+    return future.done() and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)
+
+
+class RenderService:
+    """Tree images drawn in a worker process, cached in a directory by content
+
+    ``submit`` only collects the animals and hashes them, which is cheap
+    enough for a UI thread or a request holding a colony lock. Layout and
+    drawing happen in the worker, and concurrent requests for the same image
+    share one render. Images are named by their key, so processes sharing
+    the directory reuse each other's renders instead of overwriting them.
+    If a worker dies, its renders fail with BrokenProcessPool and the next
+    submit starts a fresh pool.
+    """
+
+    def __init__(self, directory: Optional[str] = None, workers: int = 1):
+        self.directory = directory or render_dir
+        self.workers = workers
+        self._executor = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def path(self, job: dict) -> str:
+        return os.path.join(self.directory, f"{job['key']}.{job['fmt']}")
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # A fresh interpreter, not a fork of a process that may be running threads
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def _discard_pool(self, executor: ProcessPoolExecutor):
+        """Drop a broken pool so the next submit starts another; caller holds the lock"""
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, colony, animals: Optional[Iterable] = None, fmt: str = 'png', include_deceased: bool = True,
+               title: Optional[str] = None, **style) -> Future:
+        """Get a Future of the image file's path, already done if the image is cached
+
+        Takes the same arguments as describe_tree.
+        """
+        job = describe_tree(colony, animals, fmt, include_deceased, title, **style)
+        path = self.path(job)
+        if os.path.exists(path):
+            try:
+                # Mark as recently used so pruning keeps it
+                os.utime(path)
+                done = Future()
+                done.set_result(path)
+                return done
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            future = self._pending.get(job['key'])
+            # A render lost with a dead worker may not have run its callback yet
+            if future is not None and not _lost(future):
+                return future
+            executor = self._pool()
+            try:
+                future = executor.submit(render_file, job, path)
+            except BrokenProcessPool:
+                self._discard_pool(executor)
+                executor = self._pool()
+                future = executor.submit(render_file, job, path)
+            self._pending[job['key']] = future
+        # Outside the lock: a render that already finished runs the callback right here
+        future.add_done_callback(lambda done: self._finished(job['key'], done, executor))
+        return future
+
+    def _finished(self, key: str, future: Future, executor: ProcessPoolExecutor):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            if _lost(future):
+                self._discard_pool(executor)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> RenderService:
+    """Get the process-wide RenderService, created on first use"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = RenderService()
+        return _service
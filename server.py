@@ -1,8 +1,10 @@
-from flask import Flask, render_template, send_file, Response, request, jsonify, redirect, url_for, session, flash
+from flask import Flask, render_template, send_file, Response, request, jsonify, redirect, url_for, session, flash, g
 from flask.sessions import SecureCookieSessionInterface, SecureCookieSession
 import os
 import json
 import csv
+import math
+import io
 import sys
 import glob
 import time
@@ -12,12 +14,25 @@ from random import randint, choice, random, seed
 from threading import Thread
 import webbrowser
 import requests
-import subprocess
 import pickle
 import base64
-from models import Animal, Colony
+from models import Animal, Colony, intern_value, parse_date
+from colony_manager import ColonyManager
+import storage
+import bulk_io
+import kinship
+import genetics
+import layout
+import render_service
+import numpy as np
 import logging
-from urllib.parse import urlparse
+import threading
+import uuid
+import weakref
+from functools import wraps
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlencode, urlparse
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -49,120 +64,91 @@ app.secret_key = 'your-secret-key-here'  # Required for flash messages
 # Use our custom session interface
 app.session_interface = CustomSessionInterface()
 
-# Global variable to store current colony
-current_colony = None
 colonies_dir = 'colonies'
+# Colony storage backend: 'json' (snapshot + journal) or 'sqlite'
+storage_backend = os.environ.get('COLONY_BACKEND', 'json')
 
 # Ensure colonies directory exists
 if not os.path.exists(colonies_dir):
     os.makedirs(colonies_dir)
 
-def run_dash():
-    """Run the Dash server in a separate process"""
-    subprocess.Popen(['python', 'tree_visualization.py'])
+def colony_store():
+    """Get the storage module for the configured backend"""
+    return storage.backend(storage_backend)
 
-def is_dash_running():
-    """Check if the Dash server is running"""
-    try:
-        response = requests.get('http://localhost:8050', timeout=1)
-        return response.status_code == 200
-    except:
-        return False
+def save_colony(colony, filename, full=False):
+    """Save colony changes to disk
 
-def save_colony(colony, filename):
-    """Save colony to JSON file"""
+    Edits to a colony that already has a snapshot are appended to its
+    journal (or applied as single-row updates with the SQLite backend); a
+    full snapshot is written for new colonies, for saves under a different
+    name, or when ``full`` is set.
+    """
     if not os.path.exists('colonies'):
         os.makedirs('colonies')
     
-    data = {
-        'name': colony.name,
-        'animals': [],
-        'breeder_cages': colony.breeder_cages
-    }
-    
-    for animal in colony.animals:
-        animal_data = {
-            'animal_id': animal.animal_id,
-            'sex': animal.sex,
-            'genotype': animal.genotype,
-            'dob': animal.dob.isoformat(),
-            'mother_id': animal.mother.animal_id if animal.mother else None,
-            'father_id': animal.father.animal_id if animal.father else None,
-            'notes': animal.notes if hasattr(animal, 'notes') else None,
-            'cage_id': animal.cage_id if hasattr(animal, 'cage_id') else None,
-            'date_weaned': animal.date_weaned.isoformat() if hasattr(animal, 'date_weaned') and animal.date_weaned else None,
-            'deceased': animal.deceased
-        }
-        data['animals'].append(animal_data)
+    store = colony_store()
+    if not full and filename == colony.name and os.path.exists(store.snapshot_path(filename)):
+        changes = colony.take_changes()
+        try:
+            store.append_changes(filename, changes, colony.breeder_cages)
+        except Exception:
+            # Keep the records so the next save writes them
+            colony.restore_changes(changes)
+            raise
+        return
     
-    with open(f'colonies/{filename}.json', 'w') as f:
-        json.dump(data, f, indent=4)
+    store.write_full_snapshot(filename, colony.to_dict())
+    if filename == colony.name:
+        colony.take_changes()
 
 def load_colony(filename):
-    """Load colony from JSON file"""
-    with open(f'colonies/{filename}.json', 'r') as f:
-        data = json.load(f)
+    """Load colony from the configured storage backend"""
+    start = time.perf_counter()
+    data = colony_store().read_colony_data(filename)
     
     colony = Colony(data['name'])
     
-    # First pass: create all animals
+    # First pass: create all animals, then key them by ID for parent resolution
+    loaded = []
     for animal_data in data['animals']:
-        # Parse the date string, handling both date-only and datetime formats
-        dob_str = animal_data['dob']
-        if 'T' in dob_str:  # If it's a datetime string
-            dob_str = dob_str.split('T')[0]  # Take just the date part
-        dob = datetime.strptime(dob_str, '%Y-%m-%d').date()
-        
-        # Parse date weaned if it exists
-        date_weaned = None
-        if animal_data.get('date_weaned'):
-            date_weaned_str = animal_data['date_weaned']
-            if 'T' in date_weaned_str:  # If it's a datetime string
-                date_weaned_str = date_weaned_str.split('T')[0]  # Take just the date part
-            date_weaned = datetime.strptime(date_weaned_str, '%Y-%m-%d').date()
-        
-        # Get optional fields with fallbacks
-        cage_id = animal_data.get('cage_id')
-        notes = animal_data.get('notes')
-        
         animal = Animal(
             animal_data['animal_id'],
             animal_data['sex'],
             animal_data['genotype'],
-            dob,
+            parse_date(animal_data['dob']),
             None,  # mother will be set in second pass
             None,  # father will be set in second pass
-            notes,
-            cage_id,
-            date_weaned
+            animal_data.get('notes'),
+            animal_data.get('cage_id'),
+            parse_date(animal_data.get('date_weaned'))
         )
-        colony.add_animal(animal)
+        # Restore deceased flag and transfer history
+        animal.deceased = animal_data.get('deceased', False)
+        animal.old_cage_id = animal_data.get('old_cage_id')
+        loaded.append((animal, animal_data))
+    colony.load_animals(animal for animal, _ in loaded)
+    by_id = {animal.animal_id: (animal, animal_data) for animal, animal_data in loaded}
     
-    # Second pass: set parent relationships
-    for animal_data in data['animals']:
-        animal = next(a for a in colony.animals if a.animal_id == animal_data['animal_id'])
-        if animal_data['mother_id']:
-            try:
-                mother = next((a for a in colony.animals if a.animal_id == animal_data['mother_id']), None)
-                if mother:
-                    animal.mother = mother
-                else:
-                    print(f"Warning: Mother animal with ID {animal_data['mother_id']} not found for animal {animal.animal_id}")
-            except Exception as e:
-                print(f"Error setting mother for animal {animal.animal_id}: {str(e)}")
-        
-        if animal_data['father_id']:
-            try:
-                father = next((a for a in colony.animals if a.animal_id == animal_data['father_id']), None)
-                if father:
-                    animal.father = father
-                else:
-                    print(f"Warning: Father animal with ID {animal_data['father_id']} not found for animal {animal.animal_id}")
-            except Exception as e:
-                print(f"Error setting father for animal {animal.animal_id}: {str(e)}")
+    # Second pass: set parent relationships with dictionary lookups
+    for animal, animal_data in by_id.values():
+        mother_id = animal_data.get('mother_id')
+        if mother_id:
+            mother = by_id.get(mother_id)
+            if mother:
+                animal.mother = mother[0]
+                mother[0].children.append(animal)
+            else:
+                print(f"Warning: Mother animal with ID {mother_id} not found for animal {animal.animal_id}")
         
-        # Restore deceased flag
-        animal.deceased = animal_data.get('deceased', False)
+        father_id = animal_data.get('father_id')
+        if father_id:
+            father = by_id.get(father_id)
+            if father:
+                animal.father = father[0]
+                father[0].children.append(animal)
+            else:
+                print(f"Warning: Father animal with ID {father_id} not found for animal {animal.animal_id}")
     
     # Load breeder cages if present
     colony.breeder_cages = data.get('breeder_cages', [])
@@ -170,8 +156,48 @@ def load_colony(filename):
     for bc in colony.breeder_cages:
         if 'litters' not in bc:
             bc['litters'] = []
+    colony.take_changes()
+    elapsed = time.perf_counter() - start
+    print(f"Loaded colony '{filename}' with {len(colony.animals)} animals in {elapsed:.3f}s")
     return colony
 
+def get_current_colony():
+    """Get the colony selected in this session, loading it if needed"""
+    # Routes wrapped in colony_lock resolve the colony once, before locking
+    if hasattr(g, 'colony'):
+        return g.colony
+    name = session.get('colony_name')
+    if not name:
+        return None
+    return colony_manager.get(name)
+
+def colony_lock(mode):
+    """Run a route while holding the session colony's 'read' or 'write' lock"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            while True:
+                g.pop('colony', None)
+                colony = get_current_colony()
+                g.colony = colony
+                if colony is None:
+                    return view(*args, **kwargs)
+                with (colony.lock.write() if mode == 'write' else colony.lock.read()):
+                    if colony.retired:
+                        # Evicted while we waited for the lock; fetch its replacement
+                        continue
+                    return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def save_evicted_colony(colony):
+    """Flush a colony that is being dropped from memory"""
+    with colony.lock.write():
+        save_colony(colony, colony.name)
+
+# Loaded colonies, shared across sessions and evicted least recently used first
+colony_manager = ColonyManager(load_colony, on_evict=save_evicted_colony)
+
 @app.before_request
 def before_request():
     """Log debugging info before each request"""
@@ -190,21 +216,21 @@ def list_colonies():
     if not os.path.exists('colonies'):
         os.makedirs('colonies')
     
-    # Get list of colony files
+    # Get list of colony files for the active backend
+    ext = '.sqlite' if storage_backend == 'sqlite' else '.json'
     colonies = []
     for file in os.listdir('colonies'):
-        if file.endswith('.json'):
-            colonies.append(file[:-5])  # Remove .json extension
+        if file.endswith(ext):
+            colonies.append(file[:-len(ext)])  # Remove extension
     
     return render_template('colonies.html', colonies=colonies)
 
 @app.route('/colony/new', methods=['GET', 'POST'])
 def new_colony():
     """Create a new colony"""
-    global current_colony
     if request.method == 'POST':
         name = request.form['name']
-        current_colony = Colony(name)
+        colony_manager.put(Colony(name))
         
         # Store colony name in session
         session['colony_name'] = name
@@ -217,18 +243,17 @@ def new_colony():
 @app.route('/colony/load/<name>')
 def load_colony_route(name):
     """Load a specific colony"""
-    global current_colony
     print(f"Attempting to load colony: {name}")
     
     try:
-        print(f"Looking for colony file: colonies/{name}.json")
-        if not os.path.exists(f'colonies/{name}.json'):
-            print(f"Colony file not found: colonies/{name}.json")
-            return f"Error: Colony file colonies/{name}.json not found", 404
+        path = colony_store().snapshot_path(name)
+        print(f"Looking for colony file: {path}")
+        if not os.path.exists(path):
+            print(f"Colony file not found: {path}")
+            return f"Error: Colony file {path} not found", 404
             
-        current_colony = load_colony(name)
-        # Ensure the colony name matches the file name
-        current_colony.name = name
+        # Reuses the in-memory copy if another session already loaded it
+        current_colony = colony_manager.get(name)
         
         # For session, just store the colony name
         session['colony_name'] = name
@@ -248,39 +273,42 @@ def load_colony_route(name):
         return f"Error loading colony: {str(e)}", 400
 
 @app.route('/colony/save', methods=['POST'])
+@colony_lock('write')
 def save_colony_route():
     """Save the current colony"""
+    current_colony = get_current_colony()
     if current_colony:
         filename = request.form['filename']
-        save_colony(current_colony, filename)
+        save_colony(current_colony, filename, full=True)
         return redirect(url_for('list_colonies'))
     return "No colony to save", 400
 
 @app.route('/colony')
 def view_colony():
     """View the current colony - redirects to Animals view"""
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
     return redirect(url_for('view_animals'))
 
 @app.route('/colony/animals')
+@colony_lock('read')
 def view_animals():
     """View the animals in the current colony"""
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
     show_deceased = session.get('show_deceased', False)
     print(f"Debug/view_animals: show_deceased={show_deceased}, total animals={len(current_colony.animals)}")
-    if show_deceased:
-        animals = current_colony.animals
-    else:
-        animals = [a for a in current_colony.animals if not getattr(a, 'deceased', False)]
-    print(f"Debug/view_animals: returning {len(animals)} animals")
-    return render_template('animals_view.html', colony=current_colony, animals=animals, show_deceased=show_deceased)
+    # Rows are fetched a page at a time from get_animals_page; parent IDs are sent once for the typeahead
+    return render_template('animals_view.html', colony=current_colony, show_deceased=show_deceased,
+                           parent_candidates=current_colony.parent_candidates())
 
 @app.route('/colony/cages')
+@colony_lock('read')
 def view_cages():
     """View the cages in the current colony"""
-    global current_colony
+    current_colony = get_current_colony()
     
     if not current_colony:
         print("No colony loaded, redirecting to colony list")
@@ -289,36 +317,29 @@ def view_cages():
     # Show or hide deceased cages
     show_deceased = session.get('show_deceased', False)
     print(f"Debug/view_cages: show_deceased={show_deceased}")
+    summary = current_colony.cage_summary()
     # Build cages: include only cages that should be visible under the toggle
-    cage_ids = current_colony.get_unique_cage_ids()
     cages = {}
-    for cid in cage_ids:
-        # gather all animals for this cage
-        all_animals = [a for a in current_colony.animals if a.cage_id == cid]
-        if not all_animals:
-            continue
+    for cid in sorted(summary['cages']):
+        all_animals = summary['cages'][cid]
         if show_deceased:
             # show all animals in the cage
-            display_animals = all_animals
-        else:
+            cages[cid] = all_animals
+        elif summary['living'][cid]:
             # show only living animals; skip cage if none alive
-            display_animals = [a for a in all_animals if not getattr(a, 'deceased', False)]
-            if not display_animals:
-                continue
-        cages[cid] = display_animals
+            cages[cid] = [a for a in all_animals if not getattr(a, 'deceased', False)]
     # Filter breeder cages based on show_deceased: include breeders with at least one alive animal or all if showing deceased
-    visible_breeder_cages = []
-    for bc in current_colony.breeder_cages:
-        group_ids = [bc.get('cage_id')] + bc.get('litters', [])
-        group_animals = [a for a in current_colony.animals if a.cage_id in group_ids]
-        if show_deceased or any(not a.deceased for a in group_animals):
-            visible_breeder_cages.append(bc)
+    visible_breeder_cages = [bc for bc in current_colony.breeder_cages
+                             if show_deceased or summary['group_living'].get(bc.get('cage_id'))]
     print(f"Debug/view_cages: returning {len(cages)} cages and {len(visible_breeder_cages)} breeder cages")
     return render_template(
         'cages_view.html',
         colony=current_colony,
         cages=cages,
         breeder_cages=visible_breeder_cages,
+        cage_summary=summary,
+        cage_ids=sorted(summary['cages']),
+        parent_candidates=current_colony.parent_candidates(),
         show_deceased=show_deceased
     )
 
@@ -340,9 +361,68 @@ def toggle_show_deceased():
     else:
         return redirect(url_for('view_colony'))
 
+@app.route('/colony/import', methods=['POST'])
+@colony_lock('write')
+def import_animals_route():
+    """Bulk import animals from an uploaded CSV or JSON file into the current colony
+
+    Send the file as the 'file' form field or as the request body. Optional
+    parameters: format ('csv' or 'json', otherwise guessed from the file
+    name) and dry_run to validate without importing.
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'success': False, 'error': 'No colony selected'}), 400
+    
+    upload = request.files.get('file')
+    filename = upload.filename if upload else None
+    fmt = request.values.get('format') or bulk_io.detect_format(filename, 'json' if request.is_json else 'csv')
+    dry_run = request.values.get('dry_run', '').lower() in ('1', 'true', 'yes', 'on')
+    stream = io.TextIOWrapper(upload.stream if upload else request.stream, encoding='utf-8-sig', newline='')
+    try:
+        result = bulk_io.import_animals(current_colony, bulk_io.read_rows(stream, fmt), dry_run=dry_run)
+    except bulk_io.BulkImportError as e:
+        return jsonify({'success': False, 'error': str(e),
+                        'errors': [{'row': number, 'error': message} for number, message in e.errors]}), 400
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Could not read {fmt.upper()} data: {str(e)}'}), 400
+    
+    if result['imported']:
+        # One save for the whole batch; large batches are written as a fresh snapshot
+        save_start = time.perf_counter()
+        save_colony(current_colony, current_colony.name, full=result['imported'] >= storage.COMPACT_THRESHOLD)
+        result['save_elapsed'] = round(time.perf_counter() - save_start, 3)
+    print(f"Imported {result['imported']} animals into colony {current_colony.name} in {result['elapsed']:.3f}s "
+          f"({result['rows_per_second'] or 0} rows/s)")
+    return jsonify(dict(result, success=True))
+
+@app.route('/colony/export/<table>')
+@colony_lock('read')
+def export_table(table):
+    """Stream a table of the current colony as CSV, NDJSON or columnar JSON
+
+    Tables: animals, breeder_cages, litters, transfers. Pass format=csv
+    (default), ndjson or columnar.
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    fmt = request.args.get('format', 'csv')
+    if table not in bulk_io.EXPORT_TABLES or fmt not in bulk_io.EXPORT_FORMATS:
+        return jsonify({'error': f'Unknown table {table} or format {fmt}'}), 404
+    
+    # Copy row values under the read lock; rows are formatted while the response streams
+    rows = bulk_io.export_source(current_colony, table)
+    mimetype, extension = bulk_io.EXPORT_FORMATS[fmt]
+    response = Response(bulk_io.export_rows(rows, table, fmt), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{current_colony.name}-{table}.{extension}"'
+    return response
+
 @app.route('/add_animal', methods=['GET', 'POST'])
+@colony_lock('write')
 def add_animal():
     """Add a new animal to the current colony"""
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
     
@@ -352,7 +432,7 @@ def add_animal():
             animal_id = data.get('animal_id')
             sex = data.get('sex')
             genotype = data.get('genotype')
-            dob = datetime.strptime(data.get('dob'), '%Y-%m-%d')
+            dob = datetime.strptime(data.get('dob'), '%Y-%m-%d').date()
             mother_id = data.get('mother_id')
             father_id = data.get('father_id')
             cage_id = data.get('cage_id')
@@ -361,7 +441,7 @@ def add_animal():
             # Parse date_weaned if provided
             date_weaned = None
             if data.get('date_weaned'):
-                date_weaned = datetime.strptime(data.get('date_weaned'), '%Y-%m-%d')
+                date_weaned = datetime.strptime(data.get('date_weaned'), '%Y-%m-%d').date()
             
             # Create the animal
             animal = Animal(animal_id, sex, genotype, dob, None, None, notes, cage_id, date_weaned)
@@ -397,8 +477,10 @@ def add_animal():
 
 @app.route('/visualization')
 @app.route('/visualization/<vis_type>')
+@colony_lock('read')
 def visualization(vis_type=None):
     """Serve the visualization page"""
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
     
@@ -407,69 +489,68 @@ def visualization(vis_type=None):
         vis_type = 'animals'
         
     show_deceased = session.get('show_deceased', False)
-    return render_template('visualization.html', colony=current_colony, vis_type=vis_type, show_deceased=show_deceased)
+    return render_template('visualization.html', colony=current_colony, vis_type=vis_type, show_deceased=show_deceased,
+                           view_node_limit=layout.VIEW_NODE_LIMIT)
 
-@app.route('/api/colony')
-@app.route('/api/colony/<data_type>')
-def get_colony_data(data_type=None):
-    """Get current colony data for visualization"""
-    if not current_colony:
-        return jsonify({'error': 'No colony loaded'}), 404
-    
-    # Default to animal data if type not specified
-    if data_type not in ['animals', 'cages']:
-        data_type = 'animals'
-    
+def animal_payload(animal):
+    """Convert an animal to the dict sent by the JSON API"""
+    return {
+        'animal_id': animal.animal_id,
+        'sex': animal.sex,
+        'genotype': animal.genotype,
+        'dob': animal.dob.isoformat(),
+        'mother_id': animal.mother.animal_id if animal.mother else None,
+        'father_id': animal.father.animal_id if animal.father else None,
+        'notes': getattr(animal, 'notes', None),
+        'cage_id': getattr(animal, 'cage_id', None),
+        'date_weaned': animal.date_weaned.isoformat() if hasattr(animal, 'date_weaned') and animal.date_weaned else None,
+        'deceased': getattr(animal, 'deceased', False)
+    }
+
+def layout_payload(tree):
+    """Serialize a layout.PedigreeLayout: positions are [x, row], x in node widths, row 0 for founders"""
+    return {
+        'rows': len(tree.layers),
+        'crossings': tree.crossings,
+        'positions': {node: [x, row] for node, (x, row) in tree.positions.items()}
+    }
+
+def build_colony_payload(colony, data_type, include_deceased=True, animals=None):
+    """Build the /api/colony payload for a colony, or for just the given animals (e.g. one lineage)"""
     data = {
-        'name': current_colony.name,
+        'name': colony.name,
         'type': data_type,
-        'animals': []
+        'version': colony.version,
+        # Always include basic animal data
+        'animals': [animal_payload(animal) for animal in (colony.animals if animals is None else animals)]
     }
     
-    # Always include basic animal data
-    for animal in current_colony.animals:
-        animal_data = {
-            'animal_id': animal.animal_id,
-            'sex': animal.sex,
-            'genotype': animal.genotype,
-            'dob': animal.dob.isoformat(),
-            'mother_id': animal.mother.animal_id if animal.mother else None,
-            'father_id': animal.father.animal_id if animal.father else None,
-            'notes': getattr(animal, 'notes', None),
-            'cage_id': getattr(animal, 'cage_id', None),
-            'date_weaned': animal.date_weaned.isoformat() if hasattr(animal, 'date_weaned') and animal.date_weaned else None,
-            'deceased': getattr(animal, 'deceased', False)
-        }
-        data['animals'].append(animal_data)
+    # For the animal tree, ship node positions so the page needs no layout of its own
+    if data_type == 'animals':
+        try:
+            if animals is None:
+                tree = layout.cached_layout(colony, include_deceased)
+            else:
+                tree = layout.colony_layout(colony, [a for a in animals if include_deceased or not a.deceased])
+            data['layout'] = layout_payload(tree)
+        except ValueError as e:
+            data['layout'] = {'error': str(e)}
     
     # For cage visualization, add cage data
     if data_type == 'cages':
-        # Get unique cages
-        unique_cages = {}
-        for animal in current_colony.animals:
-            if animal.cage_id and animal.cage_id not in unique_cages:
-                unique_cages[animal.cage_id] = {
-                    'cage_id': animal.cage_id,
-                    'animals': []
-                }
-            
-            if animal.cage_id:
-                unique_cages[animal.cage_id]['animals'].append(animal.animal_id)
-        
-        data['cages'] = list(unique_cages.values())
-        # Include breeder cages and their litters for cage visualization
-        data['breeder_cages'] = current_colony.breeder_cages
-        # Include deceased flag to regular cages
-        for cage in data['cages']:
-            cage['deceased'] = all(a['deceased'] for a in data['animals'] if a['cage_id'] == cage['cage_id'])
-        # Include deceased flag to breeder cages (parents + litters)
-        for bc in data['breeder_cages']:
-            # Compute group IDs: breeder cage + its litters
-            group_ids = [bc.get('cage_id')] + bc.get('litters', [])
-            bc['deceased'] = all(a['deceased'] for a in data['animals'] if a['cage_id'] in group_ids)
+        # Cages come from the cached cage summary, deceased when no animal is alive
+        summary = colony.cage_summary()
+        data['cages'] = [{
+            'cage_id': cage_id,
+            'animals': [a.animal_id for a in animals],
+            'deceased': not summary['living'][cage_id]
+        } for cage_id, animals in summary['cages'].items()]
+        # Include breeder cages and their litters, deceased when the parents and all litters are
+        data['breeder_cages'] = [dict(bc, deceased=not summary['group_living'].get(bc.get('cage_id')))
+                                 for bc in colony.breeder_cages]
         # Include permanent cage transfer edges for any animal with old_cage_id
         transfers = []
-        for animal in current_colony.animals:
+        for animal in colony.animals:
             if getattr(animal, 'old_cage_id', None):
                 transfers.append({
                     'animal_id': animal.animal_id,
@@ -477,14 +558,611 @@ def get_colony_data(data_type=None):
                     'to': animal.cage_id
                 })
         data['transfers'] = transfers
+    
+    return data
+
+def _lineage(colony, args):
+    """Get the lineage named by the root, direction and depth query parameters
+
+    Raises LookupError for an unknown root and ValueError for a bad
+    direction or depth.
+    """
+    root = colony.get_animal(args.get('root'))
+    if root is None:
+        raise LookupError(f"Animal {args.get('root')} not found")
+    depth = args.get('depth')
+    try:
+        depth = int(depth) if depth else None
+    except ValueError:
+        raise ValueError('depth must be a whole number of generations')
+    if depth is not None and depth < 0:
+        raise ValueError('depth must not be negative')
+    return colony.get_lineage(root, args.get('direction', 'down'), depth)
+
+# Serialized /api/colony payloads per colony object: {'token': str, (data_type, include_deceased): (version, body)}
+_payload_cache = weakref.WeakKeyDictionary()
+_payload_cache_lock = threading.Lock()
+
+@app.route('/api/colony')
+@app.route('/api/colony/<data_type>')
+@colony_lock('read')
+def get_colony_data(data_type=None):
+    """Get current colony data for visualization
+
+    The animals payload carries the family tree layout; include_deceased
+    ('false' for living animals only) picks which animals it places. With
+    root (an animal ID), the animals payload covers just that animal's
+    lineage: direction 'down' (descendants, the default) or 'up'
+    (ancestors), optionally limited to depth generations.
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    
+    # Default to animal data if type not specified
+    if data_type not in ['animals', 'cages']:
+        data_type = 'animals'
+    include_deceased = request.args.get('include_deceased', '').lower() != 'false'
+    
+    # Lineage payloads cost O(lineage) to build, so they are not cached
+    if data_type == 'animals' and request.args.get('root'):
+        try:
+            lineage = _lineage(current_colony, request.args)
+        except LookupError as e:
+            return jsonify({'error': str(e)}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        data = build_colony_payload(current_colony, data_type, include_deceased, lineage)
+        data['root'] = lineage[0].animal_id
+        data['direction'] = request.args.get('direction', 'down')
         return jsonify(data)
+    variant = (data_type, include_deceased) if data_type == 'animals' else (data_type, True)
+    
+    # Reuse the serialized payload until the colony version changes
+    with _payload_cache_lock:
+        entry = _payload_cache.setdefault(current_colony, {'token': uuid.uuid4().hex[:12]})
+        cached = entry.get(variant)
+    version = current_colony.version
+    etag = f"{entry['token']}-{version}-{data_type}{'' if variant[1] else '-living'}"
+    if cached and cached[0] == version:
+        body = cached[1]
+    elif etag in request.if_none_match:
+        # The client already has this version; skip building the payload
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    else:
+        body = json.dumps(build_colony_payload(current_colony, data_type, variant[1]))
+        with _payload_cache_lock:
+            entry[variant] = (version, body)
+    
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# Largest page the animals listing will return
+MAX_PAGE_SIZE = 500
+
+@app.route('/api/colony/animals/page')
+@colony_lock('read')
+def get_animals_page():
+    """Get one page of the current colony's animals, filtered and sorted
+
+    Query parameters: page (from 1), page_size, sort (a Colony.SORT_KEYS
+    field), order ('asc' or 'desc'), and the filters sex, genotype, cage_id,
+    deceased ('true'/'false'), dob_from, dob_to and q (ID substring).
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    
+    args = request.args
+    try:
+        page = max(int(args.get('page', 1)), 1)
+        page_size = min(max(int(args.get('page_size', 50)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'page and page_size must be integers'}), 400
+    sort = args.get('sort', 'animal_id')
+    if sort not in Colony.SORT_KEYS:
+        return jsonify({'error': f'Cannot sort by {sort}'}), 400
+    deceased = args.get('deceased', '').lower()
+    try:
+        animals = current_colony.find_animals(
+            sex=args.get('sex') or None,
+            genotype=args.get('genotype') or None,
+            cage_id=args.get('cage_id') or None,
+            deceased={'true': True, 'false': False}.get(deceased),
+            dob_from=parse_date(args.get('dob_from')),
+            dob_to=parse_date(args.get('dob_to')),
+            id_contains=args.get('q') or None,
+            sort=sort,
+            descending=args.get('order') == 'desc')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    total = len(animals)
+    start = (page - 1) * page_size
+    return jsonify({
+        'version': current_colony.version,
+        'total': total,
+        'page': page,
+        'page_size': page_size,
+        'pages': max((total + page_size - 1) // page_size, 1),
+        'animals': [animal_payload(a) for a in animals[start:start + page_size]]
+    })
+
+@app.route('/api/colony/version')
+def get_colony_version():
+    """Get the current colony's version so clients can tell whether it changed"""
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    return jsonify({'name': current_colony.name, 'version': current_colony.version})
+
+@app.route('/api/colony/events')
+def colony_events():
+    """Stream the current colony's version as server-sent events whenever it changes"""
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    
+    def stream(colony):
+        version = colony.version
+        yield f"event: version\ndata: {version}\n\n"
+        while not colony.retired:
+            new_version = colony.wait_for_change(version, timeout=15)
+            if new_version == version:
+                # Keep proxies from closing an idle connection
+                yield ": keepalive\n\n"
+            else:
+                version = new_version
+                yield f"event: version\ndata: {version}\n\n"
+    
+    response = Response(stream(current_colony), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _relatives_response(colony, animal_id, direction):
+    """Build the ancestors/descendants JSON for one animal, honouring the genotype and max_depth filters"""
+    animal = colony.get_animal(animal_id)
+    if not animal:
+        return jsonify({'error': f'Animal with ID {animal_id} not found'}), 404
+    try:
+        max_depth = int(request.args['max_depth']) if request.args.get('max_depth') else None
+    except ValueError:
+        return jsonify({'error': 'max_depth must be an integer'}), 400
+    genotype = request.args.get('genotype') or None
+    closure = colony.get_ancestors(animal) if direction == 'ancestors' else colony.get_descendants(animal)
+    relatives = [(depth, relative.animal_id) for relative, depth in closure.items()
+                 if (max_depth is None or depth <= max_depth)
+                 and (genotype is None or relative.genotype == genotype)]
+    relatives.sort()
+    return jsonify({
+        'animal_id': animal.animal_id,
+        'pedigree_version': colony.pedigree_version,
+        'count': len(relatives),
+        direction: [{'animal_id': relative_id, 'depth': depth} for depth, relative_id in relatives]
+    })
+
+@app.route('/api/colony/pedigree/<animal_id>/ancestors')
+@colony_lock('read')
+def get_ancestors(animal_id):
+    """Get every ancestor of an animal with its generations back
+
+    Query parameters: genotype (only ancestors with this genotype) and
+    max_depth (1 for parents, 2 for grandparents, ...).
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    return _relatives_response(current_colony, animal_id, 'ancestors')
+
+@app.route('/api/colony/pedigree/<animal_id>/descendants')
+@colony_lock('read')
+def get_descendants(animal_id):
+    """Get every descendant of an animal with its generations down
+
+    Query parameters: genotype (e.g. the lines carrying an allele) and
+    max_depth (1 for children, 2 for grandchildren, ...).
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    return _relatives_response(current_colony, animal_id, 'descendants')
+
+def _animal_pair(colony, first, second):
+    """Look up the two animals named by query parameters, or return an error response"""
+    ids = [request.args.get(first), request.args.get(second)]
+    if not all(ids):
+        return None, (jsonify({'error': f'{first} and {second} are required'}), 400)
+    animals = [colony.get_animal(animal_id) for animal_id in ids]
+    missing = [animal_id for animal_id, animal in zip(ids, animals) if not animal]
+    if missing:
+        return None, (jsonify({'error': f'Animal with ID {missing[0]} not found'}), 404)
+    return animals, None
+
+@app.route('/api/colony/pedigree/common-ancestors')
+@colony_lock('read')
+def get_common_ancestors():
+    """Get the lowest common ancestors of animals a and b, nearest first"""
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    animals, error = _animal_pair(current_colony, 'a', 'b')
+    if error:
+        return error
+    common = current_colony.get_common_ancestors(*animals)
+    return jsonify({
+        'a': animals[0].animal_id,
+        'b': animals[1].animal_id,
+        'common_ancestors': [{'animal_id': ancestor.animal_id, 'depth_a': depth_a, 'depth_b': depth_b}
+                             for ancestor, depth_a, depth_b in common]
+    })
+
+@app.route('/api/colony/pedigree/path')
+@colony_lock('read')
+def get_relationship_path():
+    """Get a shortest chain of parent/child links between animals from and to"""
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    animals, error = _animal_pair(current_colony, 'from', 'to')
+    if error:
+        return error
+    path = current_colony.get_relationship_path(*animals)
+    return jsonify({
+        'from': animals[0].animal_id,
+        'to': animals[1].animal_id,
+        'related': path is not None,
+        'path': [{'animal_id': animal.animal_id, 'relation': relation} for animal, relation in path or []]
+    })
+
+@app.route('/api/colony/genotype-check')
+@colony_lock('read')
+def check_genotypes():
+    """List animals whose genotype their parents cannot produce
+
+    Only animals edited since the previous check (and their children) are
+    rechecked; full=true rechecks the whole colony. Query parameter limit
+    caps the issues returned; count is always the total.
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    try:
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    checker = genetics.colony_checker(current_colony)
+    if request.args.get('full', '').lower() == 'true':
+        checker.refresh(current_colony, full=True)
+    issues = checker.issues()
+    return jsonify({
+        'version': current_colony.version,
+        'checked': checker.last_checked,
+        'count': len(issues),
+        'issues': issues[:limit] if limit is not None else issues
+    })
+
+# Most males or females the pair-ranking routes will consider at once
+MAX_PAIR_CANDIDATES = 2000
+
+def _breeding_candidates(colony, sex, ids, genotype, include_deceased):
+    """Get the candidate breeders of one sex, sorted by ID: the listed IDs, or every match"""
+    if ids:
+        animals = []
+        for animal_id in ids.split(','):
+            animal = colony.get_animal(animal_id.strip())
+            if not animal:
+                raise LookupError(f'Animal with ID {animal_id.strip()} not found')
+            animals.append(animal)
+    else:
+        animals = colony.get_males() if sex == 'M' else colony.get_females()
+        animals = [a for a in animals
+                   if (include_deceased or not getattr(a, 'deceased', False))
+                   and (not genotype or a.genotype == genotype)]
+    return sorted(animals, key=lambda a: a.animal_id)
+
+@app.route('/api/colony/kinship/pairs')
+@colony_lock('read')
+def get_breeding_pairs():
+    """Rank candidate male/female pairs by kinship, lowest first, for choosing breeders
+
+    Query parameters: males and females (comma-separated IDs; default every
+    living animal of that sex), male_genotype and female_genotype (filters
+    for the defaults), include_deceased ('true' to consider deceased
+    animals) and limit (pairs returned, default 20). A pair's kinship is the
+    inbreeding coefficient its offspring would have.
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    args = request.args
+    include_deceased = args.get('include_deceased', '').lower() == 'true'
+    try:
+        limit = min(max(int(args.get('limit', 20)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    try:
+        males = _breeding_candidates(current_colony, 'M', args.get('males'),
+                                     args.get('male_genotype'), include_deceased)
+        females = _breeding_candidates(current_colony, 'F', args.get('females'),
+                                       args.get('female_genotype'), include_deceased)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    if max(len(males), len(females)) > MAX_PAIR_CANDIDATES:
+        return jsonify({'error': f'Too many candidates ({len(males)} males, {len(females)} females); '
+                                 f'narrow them by genotype or list IDs (at most {MAX_PAIR_CANDIDATES} of each sex)'}), 400
     
+    kin = kinship.colony_kinship(current_colony)
+    pairs = kinship.rank_breeding_pairs(kin, males, females, limit)
+    for pair in pairs:
+        pair['father_inbreeding'] = kin.inbreeding_of(current_colony.get_animal(pair['father_id']))
+        pair['mother_inbreeding'] = kin.inbreeding_of(current_colony.get_animal(pair['mother_id']))
+    return jsonify({
+        'pedigree_version': current_colony.pedigree_version,
+        'males': len(males),
+        'females': len(females),
+        'pairs': pairs
+    })
+
+@app.route('/api/colony/kinship/inbreeding')
+@colony_lock('read')
+def get_inbreeding():
+    """Get Wright's inbreeding coefficient of the animals listed in ids (comma-separated), or of every animal"""
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    if request.args.get('ids'):
+        animals = [current_colony.get_animal(animal_id.strip()) for animal_id in request.args['ids'].split(',')]
+        if not all(animals):
+            return jsonify({'error': 'Unknown animal ID in ids'}), 404
+    else:
+        animals = current_colony.animals
+    kin = kinship.colony_kinship(current_colony)
+    return jsonify({
+        'pedigree_version': current_colony.pedigree_version,
+        'inbreeding': {animal.animal_id: kin.inbreeding_of(animal) for animal in animals}
+    })
+
+@app.route('/api/colony/kinship')
+@colony_lock('read')
+def get_kinship():
+    """Get the kinship coefficient of animals a and b"""
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    animals, error = _animal_pair(current_colony, 'a', 'b')
+    if error:
+        return error
+    kin = kinship.colony_kinship(current_colony)
+    return jsonify({
+        'a': animals[0].animal_id,
+        'b': animals[1].animal_id,
+        'kinship': float(kin.kinship(animals[:1], animals[1:])[0, 0])
+    })
+
+@app.route('/api/colony/breeding/pairings')
+@colony_lock('read')
+def plan_pairings():
+    """Score candidate male/female pairs by the genotypes their litters are expected to have
+
+    Candidates are chosen as for /api/colony/kinship/pairs (males, females,
+    male_genotype, female_genotype, include_deceased). With target (e.g.
+    'Homo (+/+)') pairs are ranked by their chance of a pup with that
+    genotype, best first; otherwise they are listed by ID. Returns at most
+    limit pairs (default 20), each with its expected ratios and kinship.
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    args = request.args
+    include_deceased = args.get('include_deceased', '').lower() == 'true'
+    try:
+        limit = min(max(int(args.get('limit', 20)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    try:
+        males = _breeding_candidates(current_colony, 'M', args.get('males'),
+                                     args.get('male_genotype'), include_deceased)
+        females = _breeding_candidates(current_colony, 'F', args.get('females'),
+                                       args.get('female_genotype'), include_deceased)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    if max(len(males), len(females)) > MAX_PAIR_CANDIDATES:
+        return jsonify({'error': f'Too many candidates ({len(males)} males, {len(females)} females); '
+                                 f'narrow them by genotype or list IDs (at most {MAX_PAIR_CANDIDATES} of each sex)'}), 400
+    
+    table = genetics.OffspringTable({animal.genotype for animal in current_colony.animals})
+    target = args.get('target')
+    if target:
+        try:
+            chance = table.target_chance(females, males, target)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        # Best chance first; ties keep the (female, male) ID order
+        order = np.argsort(-chance, axis=None, kind='stable')[:limit]
+    else:
+        chance = None
+        order = np.arange(min(len(females) * len(males), limit))
+    chosen = [(females[i // len(males)], males[i % len(males)]) for i in order]
+    
+    pairs = []
+    if chosen:
+        kin = kinship.colony_kinship(current_colony)
+        kin_females = list(dict.fromkeys(female for female, _ in chosen))
+        kin_males = list(dict.fromkeys(male for _, male in chosen))
+        coefficients = kin.kinship(kin_males, kin_females)
+        for i, (female, male) in zip(order, chosen):
+            pairs.append({
+                'father_id': male.animal_id,
+                'mother_id': female.animal_id,
+                'target_chance': float(chance.flat[i]) if chance is not None and chance.flat[i] >= 0 else None,
+                'ratios': table.ratios(female, male),
+                'kinship': float(coefficients[kin_males.index(male), kin_females.index(female)]),
+            })
+    return jsonify({
+        'target': target,
+        'pairs_evaluated': len(males) * len(females),
+        'pairs': pairs
+    })
+
+@app.route('/api/colony/breeding/forecast')
+@colony_lock('read')
+def forecast_litters():
+    """Forecast pups by genotype from every active breeder cage over the next few weeks
+
+    Query parameters: weeks (default 4), litter_size (default
+    genetics.LITTER_SIZE), gestation_days and litter_interval_days.
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    args = request.args
+    try:
+        weeks = float(args.get('weeks', 4))
+        litter_size = float(args.get('litter_size', genetics.LITTER_SIZE))
+        gestation_days = int(args.get('gestation_days', genetics.GESTATION_DAYS))
+        interval_days = int(args.get('litter_interval_days', genetics.LITTER_INTERVAL_DAYS))
+        # float() accepts inf and nan
+        if not (math.isfinite(weeks) and math.isfinite(litter_size)):
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'weeks, litter_size, gestation_days and litter_interval_days must be numbers'}), 400
+    if weeks < 0 or litter_size < 0 or gestation_days < 0 or interval_days < 1:
+        return jsonify({'error': 'weeks, litter_size and gestation_days must not be negative; litter_interval_days must be positive'}), 400
+    return jsonify(genetics.forecast_litters(current_colony, weeks, date.today(), litter_size,
+                                             gestation_days, interval_days))
+
+@app.route('/api/colony/layout')
+@colony_lock('read')
+def get_tree_layout():
+    """Get family tree positions, cached until the colony's parent links change
+
+    Query parameter include_deceased ('false' to lay out living animals
+    only). Positions are [x, row]: x in node widths, row 0 for founders.
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    include_deceased = request.args.get('include_deceased', '').lower() != 'false'
+    try:
+        tree = layout.cached_layout(current_colony, include_deceased)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(dict(layout_payload(tree), version=current_colony.version))
+
+@app.route('/api/colony/layout/view')
+@colony_lock('read')
+def get_tree_view():
+    """Get the part of the family tree inside a viewport, collapsed to fit
+
+    Query parameters: x0, x1, row0, row1 (a box in layout units; all four or
+    none for the whole tree), detail ('auto', 'animals', 'clusters' or
+    'bins'), group ('litter' or 'cage'), expand (comma-separated cluster IDs
+    to show as animals) and include_deceased ('false' for living animals).
+    See layout.TreeView.query for the response.
+    """
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    args = request.args
+    include_deceased = args.get('include_deceased', '').lower() != 'false'
+    expanded = [key for key in args.get('expand', '').split(',') if key]
+    try:
+        box = None
+        if any(args.get(name) for name in ('x0', 'x1', 'row0', 'row1')):
+            box = tuple(float(args[name]) for name in ('x0', 'x1', 'row0', 'row1'))
+            if not all(map(math.isfinite, box)):
+                raise ValueError('x0, x1, row0 and row1 must be finite numbers')
+        view = layout.tree_view(current_colony, include_deceased, args.get('group', 'litter'))
+        data = view.query(box, expanded, args.get('detail', 'auto'))
+    except KeyError:
+        return jsonify({'error': 'Give all of x0, x1, row0 and row1, or none of them'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    for node in data['nodes']:
+        if node['kind'] == 'animal':
+            animal = current_colony.get_animal(node['id'])
+            node.update(sex=animal.sex, genotype=animal.genotype, deceased=animal.deceased)
+    data['version'] = current_colony.version
     return jsonify(data)
 
+# Longest a request waits for a tree image before asking the client to retry
+RENDER_TIMEOUT = 60
+
+@colony_lock('read')
+def _submit_render(fmt):
+    """Queue the tree image for the current request; returns a Future, or an error response"""
+    current_colony = get_current_colony()
+    if not current_colony:
+        return jsonify({'error': 'No colony loaded'}), 404
+    args = request.args
+    try:
+        animals, title = None, None
+        if args.get('root'):
+            animals = _lineage(current_colony, args)
+            relatives = 'Ancestors' if args.get('direction') == 'up' else 'Descendants'
+            title = f"Family Tree - {current_colony.name} - {relatives} of {animals[0].animal_id}"
+        dpi = int(args.get('dpi', render_service.DEFAULT_STYLE['dpi']))
+        if not 30 <= dpi <= 600:
+            raise ValueError('dpi must be between 30 and 600')
+        return render_service.get_service().submit(
+            current_colony, animals, fmt,
+            include_deceased=args.get('include_deceased', '').lower() != 'false',
+            title=title, dpi=dpi, labels=args.get('labels', '').lower() != 'false')
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+def _retry_later(message):
+    response = jsonify({'error': message})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
+@app.route('/render/tree.<fmt>')
+def render_tree(fmt):
+    """Get the family tree as a PNG or SVG image, drawn by the render service
+
+    Query parameters: root, direction and depth (one lineage, as for
+    /api/colony/animals), include_deceased ('false' for living animals),
+    dpi and labels ('false' to leave out ID and genotype labels). The colony
+    lock is only held while the request is queued, not while it renders.
+    """
+    if fmt not in render_service.FORMATS:
+        return jsonify({'error': f'Cannot render {fmt}'}), 404
+    # A cached image can be pruned between the lookup and sending it; render it again once
+    for _ in range(2):
+        future = _submit_render(fmt)
+        if not isinstance(future, Future):
+            return future
+        try:
+            path = future.result(timeout=RENDER_TIMEOUT)
+        except FutureTimeout:
+            return _retry_later('The tree is still rendering; try again shortly')
+        except BrokenProcessPool:
+            # The worker died; the next request gets a fresh one
+            print("Render worker exited unexpectedly")
+            return _retry_later('The renderer restarted; try again shortly')
+        except Exception as e:
+            print(f"Error rendering tree: {str(e)}")
+            traceback.print_exc()
+            return jsonify({'error': f'Could not render the tree: {str(e)}'}), 500
+        try:
+            response = send_file(os.path.abspath(path), mimetype=render_service.FORMATS[fmt])
+        except FileNotFoundError:
+            continue
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return _retry_later('The rendered image was removed before it could be sent; try again')
+
 @app.route('/colony/rename', methods=['POST'])
+@colony_lock('write')
 def rename_colony():
     """Rename the current colony"""
-    global current_colony
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
     
@@ -493,7 +1171,8 @@ def rename_colony():
         return "Error: New name is required", 400
     
     print(f"Renaming colony from '{current_colony.name}' to '{new_name}'")
-    current_colony.name = new_name
+    colony_manager.rename(current_colony.name, new_name)
+    current_colony.bump_version()
     
     # Update the colony name in session
     session['colony_name'] = new_name
@@ -503,8 +1182,10 @@ def rename_colony():
     return redirect(url_for('view_colony'))
 
 @app.route('/delete_animal/<animal_id>', methods=['POST'])
+@colony_lock('write')
 def delete_animal(animal_id):
     """Delete an animal from the current colony"""
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
     
@@ -512,31 +1193,8 @@ def delete_animal(animal_id):
         # Find and remove the animal
         animal = current_colony.get_animal(animal_id)
         if animal:
-            # Remove parent-child relationships
-            if animal.mother and animal in animal.mother.children:
-                try:
-                    animal.mother.children.remove(animal)
-                except ValueError:
-                    print(f"Warning: could not remove {animal.animal_id} from previous mother's children list")
-            
-            if animal.father and animal in animal.father.children:
-                try:
-                    animal.father.children.remove(animal)
-                except ValueError:
-                    print(f"Warning: could not remove {animal.animal_id} from previous father's children list")
-            
-            # Remove references to this animal as a parent from other animals
-            for other_animal in current_colony.animals:
-                if other_animal.mother and other_animal.mother.animal_id == animal_id:
-                    print(f"Removing parent reference: {other_animal.animal_id}'s mother was {animal_id}")
-                    other_animal.mother = None
-                
-                if other_animal.father and other_animal.father.animal_id == animal_id:
-                    print(f"Removing parent reference: {other_animal.animal_id}'s father was {animal_id}")
-                    other_animal.father = None
-            
-            # Remove the animal from the colony
-            current_colony.animals.remove(animal)
+            # Remove the animal from the colony, unlinking parents and children
+            current_colony.remove_animal(animal)
             
             # Save the colony after deletion
             save_colony(current_colony, current_colony.name)
@@ -550,9 +1208,10 @@ def delete_animal(animal_id):
     return redirect(url_for('view_animals'))
 
 @app.route('/edit_animal/<animal_id>', methods=['POST'])
+@colony_lock('write')
 def edit_animal(animal_id):
     """Edit an existing animal's properties"""
-    global current_colony
+    current_colony = get_current_colony()
     
     print(f"Edit animal request received for animal ID: {animal_id}")
     print(f"Request content type: {request.content_type}")
@@ -633,6 +1292,21 @@ def edit_animal(animal_id):
             except ValueError:
                 print(f"Invalid date_weaned format: {date_weaned_str}")
         
+        # Resolve the parents and reject cycles before changing anything
+        parents = {}
+        for role, parent_id, current in (('Mother', mother_id, animal.mother), ('Father', father_id, animal.father)):
+            parent = current
+            if parent_id != (current.animal_id if current else None):
+                print(f"Changing {role.lower()} from {current.animal_id if current else None} to {parent_id}")
+                parent = current_colony.get_animal_by_id(parent_id) if parent_id else None
+                if parent_id and not parent:
+                    print(f"{role} with ID {parent_id} not found")
+                    parent = current
+            if parent is not current and current_colony.would_create_cycle(animal, parent):
+                error = f'{parent.animal_id} cannot be the {role.lower()} of {animal.animal_id}: it is the animal itself or one of its descendants'
+                return jsonify({'success': False, 'error': error}), 400
+            parents[role] = parent
+        
         # Update the animal ID if it changed
         if new_id and new_id != original_id:
             print(f"Changing animal ID from {original_id} to {new_id}")
@@ -640,25 +1314,20 @@ def edit_animal(animal_id):
             if current_colony.get_animal_by_id(new_id):
                 print(f"Animal with ID {new_id} already exists")
                 return jsonify({'success': False, 'error': f'Animal with ID {new_id} already exists'}), 400
-            animal.animal_id = new_id
-            # Update breeder cage parent references if they used the old ID
-            for bc in current_colony.breeder_cages:
-                if bc.get('mother_id') == original_id:
-                    bc['mother_id'] = new_id
-                if bc.get('father_id') == original_id:
-                    bc['father_id'] = new_id
+            # Re-keys the index and updates breeder cage parent references
+            current_colony.update_animal_id(original_id, new_id)
         
         # Update other properties
         if sex:
-            animal.sex = sex
+            current_colony.set_sex(animal, sex)
         if genotype:
-            animal.genotype = genotype
+            animal.genotype = intern_value(genotype)
         if dob:
             animal.dob = dob
         if date_weaned:
             animal.date_weaned = date_weaned
         if cage_id is not None:  # Allow empty cage_id to clear existing cage
-            animal.cage_id = cage_id
+            current_colony.move_animal(animal, cage_id)
         if notes is not None:  # Allow empty notes to clear existing notes
             animal.notes = notes
             
@@ -670,54 +1339,12 @@ def edit_animal(animal_id):
         print(f"edit_animal: deceased_flag={deceased_flag}")
         animal.deceased = deceased_flag
         
-        # Update mother if changed
-        old_mother_id = animal.mother.animal_id if animal.mother else None
-        if mother_id != old_mother_id:
-            print(f"Changing mother from {old_mother_id} to {mother_id}")
-            # If there was a previous mother, remove this animal from her children
-            if animal.mother:
-                try:
-                    animal.mother.children.remove(animal)
-                except ValueError:
-                    print(f"Warning: could not remove {animal.animal_id} from previous mother's children list")
-            
-            # Set the new mother
-            if mother_id:
-                mother = current_colony.get_animal_by_id(mother_id)
-                if mother:
-                    animal.mother = mother
-                    if animal not in mother.children:
-                        mother.children.append(animal)
-                else:
-                    print(f"Mother with ID {mother_id} not found")
-            else:
-                animal.mother = None
-                
-        # Update father if changed
-        old_father_id = animal.father.animal_id if animal.father else None
-        if father_id != old_father_id:
-            print(f"Changing father from {old_father_id} to {father_id}")
-            # If there was a previous father, remove this animal from his children safely
-            if animal.father and animal in animal.father.children:
-                try:
-                    animal.father.children.remove(animal)
-                except Exception as e:
-                    print(f"Warning: failed to remove {animal.animal_id} from old father's children: {e}")
-            
-            # Set the new father
-            if father_id:
-                father = current_colony.get_animal_by_id(father_id)
-                if father:
-                    animal.father = father
-                    if animal not in father.children:
-                        father.children.append(animal)
-                else:
-                    print(f"Father with ID {father_id} not found")
-            else:
-                animal.father = None
+        # Update parents if changed
+        current_colony.set_parents(animal, parents['Mother'], parents['Father'])
         
         # Save the colony
         print(f"Saving colony after updating animal {animal.animal_id}")
+        current_colony.mark_changed(animal)
         save_colony(current_colony, current_colony.name)
         
         print(f"Successfully updated animal {animal.animal_id}")
@@ -726,10 +1353,11 @@ def edit_animal(animal_id):
         if request.content_type and 'application/json' not in request.content_type:
             return redirect(url_for('view_animals'))
             
-        # For API calls, return JSON response
+        # For API calls, return JSON response, flagging genotypes the edit made impossible
         return jsonify({
             'success': True,
-            'message': f'Successfully updated animal {animal.animal_id}'
+            'message': f'Successfully updated animal {animal.animal_id}',
+            'genotype_issues': genetics.colony_checker(current_colony).issues([animal, *animal.children])
         })
         
     except Exception as e:
@@ -748,8 +1376,8 @@ def rename_colony_file(old_name):
     if not os.path.exists('colonies'):
         os.makedirs('colonies')
 
-    old_path = os.path.join('colonies', f'{old_name}.json')
-    new_path = os.path.join('colonies', f'{new_name}.json')
+    old_path = colony_store().snapshot_path(old_name)
+    new_path = colony_store().snapshot_path(new_name)
 
     # Check if the old file exists
     if not os.path.exists(old_path):
@@ -760,13 +1388,13 @@ def rename_colony_file(old_name):
         return "Error: A colony with this name already exists", 400
     
     try:
-        # If this is the currently loaded colony, update its name in memory
-        global current_colony
-        if current_colony and current_colony.name == old_name:
-            current_colony.name = new_name
+        # Rename the snapshot and its journal
+        colony_store().rename_colony_files(old_name, new_name)
         
-        # Rename the file
-        os.rename(old_path, new_path)
+        # If this colony is loaded, update its name in memory
+        colony_manager.rename(old_name, new_name)
+        if session.get('colony_name') == old_name:
+            session['colony_name'] = new_name
         
         return redirect(url_for('list_colonies'))
     except Exception as e:
@@ -779,20 +1407,18 @@ def delete_colony(name):
     if not os.path.exists('colonies'):
         return "Error: Colonies directory not found", 404
     
-    colony_path = os.path.join('colonies', f'{name}.json')
+    colony_path = colony_store().snapshot_path(name)
     
     # Check if the file exists
     if not os.path.exists(colony_path):
         return "Error: Colony file not found", 404
     
     try:
-        # If this is the currently loaded colony, clear it
-        global current_colony
-        if current_colony and current_colony.name == name:
-            current_colony = None
+        # If this colony is loaded, drop it from memory
+        colony_manager.discard(name)
         
-        # Delete the file
-        os.remove(colony_path)
+        # Delete the snapshot and its journal
+        colony_store().delete_colony_files(name)
         print(f"Deleted colony: {name}")
         
         return redirect(url_for('list_colonies'))
@@ -801,8 +1427,10 @@ def delete_colony(name):
         return f"Error deleting colony: {str(e)}", 500
 
 @app.route('/edit_animal_id', methods=['POST'])
+@colony_lock('write')
 def edit_animal_id():
     """Edit an animal's ID"""
+    current_colony = get_current_colony()
     if not current_colony:
         return jsonify({'success': False, 'error': 'No colony loaded'})
     
@@ -822,14 +1450,8 @@ def edit_animal_id():
         if current_colony.get_animal(new_id):
             return jsonify({'success': False, 'error': 'New ID already exists'})
         
-        # Update the ID
-        animal.animal_id = new_id
-        
-        # Update references in parent-child relationships
-        if animal.mother:
-            animal.mother.children = [new_id if child == old_id else child for child in animal.mother.children]
-        if animal.father:
-            animal.father.children = [new_id if child == old_id else child for child in animal.father.children]
+        # Update the ID; relatives hold object references so only the index changes
+        current_colony.update_animal_id(old_id, new_id)
         
         # Save the colony
         save_colony(current_colony, current_colony.name)
@@ -841,8 +1463,10 @@ def edit_animal_id():
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/tree')
+@colony_lock('read')
 def tree_visualization():
     """Open the tree visualization in a new tab"""
+    current_colony = get_current_colony()
     try:
         logger.debug("Opening tree visualization")
         if not current_colony:
@@ -852,10 +1476,10 @@ def tree_visualization():
         
         # Start the Dash server in a separate thread if it's not already running
         from tree_visualization import run_dash_server
-        run_dash_server(current_colony)
+        run_dash_server(current_colony, colony_manager.get)
         
-        # Redirect to the Dash app URL
-        return redirect('http://127.0.0.1:8050')
+        # Redirect to the Dash app URL, naming this session's colony
+        return redirect('http://127.0.0.1:8050/?' + urlencode({'colony': current_colony.name}))
     except Exception as e:
         logger.error(f"Error opening tree visualization: {str(e)}")
         logger.error(traceback.format_exc())
@@ -863,8 +1487,10 @@ def tree_visualization():
         return redirect(url_for('view_colony'))
 
 @app.route('/add_cage', methods=['GET', 'POST'])
+@colony_lock('write')
 def add_cage():
     """Add a new cage with multiple animals to the current colony"""
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
     
@@ -885,25 +1511,20 @@ def add_cage():
                 # Append to breeder's litters
                 bc = next((bc for bc in current_colony.breeder_cages if bc['cage_id'] == breeder_id), None)
                 if bc and existing_id not in bc['litters']:
-                    bc['litters'].append(existing_id)
-                    print(f"Adopted existing cage {existing_id} as litter of breeder {breeder_id}")
-                    # Reparent animals in the existing cage to this breeder's parents
+                    # Reparent animals in the existing cage to this breeder's parents,
+                    # checking all of them before changing anything
                     mom = current_colony.get_animal(bc['mother_id'])
                     dad = current_colony.get_animal(bc['father_id'])
-                    for animal in list(current_colony.animals):
-                        if animal.cage_id == existing_id:
-                            # Remove from old parents
-                            if animal.mother and animal in animal.mother.children:
-                                animal.mother.children.remove(animal)
-                            if animal.father and animal in animal.father.children:
-                                animal.father.children.remove(animal)
-                            # Assign new parents
-                            animal.mother = mom
-                            animal.father = dad
-                            if mom and animal not in mom.children:
-                                mom.children.append(animal)
-                            if dad and animal not in dad.children:
-                                dad.children.append(animal)
+                    litter = current_colony.get_animals_in_cage(existing_id)
+                    for animal in litter:
+                        if current_colony.would_create_cycle(animal, mom) or current_colony.would_create_cycle(animal, dad):
+                            raise ValueError(f"Cannot adopt cage {existing_id}: {animal.animal_id} is a breeder "
+                                             f"of cage {breeder_id} or one of their ancestors")
+                    bc['litters'].append(existing_id)
+                    current_colony.bump_version()
+                    print(f"Adopted existing cage {existing_id} as litter of breeder {breeder_id}")
+                    for animal in litter:
+                        current_colony.set_parents(animal, mom, dad)
                     # Save and return
                     save_colony(current_colony, current_colony.name)
                     if is_api:
@@ -916,10 +1537,10 @@ def add_cage():
             num_animals = int(data.get('num_animals', 1))
             sex = data.get('sex')
             genotype = data.get('genotype')
-            dob = datetime.strptime(data.get('dob'), '%Y-%m-%d')
+            dob = datetime.strptime(data.get('dob'), '%Y-%m-%d').date()
             date_weaned = None
             if data.get('date_weaned'):
-                date_weaned = datetime.strptime(data.get('date_weaned'), '%Y-%m-%d')
+                date_weaned = datetime.strptime(data.get('date_weaned'), '%Y-%m-%d').date()
             mother_id = data.get('mother_id')
             father_id = data.get('father_id')
             notes = data.get('notes')
@@ -947,6 +1568,7 @@ def add_cage():
                 bc = next((bc for bc in current_colony.breeder_cages if bc['cage_id'] == breeder_id), None)
                 if bc is not None:
                     bc['litters'].append(cage_id)
+                    current_colony.bump_version()
                     save_colony(current_colony, current_colony.name)
                     print(f"Added litter {cage_id} to breeder cage {breeder_id}")
             
@@ -966,8 +1588,10 @@ def add_cage():
     return render_template('add_cage.html', colony=current_colony)
 
 @app.route('/delete_cage', methods=['POST'])
+@colony_lock('write')
 def delete_cage():
     """Delete a cage and all animals in it from the current colony"""
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
     
@@ -979,7 +1603,7 @@ def delete_cage():
     try:
         print(f"Attempting to delete cage: {cage_id}")
         # Find all animals in the cage
-        animals_to_delete = [animal for animal in current_colony.animals if animal.cage_id == cage_id]
+        animals_to_delete = current_colony.get_animals_in_cage(cage_id)
         
         if not animals_to_delete:
             print(f"No animals found in cage {cage_id}")
@@ -988,27 +1612,15 @@ def delete_cage():
         # Remove each animal
         for animal in animals_to_delete:
             print(f"Removing animal: {animal.animal_id}")
-            # Remove parent-child relationships
-            if animal.mother and animal in animal.mother.children:
-                try:
-                    animal.mother.children.remove(animal)
-                except ValueError:
-                    print(f"Warning: could not remove {animal.animal_id} from previous mother's children list")
-            
-            if animal.father and animal in animal.father.children:
-                try:
-                    animal.father.children.remove(animal)
-                except ValueError:
-                    print(f"Warning: could not remove {animal.animal_id} from previous father's children list")
-            
-            # Remove the animal from the colony
-            current_colony.animals.remove(animal)
+            # Remove the animal from the colony, unlinking parents and children
+            current_colony.remove_animal(animal)
         
         # Remove litter reference from breeder cages
         for bc in current_colony.breeder_cages:
             # bc['litters'] exists by load/create
             if cage_id in bc.get('litters', []):
                 bc['litters'].remove(cage_id)
+                current_colony.bump_version()
                 print(f"Removed litter {cage_id} from breeder cage {bc['cage_id']}")
         
         # Save the colony after deletion and litters update
@@ -1022,9 +1634,10 @@ def delete_cage():
     return redirect(url_for('view_cages'))
 
 @app.route('/edit_cage', methods=['POST'])
+@colony_lock('write')
 def edit_cage():
     """Update all animals in a cage with the specified properties"""
-    global current_colony
+    current_colony = get_current_colony()
 
     # Initialize dob and date_weaned so they're always in scope
     dob = None
@@ -1037,23 +1650,8 @@ def edit_cage():
     print(f"Request form: {request.form}")
     
     if not current_colony:
-        print("No active colony found, trying to recover from session")
-        # Try to recover the colony from session if possible
-        colony_name = session.get('colony_name')
-        print(f"Colony name from session: {colony_name}")
-        
-        if colony_name and os.path.exists(f'colonies/{colony_name}.json'):
-            try:
-                print(f"Loading colony from file: colonies/{colony_name}.json")
-                current_colony = load_colony(colony_name)
-                print(f"Successfully loaded colony with {len(current_colony.animals)} animals")
-            except Exception as e:
-                print(f"Failed to load colony: {e}")
-                traceback.print_exc()
-                return jsonify({'success': False, 'error': 'Failed to load colony. Please reload your colony.'}), 400
-        else:
-            print("No colony in session or colony file not found")
-            return jsonify({'success': False, 'error': 'No colony selected or colony not found. Please select a colony.'}), 400
+        print("No colony in session or colony file not found")
+        return jsonify({'success': False, 'error': 'No colony selected or colony not found. Please select a colony.'}), 400
     else:
         print(f"Using active colony: {current_colony.name} with {len(current_colony.animals)} animals")
     
@@ -1105,7 +1703,7 @@ def edit_cage():
 
         # Find all animals in the specified cage
         print(f"Looking for animals in cage: {cage_id}")
-        animals_in_cage = [animal for animal in current_colony.animals if animal.cage_id == cage_id]
+        animals_in_cage = current_colony.get_animals_in_cage(cage_id)
         print(f"Found {len(animals_in_cage)} animals in cage {cage_id}")
         if not animals_in_cage:
             print(f"ERROR: No animals found in cage {cage_id}")
@@ -1118,8 +1716,8 @@ def edit_cage():
             for animal in animals_in_cage:
                 old_id = animal.animal_id
                 suffix = animal.animal_id.split('_', 1)[1] if '_' in animal.animal_id else '1'
-                animal.animal_id = f"{new_cage_id}_{suffix}"
-                animal.cage_id = new_cage_id
+                current_colony.update_animal_id(old_id, f"{new_cage_id}_{suffix}")
+                current_colony.move_animal(animal, new_cage_id)
                 print(f"  Updated animal ID from {old_id} to {animal.animal_id}")
             print(f"Updated cage ID for {len(animals_in_cage)} animals")
         
@@ -1158,10 +1756,10 @@ def edit_cage():
             print(f"Updating animal: {animal.animal_id}")
             if sex:
                 print(f"  Changing sex from {animal.sex} to {sex}")
-                animal.sex = sex
+                current_colony.set_sex(animal, sex)
             if genotype:
                 print(f"  Changing genotype from {animal.genotype} to {genotype}")
-                animal.genotype = genotype
+                animal.genotype = intern_value(genotype)
             if dob:
                 print(f"  Changing DOB from {animal.dob} to {dob}")
                 animal.dob = dob
@@ -1176,6 +1774,7 @@ def edit_cage():
         
         # Save the colony
         print(f"Saving colony {current_colony.name} with updated animals")
+        current_colony.mark_changed(*animals_in_cage)
         save_colony(current_colony, current_colony.name)
         print("Colony saved successfully")
         
@@ -1211,9 +1810,10 @@ def edit_cage():
 
 # Add breeder cage route
 @app.route('/add_breeder_cage', methods=['GET', 'POST'])
+@colony_lock('write')
 def add_breeder_cage():
     """Add a new breeder cage with specified parents and optional date mated/notes"""
-    global current_colony
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
 
@@ -1259,7 +1859,8 @@ def add_breeder_cage():
                     return jsonify({'success': False, 'error': f'Mother {mid_exist} not found or not female'}), 400
                 # Record transfer
                 mother.old_cage_id = mother.cage_id
-                mother.cage_id = cage_id
+                current_colony.move_animal(mother, cage_id)
+                current_colony.mark_changed(mother)
             
             # Process father
             father = None
@@ -1279,7 +1880,8 @@ def add_breeder_cage():
                 if not father or father.sex != 'M':
                     return jsonify({'success': False, 'error': f'Father {fid_exist} not found or not male'}), 400
                 father.old_cage_id = father.cage_id
-                father.cage_id = cage_id
+                current_colony.move_animal(father, cage_id)
+                current_colony.mark_changed(father)
             
             # Append breeder cage entry
             breeder_entry = {
@@ -1291,6 +1893,7 @@ def add_breeder_cage():
                 'litters': []
             }
             current_colony.breeder_cages.append(breeder_entry)
+            current_colony.bump_version()
 
             # Save colony
             save_colony(current_colony, current_colony.name)
@@ -1305,9 +1908,10 @@ def add_breeder_cage():
 
 # Add edit breeder cage handling route
 @app.route('/edit_breeder_cage', methods=['POST'])
+@colony_lock('write')
 def edit_breeder_cage():
     """Edit an existing breeder cage's properties"""
-    global current_colony
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
 
@@ -1320,6 +1924,14 @@ def edit_breeder_cage():
     notes = request.form.get('notes') or ''
     deceased_flag = request.form.get('deceased')
 
+    # The parent fields are free text; only accept a known female and male
+    for role, parent_id, sex in (('Mother', mother_id, 'F'), ('Father', father_id, 'M')):
+        parent = current_colony.get_animal(parent_id) if parent_id else None
+        if not parent:
+            return f"Error: {role} {parent_id or '(none)'} not found", 400
+        if parent.sex != sex:
+            return f"Error: {role} {parent_id} is not {'female' if sex == 'F' else 'male'}", 400
+
     for bc in current_colony.breeder_cages:
         if bc['cage_id'] == original_cage_id:
             # Rename breeder cage if needed
@@ -1334,20 +1946,21 @@ def edit_breeder_cage():
                     parent_mom = current_colony.get_animal(bc['mother_id'])
                     parent_dad = current_colony.get_animal(bc['father_id'])
                     if parent_mom:
-                        parent_mom.cage_id = new_cage_id
+                        current_colony.move_animal(parent_mom, new_cage_id)
                     if parent_dad:
-                        parent_dad.cage_id = new_cage_id
+                        current_colony.move_animal(parent_dad, new_cage_id)
             # Update other fields
             bc['mother_id'] = mother_id
             bc['father_id'] = father_id
             bc['date_mated'] = date_mated
             bc['notes'] = notes
+            current_colony.bump_version()
             break
 
     # Update deceased status for all animals in this breeder cage
-    for animal in current_colony.animals:
-        if animal.cage_id == original_cage_id:
-            animal.deceased = bool(deceased_flag)
+    for animal in current_colony.get_animals_in_cage(original_cage_id):
+        animal.deceased = bool(deceased_flag)
+        current_colony.mark_changed(animal)
 
     # Save changes
     save_colony(current_colony, current_colony.name)
@@ -1357,9 +1970,10 @@ def edit_breeder_cage():
 
 # Add delete breeder cage route
 @app.route('/delete_breeder_cage', methods=['POST'])
+@colony_lock('write')
 def delete_breeder_cage():
     """Delete a breeder cage entry and unassign parents"""
-    global current_colony
+    current_colony = get_current_colony()
     if not current_colony:
         return redirect(url_for('list_colonies'))
     cage_id = request.form.get('cage_id')
@@ -1370,13 +1984,14 @@ def delete_breeder_cage():
         bc_to_delete = next((bc for bc in current_colony.breeder_cages if bc['cage_id'] == cage_id), None)
         if bc_to_delete:
             current_colony.breeder_cages.remove(bc_to_delete)
+            current_colony.bump_version()
             # Unassign parents from this breeder cage
             mother = current_colony.get_animal(bc_to_delete['mother_id'])
             father = current_colony.get_animal(bc_to_delete['father_id'])
             if mother:
-                mother.cage_id = None
+                current_colony.move_animal(mother, None)
             if father:
-                father.cage_id = None
+                current_colony.move_animal(father, None)
             save_colony(current_colony, current_colony.name)
             print(f"Deleted breeder cage {cage_id}")
         else:
@@ -1395,17 +2010,7 @@ if __name__ == '__main__':
             print("Creating templates directory...")
             os.makedirs('templates')
         
-        # Start Dash server in a separate process
-        print("Starting Dash process...")
-        run_dash()
-        
-        # Wait a moment for servers to start
-        print("Waiting for servers to start...")
-        time.sleep(5)
-        
-        # Check if Dash server is running
-        if not is_dash_running():
-            print("Warning: Dash server may not have started properly")
+        # The Dash tree server starts in-process on the first visit to /tree
         
         # Try to open the web browser
         try:
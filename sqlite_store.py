@@ -0,0 +1,242 @@
+"""SQLite storage backend for colonies
+
+Provides the same functions as the JSON ``storage`` module so server.py can
+use either one. Run as a script to migrate colonies between the two formats:
+
+    python sqlite_store.py to-sqlite <name> [<name> ...]
+    python sqlite_store.py to-json <name> [<name> ...]
+    python sqlite_store.py to-sqlite --all
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, List
+
+import storage
+
+colonies_dir = storage.colonies_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS colony_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS animals (
+    animal_id TEXT PRIMARY KEY,
+    sex TEXT,
+    genotype TEXT,
+    dob TEXT,
+    mother_id TEXT,
+    father_id TEXT,
+    notes TEXT,
+    cage_id TEXT,
+    date_weaned TEXT,
+    old_cage_id TEXT,
+    deceased INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_animals_cage_id ON animals(cage_id);
+CREATE INDEX IF NOT EXISTS idx_animals_mother_id ON animals(mother_id);
+CREATE INDEX IF NOT EXISTS idx_animals_father_id ON animals(father_id);
+CREATE TABLE IF NOT EXISTS breeder_cages (
+    cage_id TEXT PRIMARY KEY,
+    mother_id TEXT,
+    father_id TEXT,
+    date_mated TEXT,
+    notes TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_breeder_cages_mother_id ON breeder_cages(mother_id);
+CREATE INDEX IF NOT EXISTS idx_breeder_cages_father_id ON breeder_cages(father_id);
+CREATE TABLE IF NOT EXISTS litters (
+    breeder_cage_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    cage_id TEXT NOT NULL,
+    PRIMARY KEY (breeder_cage_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_litters_cage_id ON litters(cage_id);
+CREATE VIEW IF NOT EXISTS transfers AS
+    SELECT animal_id, old_cage_id AS from_cage_id, cage_id AS to_cage_id
+    FROM animals WHERE old_cage_id IS NOT NULL;
+"""
+
+ANIMAL_COLUMNS = ['animal_id', 'sex', 'genotype', 'dob', 'mother_id', 'father_id',
+                  'notes', 'cage_id', 'date_weaned', 'old_cage_id', 'deceased']
+BREEDER_COLUMNS = ['cage_id', 'mother_id', 'father_id', 'date_mated', 'notes']
+
+_UPSERT_ANIMAL = (
+    f"INSERT INTO animals ({', '.join(ANIMAL_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in ANIMAL_COLUMNS)}) "
+    f"ON CONFLICT(animal_id) DO UPDATE SET "
+    + ', '.join(f"{c} = excluded.{c}" for c in ANIMAL_COLUMNS[1:])
+)
+
+# Digest of the last stored breeder cage list per colony, so unchanged
+# breeder cages aren't rewritten on every save
+_breeder_digests: Dict[str, str] = {}
+
+
+def snapshot_path(name: str) -> str:
+    return os.path.join(colonies_dir, f'{name}.sqlite')
+
+
+def connect(name: str) -> sqlite3.Connection:
+    """Open a colony database, creating the schema if needed"""
+    conn = sqlite3.connect(snapshot_path(name), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _animal_row(animal: dict) -> tuple:
+    return tuple(bool(animal.get(c)) if c == 'deceased' else animal.get(c) for c in ANIMAL_COLUMNS)
+
+
+def _animal_from_row(row: sqlite3.Row) -> dict:
+    animal = dict(row)
+    animal['deceased'] = bool(animal['deceased'])
+    return animal
+
+
+def _write_breeder_cages(conn: sqlite3.Connection, breeder_cages: List[dict]):
+    conn.execute('DELETE FROM breeder_cages')
+    conn.execute('DELETE FROM litters')
+    for bc in breeder_cages:
+        extra = {k: v for k, v in bc.items() if k not in BREEDER_COLUMNS and k != 'litters'}
+        conn.execute(
+            f"INSERT OR REPLACE INTO breeder_cages ({', '.join(BREEDER_COLUMNS)}, extra) VALUES (?, ?, ?, ?, ?, ?)",
+            tuple(bc.get(c) for c in BREEDER_COLUMNS) + (json.dumps(extra) if extra else None,))
+        conn.executemany(
+            'INSERT INTO litters (breeder_cage_id, position, cage_id) VALUES (?, ?, ?)',
+            [(bc['cage_id'], i, litter) for i, litter in enumerate(bc.get('litters', []))])
+
+
+def write_full_snapshot(name: str, data: dict):
+    """Replace the stored colony with the given data in one transaction"""
+    conn = connect(name)
+    try:
+        with conn:
+            conn.execute('DELETE FROM animals')
+            conn.executemany(_UPSERT_ANIMAL, (_animal_row(a) for a in data.get('animals', [])))
+            _write_breeder_cages(conn, data.get('breeder_cages', []))
+            conn.execute("INSERT OR REPLACE INTO colony_meta (key, value) VALUES ('name', ?)", (data.get('name', name),))
+    finally:
+        conn.close()
+    _breeder_digests[name] = json.dumps(data.get('breeder_cages', []), sort_keys=True)
+
+
+def append_changes(name: str, changes: List[dict], breeder_cages: List[dict]):
+    """Apply change records as single-row statements in one transaction"""
+    digest = json.dumps(breeder_cages, sort_keys=True)
+    breeders_changed = digest != _breeder_digests.get(name)
+    if not changes and not breeders_changed:
+        return
+    conn = connect(name)
+    try:
+        with conn:
+            for record in changes:
+                op = record.get('op')
+                if op == 'put':
+                    conn.execute(_UPSERT_ANIMAL, _animal_row(record['animal']))
+                elif op == 'delete':
+                    conn.execute('DELETE FROM animals WHERE animal_id = ?', (record['animal_id'],))
+                elif op == 'rename':
+                    old_id, new_id = record['old_id'], record['new_id']
+                    conn.execute('UPDATE animals SET animal_id = ? WHERE animal_id = ?', (new_id, old_id))
+                    conn.execute('UPDATE animals SET mother_id = ? WHERE mother_id = ?', (new_id, old_id))
+                    conn.execute('UPDATE animals SET father_id = ? WHERE father_id = ?', (new_id, old_id))
+            if breeders_changed:
+                _write_breeder_cages(conn, breeder_cages)
+    finally:
+        conn.close()
+    _breeder_digests[name] = digest
+
+
+def read_colony_data(name: str) -> dict:
+    """Read a stored colony into the same dict shape as a JSON snapshot"""
+    if not os.path.exists(snapshot_path(name)):
+        raise FileNotFoundError(f"Colony database {snapshot_path(name)} not found")
+    conn = connect(name)
+    try:
+        meta = conn.execute("SELECT value FROM colony_meta WHERE key = 'name'").fetchone()
+        animals = [_animal_from_row(row) for row in
+                   conn.execute(f"SELECT {', '.join(ANIMAL_COLUMNS)} FROM animals ORDER BY rowid")]
+        litters: Dict[str, List[str]] = {}
+        for row in conn.execute('SELECT breeder_cage_id, cage_id FROM litters ORDER BY breeder_cage_id, position'):
+            litters.setdefault(row['breeder_cage_id'], []).append(row['cage_id'])
+        breeder_cages = []
+        for row in conn.execute(f"SELECT {', '.join(BREEDER_COLUMNS)}, extra FROM breeder_cages ORDER BY rowid"):
+            bc = {c: row[c] for c in BREEDER_COLUMNS}
+            if row['extra']:
+                bc.update(json.loads(row['extra']))
+            bc['litters'] = litters.get(row['cage_id'], [])
+            breeder_cages.append(bc)
+    finally:
+        conn.close()
+    _breeder_digests[name] = json.dumps(breeder_cages, sort_keys=True)
+    return {'name': meta['value'] if meta else name, 'animals': animals, 'breeder_cages': breeder_cages}
+
+
+def rename_colony_files(old_name: str, new_name: str):
+    """Rename a colony database and its WAL side files"""
+    for suffix in ('', '-wal', '-shm'):
+        old_path = snapshot_path(old_name) + suffix
+        if os.path.exists(old_path):
+            os.rename(old_path, snapshot_path(new_name) + suffix)
+    conn = connect(new_name)
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO colony_meta (key, value) VALUES ('name', ?)", (new_name,))
+    finally:
+        conn.close()
+    if old_name in _breeder_digests:
+        _breeder_digests[new_name] = _breeder_digests.pop(old_name)
+
+
+def delete_colony_files(name: str):
+    """Delete a colony database and its WAL side files"""
+    for suffix in ('', '-wal', '-shm'):
+        path = snapshot_path(name) + suffix
+        if os.path.exists(path):
+            os.remove(path)
+    _breeder_digests.pop(name, None)
+
+
+def migrate(name: str, target: str):
+    """Copy a colony from JSON to SQLite or back"""
+    start = time.perf_counter()
+    if target == 'sqlite':
+        data = storage.read_colony_data(name)
+        data.pop('journal_seq', None)
+        write_full_snapshot(name, data)
+    else:
+        data = read_colony_data(name)
+        storage.write_full_snapshot(name, data)
+    elapsed = time.perf_counter() - start
+    print(f"Migrated colony '{name}' ({len(data['animals'])} animals) to {target} in {elapsed:.3f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Migrate colonies between JSON and SQLite storage')
+    parser.add_argument('direction', choices=['to-sqlite', 'to-json'])
+    parser.add_argument('names', nargs='*', help='Colony names to migrate')
+    parser.add_argument('--all', action='store_true', help='Migrate every colony in the colonies directory')
+    args = parser.parse_args(argv)
+
+    target = 'sqlite' if args.direction == 'to-sqlite' else 'json'
+    names = list(args.names)
+    if args.all:
+        source_ext = '.json' if target == 'sqlite' else '.sqlite'
+        names += [f[:-len(source_ext)] for f in sorted(os.listdir(colonies_dir)) if f.endswith(source_ext)]
+    if not names:
+        parser.error('No colonies given; pass names or --all')
+    for name in names:
+        migrate(name, target)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
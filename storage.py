@@ -0,0 +1,278 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from threading import Thread
+from typing import Dict, List, Optional
+
+colonies_dir = 'colonies'
+
+# Number of journal records after which the snapshot is rebuilt in the background
+COMPACT_THRESHOLD = 1000
+
+# Number of previous snapshots kept as <name>.json.1 ... <name>.json.N
+SNAPSHOT_BACKUPS = 3
+
+# Per-colony state: a lock guarding the journal files, the next sequence
+# number, the number of records since the last compaction and a digest of
+# the last journaled breeder cage list.
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+_next_seq: Dict[str, int] = {}
+_journal_counts: Dict[str, int] = {}
+_breeder_digests: Dict[str, str] = {}
+_compacting: set = set()
+
+
+def backend(name: Optional[str] = None):
+    """Get the storage module for a backend, 'json' (this module) or 'sqlite'; defaults to COLONY_BACKEND"""
+    if (name or os.environ.get('COLONY_BACKEND', 'json')) == 'sqlite':
+        import sqlite_store  # Imported here: sqlite_store imports this module
+        return sqlite_store
+    return sys.modules[__name__]
+
+
+def _lock_for(name: str) -> threading.Lock:
+    with _locks_guard:
+        if name not in _locks:
+            _locks[name] = threading.Lock()
+        return _locks[name]
+
+
+def snapshot_path(name: str) -> str:
+    return os.path.join(colonies_dir, f'{name}.json')
+
+
+def journal_path(name: str) -> str:
+    return os.path.join(colonies_dir, f'{name}.journal')
+
+
+def compacting_path(name: str) -> str:
+    return os.path.join(colonies_dir, f'{name}.journal.compacting')
+
+
+def _fsync_dir(directory: str):
+    """Flush a directory entry update (a rename) to disk where supported"""
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return  # Directories can't be opened on Windows
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_temp(path: str, data: dict, indent: Optional[int]) -> str:
+    """Write data to a fsynced temporary file next to path and return its name"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            # dumps encodes in one C call; dump streams through the slower Python encoder
+            f.write(json.dumps(data, indent=indent))
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def backup_path(path: str, index: int) -> str:
+    return f'{path}.{index}'
+
+
+def _install(tmp_path: str, path: str, backups: int):
+    """Atomically replace path with tmp_path, rotating previous versions"""
+    if backups > 0 and os.path.exists(path):
+        for i in range(backups - 1, 0, -1):
+            if os.path.exists(backup_path(path, i)):
+                os.replace(backup_path(path, i), backup_path(path, i + 1))
+        # Keep the outgoing snapshot under a second name; readers never see path missing
+        try:
+            os.link(path, backup_path(path, 1))
+        except (OSError, AttributeError):
+            shutil.copy2(path, backup_path(path, 1))
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+def write_snapshot(path: str, data: dict, indent: Optional[int] = 4, backups: int = SNAPSHOT_BACKUPS):
+    """Write snapshot data crash-safely
+
+    The data goes to a temporary file in the same directory, is fsynced,
+    and is then renamed over the target, so readers see either the old or
+    the new snapshot and never a partial one.
+    """
+    _install(_write_temp(path, data, indent), path, backups)
+
+
+def apply_records(data: dict, records: List[dict]) -> dict:
+    """Apply journal records to snapshot data, skipping ones it already contains"""
+    applied_seq = data.get('journal_seq', 0)
+    animals = {a['animal_id']: a for a in data.get('animals', [])}
+    for record in records:
+        seq = record.get('seq', 0)
+        if seq <= applied_seq:
+            continue
+        op = record.get('op')
+        if op == 'put':
+            animal = record['animal']
+            animals[animal['animal_id']] = animal
+        elif op == 'delete':
+            animals.pop(record['animal_id'], None)
+        elif op == 'rename':
+            old_id, new_id = record['old_id'], record['new_id']
+            if old_id in animals and new_id not in animals:
+                animals[old_id]['animal_id'] = new_id
+                # Rebuild to keep the animal in its original position
+                animals = {a['animal_id']: a for a in animals.values()}
+                for other in animals.values():
+                    if other.get('mother_id') == old_id:
+                        other['mother_id'] = new_id
+                    if other.get('father_id') == old_id:
+                        other['father_id'] = new_id
+        elif op == 'breeder_cages':
+            data['breeder_cages'] = record['breeder_cages']
+        applied_seq = seq
+    data['animals'] = list(animals.values())
+    data['journal_seq'] = applied_seq
+    return data
+
+
+def _read_records(path: str) -> List[dict]:
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # A torn final line from a crash mid-append; everything before it is intact
+                print(f"Warning: skipping unreadable journal record in {path}")
+                break
+    return records
+
+
+def read_colony_data(name: str) -> dict:
+    """Read a colony snapshot and replay any journaled changes on top of it"""
+    with _lock_for(name):
+        with open(snapshot_path(name), 'r') as f:
+            data = json.load(f)
+        records = _read_records(compacting_path(name)) + _read_records(journal_path(name))
+    data = apply_records(data, records)
+    _next_seq[name] = data['journal_seq'] + 1
+    _journal_counts[name] = len(records)
+    _breeder_digests[name] = json.dumps(data.get('breeder_cages', []), sort_keys=True)
+    return data
+
+
+def write_full_snapshot(name: str, data: dict):
+    """Write a complete snapshot for a colony and discard its journal"""
+    with _lock_for(name):
+        seq = _next_seq.get(name, 1)
+        data['journal_seq'] = seq - 1
+        write_snapshot(snapshot_path(name), data)
+        for path in (journal_path(name), compacting_path(name)):
+            if os.path.exists(path):
+                os.remove(path)
+        _next_seq[name] = seq
+        _journal_counts[name] = 0
+        _breeder_digests[name] = json.dumps(data.get('breeder_cages', []), sort_keys=True)
+
+
+def append_changes(name: str, changes: List[dict], breeder_cages: List[dict]):
+    """Append change records for a colony to its journal"""
+    records = list(changes)
+    digest = json.dumps(breeder_cages, sort_keys=True)
+    if digest != _breeder_digests.get(name):
+        records.append({'op': 'breeder_cages', 'breeder_cages': breeder_cages})
+    if not records:
+        return
+    with _lock_for(name):
+        seq = _next_seq.get(name, 1)
+        lines = []
+        for record in records:
+            record['seq'] = seq
+            seq += 1
+            lines.append(json.dumps(record, separators=(',', ':')))
+        with open(journal_path(name), 'a') as f:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        _next_seq[name] = seq
+        _breeder_digests[name] = digest
+        _journal_counts[name] = _journal_counts.get(name, 0) + len(records)
+        needs_compaction = _journal_counts[name] >= COMPACT_THRESHOLD and name not in _compacting
+        if needs_compaction:
+            _compacting.add(name)
+    if needs_compaction:
+        Thread(target=compact, args=(name,), daemon=True).start()
+
+
+def compact(name: str):
+    """Fold a colony's journal into its snapshot"""
+    start = time.perf_counter()
+    try:
+        with _lock_for(name):
+            # Rotate the journal so new edits keep appending while we rebuild
+            if os.path.exists(journal_path(name)) and not os.path.exists(compacting_path(name)):
+                os.replace(journal_path(name), compacting_path(name))
+            _journal_counts[name] = 0
+        if not os.path.exists(compacting_path(name)):
+            return
+        with open(snapshot_path(name), 'r') as f:
+            data = json.load(f)
+        data = apply_records(data, _read_records(compacting_path(name)))
+        tmp_path = _write_temp(snapshot_path(name), data, 4)
+        with _lock_for(name):
+            if not os.path.exists(compacting_path(name)):
+                # A full snapshot was written meanwhile and already covers these records
+                os.remove(tmp_path)
+                return
+            _install(tmp_path, snapshot_path(name), SNAPSHOT_BACKUPS)
+            os.remove(compacting_path(name))
+        elapsed = time.perf_counter() - start
+        print(f"Compacted journal for colony '{name}' in {elapsed:.3f}s")
+    except Exception as e:
+        print(f"Error compacting colony '{name}': {str(e)}")
+    finally:
+        _compacting.discard(name)
+
+
+def rename_colony_files(old_name: str, new_name: str):
+    """Rename a colony's snapshot and journal files"""
+    with _lock_for(old_name):
+        os.rename(snapshot_path(old_name), snapshot_path(new_name))
+        renames = [(journal_path(old_name), journal_path(new_name)),
+                   (compacting_path(old_name), compacting_path(new_name))]
+        renames += [(backup_path(snapshot_path(old_name), i), backup_path(snapshot_path(new_name), i))
+                    for i in range(1, SNAPSHOT_BACKUPS + 1)]
+        for old_path, new_path in renames:
+            if os.path.exists(old_path):
+                os.rename(old_path, new_path)
+        for state in (_next_seq, _journal_counts, _breeder_digests):
+            if old_name in state:
+                state[new_name] = state.pop(old_name)
+
+
+def delete_colony_files(name: str):
+    """Delete a colony's snapshot and journal files"""
+    with _lock_for(name):
+        paths = [snapshot_path(name), journal_path(name), compacting_path(name)]
+        paths += [backup_path(snapshot_path(name), i) for i in range(1, SNAPSHOT_BACKUPS + 1)]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        for state in (_next_seq, _journal_counts, _breeder_digests):
+            state.pop(name, None)
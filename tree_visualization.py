@@ -1,12 +1,16 @@
+import threading
 import dash
 from dash import html, dcc
 import dash_cytoscape as cyto
 import json
 import os
 from datetime import date
+from urllib.parse import parse_qs
 import plotly.graph_objects as go
 import networkx as nx
 from models import Colony, Animal
+from pedigree import PedigreeCycleError
+from layout import cached_layout, colony_layout, normalized
 
 # Import graphviz_layout for hierarchical layout, fall back to pydot if needed
 try:
@@ -20,8 +24,24 @@ cyto.load_extra_layouts()
 # Initialize the Dash app
 app = dash.Dash(__name__)
 
-# Global variable to store the current colony
+# Colony shown when a tab doesn't name one (the desktop app, or no resolver)
 current_colony = None
+# Looks a colony up by name (the server's ColonyManager.get), so tabs follow
+# the live copy after the manager evicts and reloads it
+_resolve_colony = None
+
+# Longest a tab's version check waits for a change before re-arming
+WAIT_TIMEOUT = 25
+
+# Largest tree drawn with text labels and SVG traces; bigger trees use WebGL and hover-only labels
+LABEL_LIMIT = 500
+
+# Last figure built, shared by all open tabs: {'key': version key, 'figure': figure}
+_figure_cache = {'key': None, 'figure': None}
+_figure_lock = threading.Lock()
+
+_server_thread = None
+_server_lock = threading.Lock()
 
 def update_colony(colony):
     """Update the current colony in the Dash app"""
@@ -30,71 +50,103 @@ def update_colony(colony):
     current_colony = colony
     print(f"Updated colony: {colony.name}")
     print(f"Number of animals: {len(colony.animals)}")
-    # Force a refresh of the graph
-    if app.layout:
-        print("Updating graph...")
-        app.layout['family-tree'].figure = create_family_tree()
-        print("Graph updated")
 
-def create_family_tree():
+def run_dash_server(colony, resolve=None):
+    """Show a colony in the Dash app, starting the app in a background thread on first use
+
+    Pass ``resolve`` (a function from colony name to Colony) so tabs opened
+    at /?colony=<name> show that colony and pick up its replacement when the
+    copy they were drawing is retired.
+    """
+    global _server_thread, _resolve_colony
+    update_colony(colony)
+    if resolve is not None:
+        _resolve_colony = resolve
+    with _server_lock:
+        if _server_thread is None:
+            _server_thread = threading.Thread(target=app.run, kwargs={'debug': False, 'port': 8050}, daemon=True)
+            _server_thread.start()
+
+def resolve_colony(name=None):
+    """Get the live colony a tab shows: the one it names, else the current one"""
+    colony = current_colony
+    if _resolve_colony is not None and (name or (colony is not None and colony.retired)):
+        colony = _resolve_colony(name or colony.name)
+    return colony
+
+def colony_version_key(colony, root=None, direction='down', depth=None):
+    """Identify a colony, its version and the lineage shown; changes whenever the tree needs redrawing"""
+    if not colony:
+        return None
+    key = f"{colony.name}-{id(colony)}-{colony.version}"
+    return f"{key}-{root}-{direction}-{depth}" if root else key
+
+def get_family_tree_figure(colony, root=None, direction='down', depth=None):
+    """Get the family tree figure, rebuilding it only when the colony or the lineage shown changed"""
+    if not colony:
+        return None, create_family_tree(None)
+    with _figure_lock:
+        with colony.lock.read():
+            key = colony_version_key(colony, root, direction, depth)
+            if _figure_cache['key'] != key:
+                _figure_cache['figure'] = create_family_tree(colony, root, direction, depth)
+                _figure_cache['key'] = key
+        return key, _figure_cache['figure']
+
+def create_family_tree(colony, root=None, direction='down', depth=None):
+    """Build the family tree figure for the whole colony, or for one animal's descendants or ancestors"""
     print("\n=== Creating Family Tree ===")
-    if not current_colony:
+    if not colony:
         print("No colony available")
         return go.Figure()
     
-    print(f"Creating tree for colony: {current_colony.name}")
-    print(f"Number of animals: {len(current_colony.animals)}")
+    print(f"Creating tree for colony: {colony.name}")
+    print(f"Number of animals: {len(colony.animals)}")
+    title = f"Family Tree - {colony.name}"
+    animals = colony.animals
+    if root:
+        animal = colony.get_animal(root)
+        if animal is None:
+            return go.Figure(layout=go.Layout(title=f"{title}: animal {root} not found"))
+        # Walks only the lineage's own links, so large colonies cost nothing extra
+        animals = colony.get_lineage(animal, direction, depth)
+        relatives = 'Ancestors' if direction == 'up' else 'Descendants'
+        title += f" - {relatives} of {root}" + (f", {depth} generations" if depth is not None else '')
+        print(f"Showing {len(animals)} animals in the lineage of {root}")
         
     # Create a directed graph
     G = nx.DiGraph()
     
     # Add nodes with attributes
-    for animal in current_colony.animals:
+    for animal in animals:
         G.add_node(animal.animal_id,
                   sex=animal.sex,
                   genotype=animal.genotype)
     
-    # Add edges for parent-child relationships
-    for animal in current_colony.animals:
-        if animal.mother:
+    # Add edges for parent-child relationships within the animals shown
+    for animal in animals:
+        if animal.mother and animal.mother.animal_id in G:
             G.add_edge(animal.mother.animal_id, animal.animal_id)
-        if animal.father:
+        if animal.father and animal.father.animal_id in G:
             G.add_edge(animal.father.animal_id, animal.animal_id)
     
     print(f"Created graph with {len(G.nodes())} nodes and {len(G.edges())} edges")
     
-    # Compute generation levels for multipartite layout
-    generations = {}
-    # Roots (no parents) are generation 0
-    for node in G.nodes():
-        if G.in_degree(node) == 0:
-            generations[node] = 0
-    # Propagate generation levels to children
-    changed = True
-    while changed:
-        changed = False
-        for parent, child in G.edges():
-            if parent in generations and child not in generations:
-                generations[child] = generations[parent] + 1
-                changed = True
-    nx.set_node_attributes(G, generations, 'generation')
-    # Custom layout: evenly space each generation on its own horizontal line
-    gen_nodes = {}
-    for node, gen in generations.items():
-        gen_nodes.setdefault(gen, []).append(node)
+    # Layered pedigree layout; the whole colony's is reused until its parent links change
+    try:
+        tree = colony_layout(colony, animals) if root else cached_layout(colony)
+    except PedigreeCycleError as e:
+        print(f"Cannot draw family tree: {e}")
+        return go.Figure(layout=go.Layout(title=f"{title}: {e}"))
+    nx.set_node_attributes(G, tree.rows, 'generation')
     vertical_gap = 1.0  # vertical distance between generations
     # Determine maximum generation to set axis range
-    max_gen = max(generations.values()) if generations else 0
-    pos = {}
-    for gen, nodes in gen_nodes.items():
-        count = len(nodes)
-        for idx, node in enumerate(nodes):
-            # Evenly space across x from 0 to 1
-            x = (idx / (count - 1)) if count > 1 else 0.5
-            # Negative y so generation 0 is at top (y=0), deeper gens below
-            y = -gen * vertical_gap
-            pos[node] = (x, y)
-    
+    max_gen = max(tree.rows.values()) if tree.rows else 0
+    # Scale x into [0, 1]; negative y so generation 0 is at top (y=0), deeper gens below
+    scaled = normalized(tree.positions)
+    pos = {node: (scaled[node][0], -row * vertical_gap) for node, row in tree.rows.items()}
+    print(f"Layout has {tree.crossings} edge crossings between adjacent generations")
+
     # Create edges
     edge_x = []
     edge_y = []
@@ -104,7 +156,10 @@ def create_family_tree():
         edge_x.extend([x0, x1, None])
         edge_y.extend([y0, y1, None])
     
-    edge_trace = go.Scatter(
+    # Above LABEL_LIMIT animals, per-node text and SVG markers make the figure unusable
+    large = len(pos) > LABEL_LIMIT
+    Trace = go.Scattergl if large else go.Scatter
+    edge_trace = Trace(
         x=edge_x, y=edge_y,
         line=dict(width=0.5, color='#888'),
         hoverinfo='none',
@@ -123,16 +178,16 @@ def create_family_tree():
         node_text.append(f"{node}<br>{G.nodes[node]['genotype']}")
         node_color.append('pink' if G.nodes[node]['sex'] == 'F' else 'lightblue')
     
-    node_trace = go.Scatter(
+    node_trace = Trace(
         x=node_x, y=node_y,
-        mode='markers+text',
+        mode='markers' if large else 'markers+text',
         hoverinfo='text',
         text=node_text,
         textposition="top center",
         marker=dict(
-            size=20,
+            size=6 if large else 20,
             color=node_color,
-            line_width=2))
+            line_width=0 if large else 2))
     
     # Create the figure
     fig = go.Figure(
@@ -141,7 +196,7 @@ def create_family_tree():
             showlegend=False,
             hovermode='closest',
             margin=dict(b=20, l=5, r=5, t=40),
-            title=f"Family Tree - {current_colony.name}",
+            title=title,
             annotations=[dict(
                 text="",
                 showarrow=False,
@@ -164,12 +219,28 @@ def create_family_tree():
 
 # Define the layout
 app.layout = html.Div([
+    # The colony to show comes from the ?colony= query string
+    dcc.Location(id='url'),
     html.H1("Animal Colony Family Tree"),
+    # Lineage to show: leave the animal ID empty for the whole colony
+    html.Div([
+        dcc.Input(id='lineage-root', type='text', placeholder='Animal ID', debounce=True),
+        dcc.Dropdown(id='lineage-direction', clearable=False, value='down',
+                     options=[{'label': 'Descendants', 'value': 'down'}, {'label': 'Ancestors', 'value': 'up'}],
+                     style={'width': '160px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
+        dcc.Input(id='lineage-depth', type='number', min=0, placeholder='Generations (all)', debounce=True),
+    ]),
     dcc.Graph(id='family-tree'),
+    # Version key of the figure this tab is showing
+    dcc.Store(id='rendered-version'),
+    # Long poll for colony changes: each tick's callback blocks on the colony
+    # version, and the interval pauses at max_intervals until the callback
+    # returns and re-arms it, so a tab has at most one check in flight
     dcc.Interval(
         id='interval-component',
-        interval=1*1000,  # in milliseconds
-        n_intervals=0
+        interval=250,  # in milliseconds
+        n_intervals=0,
+        max_intervals=0
     )
 ])
 
@@ -217,10 +288,33 @@ def create_elements(colony_data):
 
 @app.callback(
     dash.Output('family-tree', 'figure'),
-    dash.Input('interval-component', 'n_intervals')
+    dash.Output('rendered-version', 'data'),
+    dash.Output('interval-component', 'max_intervals'),
+    dash.Input('interval-component', 'n_intervals'),
+    dash.Input('lineage-root', 'value'),
+    dash.Input('lineage-direction', 'value'),
+    dash.Input('lineage-depth', 'value'),
+    dash.Input('url', 'search'),
+    dash.State('rendered-version', 'data')
 )
-def update_graph(n):
-    return create_family_tree()
+def update_graph(n, root, direction, depth, search, rendered_version):
+    root = (root or '').strip() or None
+    depth = int(depth) if depth is not None else None
+    name = parse_qs((search or '').lstrip('?')).get('colony', [None])[0]
+    colony = resolve_colony(name)
+    triggered = [t['prop_id'] for t in dash.callback_context.triggered]
+    if triggered == ['interval-component.n_intervals']:
+        # Wait for the colony to change while this tab already shows the current version;
+        # retiring a colony wakes the wait, and the colony is then looked up again
+        if colony:
+            version = colony.version
+            if colony_version_key(colony, root, direction, depth) == rendered_version:
+                colony.wait_for_change(version, WAIT_TIMEOUT)
+            colony = resolve_colony(name)
+        if colony_version_key(colony, root, direction, depth) == rendered_version:
+            return dash.no_update, dash.no_update, n + 1
+    key, figure = get_family_tree_figure(colony, root, direction, depth)
+    return figure, key, (n or 0) + 1
 
 if __name__ == '__main__':
     app.run(debug=False, port=8050) 
\ No newline at end of file